@@ -0,0 +1,52 @@
+import pandas as pd
+import esquemas
+
+# Columna con el número de registros originales que representa cada fila de un dataset agregado
+COLUMNA_REGISTROS = '_registros'
+
+def es_agregado(df):
+    """Indica si el DataFrame contiene conteos parciales en lugar de registros individuales"""
+    return COLUMNA_REGISTROS in df.columns
+
+def pesos(df):
+    """Número de casos que representa cada fila: la columna de cantidad, los conteos parciales o 1"""
+    cantidad = esquemas.columna(df, 'cantidad')
+    if cantidad is not None:
+        return pd.to_numeric(df[cantidad], errors='coerce').fillna(0)
+    if es_agregado(df):
+        return df[COLUMNA_REGISTROS]
+    return None
+
+def _clave(df, columna):
+    # Nombre de una columna de df o Series derivada (alineada con df) que se usa tal cual
+    return columna if isinstance(columna, pd.Series) else df[columna]
+
+def contar(df, columnas, ordenar=True):
+    """Cuenta casos por una o varias columnas (equivalente a groupby(columnas).size()).
+
+    Las columnas pueden ser nombres o Series derivadas con el mismo índice que df (por
+    ejemplo el año convertido a número), así no hace falta copiar df para agregarlas.
+    Si el dataset tiene columna de cantidad cada fila aporta su cantidad; en datasets
+    agregados se suman los conteos parciales de COLUMNA_REGISTROS.
+    """
+    claves = [_clave(df, col) for col in columnas] if isinstance(columnas, list) else _clave(df, columnas)
+    peso = pesos(df)
+    if peso is None:
+        return df.groupby(claves, observed=True, sort=ordenar).size()
+    return peso.groupby(claves, observed=True, sort=ordenar).sum()
+
+def contar_valores(df, columna):
+    """Cuenta registros por valor de una columna (o Series derivada) ordenados de mayor a menor (como value_counts)"""
+    # Los empates conservan el orden de aparición, igual que value_counts
+    return contar(df, columna, ordenar=False).sort_values(ascending=False, kind='stable')
+
+def total_casos(df):
+    """Número de casos representados por el DataFrame (suma de la columna de cantidad si existe)"""
+    peso = pesos(df)
+    return len(df) if peso is None else int(peso.sum())
+
+def total_registros(df):
+    """Número de registros originales representados por el DataFrame"""
+    if es_agregado(df):
+        return int(df[COLUMNA_REGISTROS].sum())
+    return len(df)
@@ -7,7 +7,16 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import os
 import folium
-from folium.plugins import HeatMap, MarkerCluster
+from carga_datos import load_dataset, encabezado, es_archivo_grande
+import esquemas
+from agregacion import contar, contar_valores, pesos
+from cubo import cargar_cubo, serie_valores
+from instrumentacion import instrumentar
+from memoizacion import memoizar
+from salidas import guardar_figura, guardar_mapa
+from capas_mapa import coordenadas_validas, bloques_coordenadas, capa_densidad, capa_teselas
+from densidad import piramide_densidad, piramide_densidad_bloques, NIVELES_ZOOM
+from normalizacion import localidades
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -21,44 +30,11 @@ plt.rcParams['font.family'] = 'sans-serif'
 # Create output directory for visualizations
 os.makedirs('visualizaciones', exist_ok=True)
 
-print("Iniciando análisis geográfico de seguridad y criminalidad...")
-
-# Function to load and clean datasets
-def load_dataset(filename):
-    print(f"Cargando {filename}...")
-    try:
-        # Intentar cargar con punto y coma como delimitador
-        df = pd.read_csv(f"datos/{filename}", encoding='latin1', low_memory=False, sep=';')
-        
-        # Verificar si los datos se cargaron en una sola columna
-        if df.shape[1] == 1 and ',' in df.iloc[0, 0]:
-            # Si es así, dividir la columna
-            column_name = df.columns[0]
-            new_df = df[column_name].str.split(',', expand=True)
-            
-            # Extraer los nombres de las columnas de la primera fila si contiene encabezados
-            if ',' in column_name:
-                headers = column_name.split(',')
-                new_df.columns = headers
-            
-            df = new_df
-        
-        print(f"  Filas: {df.shape[0]}, Columnas: {df.shape[1]}")
-        return df
-    except Exception as e:
-        # Si falla, intentar con coma como delimitador
-        try:
-            df = pd.read_csv(f"datos/{filename}", encoding='latin1', low_memory=False)
-            print(f"  Filas: {df.shape[0]}, Columnas: {df.shape[1]}")
-            return df
-        except Exception as e:
-            print(f"Error al cargar {filename}: {e}")
-            return None
-
 # ==========================================
 # Análisis geográfico detallado
 # ==========================================
 
+@instrumentar('analisis')
 def analizar_distribucion_geografica(df, nombre, col_lat='LATITUD', col_lon='LONGITUD', 
                                     col_depto='DEPARTAMENTO', col_muni='MUNICIPIO'):
     """Analiza y visualiza la distribución geográfica de los datos con mapas"""
@@ -67,7 +43,7 @@ def analizar_distribucion_geografica(df, nombre, col_lat='LATITUD', col_lon='LON
         
         # Análisis por departamento
         if col_depto in df.columns:
-            top_deptos = df[col_depto].value_counts().head(10).reset_index()
+            top_deptos = contar_valores(df, col_depto).head(10).reset_index()
             top_deptos.columns = [col_depto, 'cantidad']
             
             fig = px.bar(top_deptos, y=col_depto, x='cantidad',
@@ -86,12 +62,12 @@ def analizar_distribucion_geografica(df, nombre, col_lat='LATITUD', col_lon='LON
                 yaxis=dict(categoryorder='total ascending')
             )
             
-            fig.write_html(f'visualizaciones/{nombre}_top_departamentos.html')
+            guardar_figura(fig, f'visualizaciones/{nombre}_top_departamentos.html')
             
             # Análisis por municipio si está disponible
             if col_muni in df.columns:
                 # Obtener top municipios
-                top_munis = df[col_muni].value_counts().head(15).reset_index()
+                top_munis = contar_valores(df, col_muni).head(15).reset_index()
                 top_munis.columns = [col_muni, 'cantidad']
                 
                 fig = px.bar(top_munis, y=col_muni, x='cantidad',
@@ -110,15 +86,15 @@ def analizar_distribucion_geografica(df, nombre, col_lat='LATITUD', col_lon='LON
                     yaxis=dict(categoryorder='total ascending')
                 )
                 
-                fig.write_html(f'visualizaciones/{nombre}_top_municipios.html')
+                guardar_figura(fig, f'visualizaciones/{nombre}_top_municipios.html')
                 
                 # Análisis cruzado departamento vs municipio
                 # Primero filtrar para top 5 departamentos
-                top5_deptos = df[col_depto].value_counts().head(5).index.tolist()
+                top5_deptos = contar_valores(df, col_depto).head(5).index.tolist()
                 df_filtrado = df[df[col_depto].isin(top5_deptos)]
                 
                 # Agrupar por departamento y municipio
-                grouped = df_filtrado.groupby([col_depto, col_muni]).size().reset_index(name='cantidad')
+                grouped = contar(df_filtrado, [col_depto, col_muni]).reset_index(name='cantidad')
                 
                 # Ordenar por cantidad total y tomar los top 20
                 grouped = grouped.sort_values('cantidad', ascending=False).head(20)
@@ -139,64 +115,42 @@ def analizar_distribucion_geografica(df, nombre, col_lat='LATITUD', col_lon='LON
                     yaxis=dict(showgrid=True, gridcolor='lightgray')
                 )
                 
-                fig.write_html(f'visualizaciones/{nombre}_depto_municipio.html')
+                guardar_figura(fig, f'visualizaciones/{nombre}_depto_municipio.html')
         
         # Crear mapa si hay coordenadas disponibles
+        piramide = None
         if col_lat in df.columns and col_lon in df.columns:
-            # Filtrar registros con coordenadas válidas
-            df_coords = df.copy()
+            # Filtrar registros con coordenadas válidas en Colombia (aproximadamente)
+            validas, lat, lon = coordenadas_validas(df, col_lat, col_lon)
             
-            # Convertir a numérico y filtrar valores nulos y cero
-            df_coords[col_lat] = pd.to_numeric(df_coords[col_lat], errors='coerce')
-            df_coords[col_lon] = pd.to_numeric(df_coords[col_lon], errors='coerce')
+            if len(lat) > 10:  # Solo si hay suficientes puntos
+                print(f"  Creando mapa con {len(lat)} puntos georreferenciados")
+                
+                # Densidad de casos precalculada en una rejilla por nivel de zoom
+                peso = pesos(df)
+                piramide = piramide_densidad(lat, lon, None if peso is None else peso.to_numpy()[validas])
+        elif es_archivo_grande(df.attrs.get('dataset')):
+            # Los archivos grandes llegan agregados y sin coordenadas: la rejilla se suma por bloques
+            print(f"  Creando mapa por bloques de {df.attrs['dataset']}")
+            piramide = piramide_densidad_bloques(bloques_coordenadas(df.attrs['dataset']))
+            if piramide is not None and not len(piramide[NIVELES_ZOOM[0]]['casos']):
+                piramide = None
+        
+        if piramide is not None:
+            # Crear mapa base centrado en Colombia
+            mapa = folium.Map(
+                location=[4.570868, -74.297333],  # Coordenadas aproximadas de Colombia
+                zoom_start=6,
+                tiles='CartoDB positron'
+            )
+            capa_densidad(mapa, piramide, capa=nombre)
             
-            # Filtrar valores en Colombia (aproximadamente)
-            df_coords = df_coords[
-                (df_coords[col_lat].between(-4.2, 13.0)) & 
-                (df_coords[col_lon].between(-82.0, -66.0))
-            ]
+            # Con más zoom el detalle se pide a la pirámide de teselas de server.py
+            # (sin él sigue visible el último nivel de la rejilla)
+            capa_teselas(mapa, nombre, '#b10026', None, nombre='Detalle', zoom_minimo=NIVELES_ZOOM[-1] + 1)
             
-            if not df_coords.empty and len(df_coords) > 10:  # Solo si hay suficientes puntos
-                print(f"  Creando mapa con {len(df_coords)} puntos georreferenciados")
-                
-                # Crear mapa base centrado en Colombia
-                mapa = folium.Map(
-                    location=[4.570868, -74.297333],  # Coordenadas aproximadas de Colombia
-                    zoom_start=6,
-                    tiles='CartoDB positron'
-                )
-                
-                # Limitar a máximo 5000 puntos para rendimiento
-                if len(df_coords) > 5000:
-                    df_coords = df_coords.sample(5000, random_state=42)
-                
-                # Agregar puntos al mapa usando clusters
-                marker_cluster = MarkerCluster().add_to(mapa)
-                
-                for idx, row in df_coords.iterrows():
-                    popup_text = f"{nombre}<br>"
-                    
-                    # Agregar información adicional al popup si está disponible
-                    if col_depto in df.columns and not pd.isna(row[col_depto]):
-                        popup_text += f"Departamento: {row[col_depto]}<br>"
-                    if col_muni in df.columns and not pd.isna(row[col_muni]):
-                        popup_text += f"Municipio: {row[col_muni]}<br>"
-                    
-                    # Agregar fecha si está disponible
-                    if 'FECHA' in df.columns and not pd.isna(row['FECHA']):
-                        popup_text += f"Fecha: {row['FECHA']}<br>"
-                    
-                    folium.Marker(
-                        [row[col_lat], row[col_lon]],
-                        popup=folium.Popup(popup_text, max_width=300)
-                    ).add_to(marker_cluster)
-                
-                # Crear mapa de calor
-                heat_data = [[row[col_lat], row[col_lon]] for idx, row in df_coords.iterrows()]
-                HeatMap(heat_data, radius=15).add_to(mapa)
-                
-                # Guardar mapa
-                mapa.save(f'visualizaciones/{nombre}_mapa.html')
+            # Guardar mapa
+            guardar_mapa(mapa, f'visualizaciones/{nombre}_mapa.html')
         
         return True
     except Exception as e:
@@ -207,13 +161,14 @@ def analizar_distribucion_geografica(df, nombre, col_lat='LATITUD', col_lon='LON
 # Análisis de frentes de seguridad
 # ==========================================
 
+@instrumentar('analisis')
 def analizar_frentes_seguridad():
     """Analiza los frentes de seguridad y su relación con incidentes"""
     print("\nAnalizando frentes de seguridad...")
     
     try:
         # Cargar dataset de frentes de seguridad
-        df_frentes = load_dataset("Frentes_De_Seguridad.csv")
+        df_frentes = load_dataset("Frentes_De_Seguridad.csv", filtrar=False)
         
         if df_frentes is not None:
             print("  Columnas disponibles:", df_frentes.columns.tolist())
@@ -228,14 +183,13 @@ def analizar_frentes_seguridad():
                 df_frentes.columns = new_cols
                 print("  Normalizados los nombres de columnas")
             
-            # Extraer localidad de la última palabra de la columna ESTACION
+            # Extraer la localidad del nombre de la estación ('ESTACION DE POLICIA <LOCALIDAD>')
             if 'ESTACION' in df_frentes.columns:
                 print("  Extrayendo localidad desde la columna ESTACION...")
-                # Extraer la última palabra de ESTACIÓN como localidad
-                df_frentes['LOCALIDAD'] = df_frentes['ESTACION'].str.split().str[-1]
+                df_frentes['LOCALIDAD'] = localidades(df_frentes['ESTACION'])
                 
                 # Análisis por localidad
-                localidad_counts = df_frentes['LOCALIDAD'].value_counts().reset_index()
+                localidad_counts = contar_valores(df_frentes, 'LOCALIDAD').reset_index()
                 localidad_counts.columns = ['LOCALIDAD', 'cantidad']
                 
                 # Crear visualización de localidades
@@ -255,12 +209,12 @@ def analizar_frentes_seguridad():
                     yaxis=dict(categoryorder='total ascending')
                 )
                 
-                fig.write_html('visualizaciones/frentes_seguridad_localidades.html')
+                guardar_figura(fig, 'visualizaciones/frentes_seguridad_localidades.html')
                 
                 # Si también existe columna BARRIO, analizar por barrio
                 if 'BARRIO' in df_frentes.columns:
                     print("  Analizando distribución por barrio...")
-                    barrio_counts = df_frentes['BARRIO'].value_counts().reset_index()
+                    barrio_counts = contar_valores(df_frentes, 'BARRIO').reset_index()
                     barrio_counts.columns = ['BARRIO', 'cantidad']
                     
                     # Crear visualización de barrios (top 20)
@@ -280,7 +234,7 @@ def analizar_frentes_seguridad():
                         yaxis=dict(categoryorder='total ascending')
                     )
                     
-                    fig.write_html('visualizaciones/frentes_seguridad_barrios.html')
+                    guardar_figura(fig, 'visualizaciones/frentes_seguridad_barrios.html')
                     
                     # Análisis cruzado de localidad y barrio
                     print("  Generando análisis cruzado de localidad y barrio...")
@@ -293,7 +247,7 @@ def analizar_frentes_seguridad():
                     
                     for localidad in top_localidades:
                         df_loc = df_top_loc[df_top_loc['LOCALIDAD'] == localidad]
-                        top_barrios = df_loc['BARRIO'].value_counts().head(5)
+                        top_barrios = contar_valores(df_loc, 'BARRIO').head(5)
                         
                         for barrio, count in top_barrios.items():
                             loc_barrio_data.append({
@@ -320,7 +274,7 @@ def analizar_frentes_seguridad():
                             yaxis=dict(showgrid=True, gridcolor='lightgray')
                         )
                         
-                        fig.write_html('visualizaciones/frentes_seguridad_localidad_barrio.html')
+                        guardar_figura(fig, 'visualizaciones/frentes_seguridad_localidad_barrio.html')
                 
                 # Crear mapa de calor si tenemos suficientes datos
                 if 'LOCALIDAD' in df_frentes.columns and 'BARRIO' in df_frentes.columns:
@@ -329,10 +283,10 @@ def analizar_frentes_seguridad():
                     # Crear matriz de localidad vs estado
                     if 'ESTADO' in df_frentes.columns:
                         # Pivot table de localidad vs estado
-                        pivot = pd.crosstab(df_frentes['LOCALIDAD'], df_frentes['ESTADO'])
+                        pivot = contar(df_frentes, ['LOCALIDAD', 'ESTADO']).unstack(fill_value=0)
                         
                         # Seleccionar las 15 localidades con más frentes
-                        top_localidades = df_frentes['LOCALIDAD'].value_counts().head(15).index
+                        top_localidades = contar_valores(df_frentes, 'LOCALIDAD').head(15).index
                         pivot_filtered = pivot.loc[pivot.index.isin(top_localidades)]
                         
                         # Crear heatmap
@@ -348,7 +302,7 @@ def analizar_frentes_seguridad():
                             xaxis=dict(tickangle=45)
                         )
                         
-                        fig.write_html('visualizaciones/frentes_seguridad_heatmap_estado_localidad.html')
+                        guardar_figura(fig, 'visualizaciones/frentes_seguridad_heatmap_estado_localidad.html')
             
             # Análisis por zona y número de integrantes
             if 'NRO_INTEGRANTES' in df_frentes.columns and 'ZONA' in df_frentes.columns:
@@ -357,7 +311,7 @@ def analizar_frentes_seguridad():
                 df_frentes['NRO_INTEGRANTES'] = pd.to_numeric(df_frentes['NRO_INTEGRANTES'], errors='coerce')
                 
                 # Agrupar por zona y calcular estadísticas
-                zona_stats = df_frentes.groupby('ZONA')['NRO_INTEGRANTES'].agg(['count', 'mean', 'std', 'min', 'max']).reset_index()
+                zona_stats = df_frentes.groupby('ZONA', observed=True)['NRO_INTEGRANTES'].agg(['count', 'mean', 'std', 'min', 'max']).reset_index()
                 zona_stats.columns = ['ZONA', 'Cantidad', 'Promedio', 'Desviación', 'Mínimo', 'Máximo']
                 
                 # Visualización de número de integrantes por zona
@@ -378,11 +332,11 @@ def analizar_frentes_seguridad():
                     yaxis=dict(showgrid=True, gridcolor='lightgray')
                 )
                 
-                fig.write_html('visualizaciones/frentes_seguridad_integrantes_zona.html')
+                guardar_figura(fig, 'visualizaciones/frentes_seguridad_integrantes_zona.html')
             
             # Análisis por estado
             if 'ESTADO' in df_frentes.columns:
-                estado_counts = df_frentes['ESTADO'].value_counts().reset_index()
+                estado_counts = contar_valores(df_frentes, 'ESTADO').reset_index()
                 estado_counts.columns = ['ESTADO', 'cantidad']
                 
                 fig = px.pie(estado_counts, values='cantidad', names='ESTADO',
@@ -395,7 +349,7 @@ def analizar_frentes_seguridad():
                     title=dict(font=dict(size=20))
                 )
                 
-                fig.write_html('visualizaciones/frentes_seguridad_estados.html')
+                guardar_figura(fig, 'visualizaciones/frentes_seguridad_estados.html')
             
             return True
     except Exception as e:
@@ -407,41 +361,53 @@ def analizar_frentes_seguridad():
 # Análisis cruzado de zonas de delitos
 # ==========================================
 
+# Tipos de delitos a comparar
+TIPOS_DELITOS = {
+    'Homicidios': 'Homicidios.csv',
+    'Hurto a Personas': 'Hurto_Personas.csv',
+    'Hurto a Comercio': 'Hurto_Comercio.csv'
+}
+
+@memoizar(entradas=lambda archivo, cantidad=10: [archivo])
+def top_departamentos(archivo, cantidad=10):
+    """Departamentos con más casos de un dataset (columna del dataset y 'cantidad'), o None"""
+    cubo = cargar_cubo(archivo)
+    if cubo is None or 'departamento' not in cubo['dimensiones']:
+        return None
+    conteo = serie_valores(cubo, 'departamento').reset_index()
+    conteo.columns = [cubo['columnas']['departamento'], 'cantidad']
+    return conteo.head(cantidad)
+
+@memoizar(entradas=lambda archivo: [archivo])
+def piramide_archivo(archivo):
+    """Pirámide de densidad de los registros con coordenadas válidas del dataset, o None si no tiene"""
+    try:
+        piramide = piramide_densidad_bloques(bloques_coordenadas(archivo))
+    except FileNotFoundError:
+        return None
+    if piramide is None or not len(piramide[NIVELES_ZOOM[0]]['casos']):
+        return None
+    return piramide
+
+@instrumentar('analisis')
 def analizar_zonas_delitos():
     """Analiza y compara las zonas geográficas de diferentes tipos de delitos"""
     print("\nAnalizando distribución geográfica de diferentes delitos...")
     
     try:
-        # Tipos de delitos a comparar
-        tipos_delitos = {
-            'Homicidios': 'Homicidios.csv',
-            'Hurto a Personas': 'Hurto_Personas.csv',
-            'Hurto a Comercio': 'Hurto_Comercio.csv'
-        }
-        
         # Estructura para almacenar datos departamentales
         datos_por_depto = {}
         
-        for tipo, archivo in tipos_delitos.items():
-            df = load_dataset(archivo)
+        for tipo, archivo in TIPOS_DELITOS.items():
+            # Solo los top 10 departamentos (guardados en disco mientras el dataset no cambie)
+            conteo = top_departamentos(archivo)
             
-            if df is not None:
-                # Buscar columna de departamento
-                col_depto = next((col for col in df.columns if 'DEPART' in col.upper() or 'DEPTO' in col.upper()), None)
-                
-                if col_depto:
-                    # Contar por departamento
-                    conteo = df[col_depto].value_counts().reset_index()
-                    conteo.columns = [col_depto, 'cantidad']
-                    
-                    # Solo los top 10 departamentos
-                    conteo = conteo.head(10)
-                    
-                    # Almacenar datos
-                    datos_por_depto[tipo] = {
-                        'columna': col_depto,
-                        'data': conteo
-                    }
+            if conteo is not None:
+                # Almacenar datos
+                datos_por_depto[tipo] = {
+                    'columna': conteo.columns[0],
+                    'data': conteo
+                }
         
         # Si hay datos para al menos dos tipos de delitos, crear visualización comparativa
         if len(datos_por_depto) >= 2:
@@ -482,7 +448,7 @@ def analizar_zonas_delitos():
                 fig.update_xaxes(title="Cantidad de Casos", row=i, col=1, showgrid=True, gridcolor='lightgray')
                 fig.update_yaxes(title="Departamento", row=i, col=1, autorange="reversed")
             
-            fig.write_html('visualizaciones/comparativa_zonas_delitos.html')
+            guardar_figura(fig, 'visualizaciones/comparativa_zonas_delitos.html')
             
             # Crear mapa combinado si hay datos de coordenadas para al menos un tipo de delito
             mapa_combinado = folium.Map(
@@ -498,52 +464,19 @@ def analizar_zonas_delitos():
                 'Hurto de Automotores': 'orange'
             }
             
-            for tipo, archivo in tipos_delitos.items():
-                df = load_dataset(archivo)
-                
-                if df is not None:
-                    # Buscar columnas de coordenadas
-                    col_lat = next((col for col in df.columns if 'LAT' in col.upper()), None)
-                    col_lon = next((col for col in df.columns if 'LON' in col.upper()), None)
-                    
-                    if col_lat and col_lon:
-                        # Convertir a numérico y filtrar valores nulos y cero
-                        df[col_lat] = pd.to_numeric(df[col_lat], errors='coerce')
-                        df[col_lon] = pd.to_numeric(df[col_lon], errors='coerce')
-                        
-                        # Filtrar valores en Colombia (aproximadamente)
-                        df_filtrado = df[
-                            (df[col_lat].between(-4.2, 13.0)) & 
-                            (df[col_lon].between(-82.0, -66.0))
-                        ]
-                        
-                        if not df_filtrado.empty:
-                            # Tomar muestra aleatoria para rendimiento
-                            if len(df_filtrado) > 500:
-                                df_filtrado = df_filtrado.sample(500, random_state=42)
-                            
-                            # Crear capa para este tipo de delito
-                            feature_group = folium.FeatureGroup(name=tipo)
-                            
-                            # Añadir puntos
-                            for idx, row in df_filtrado.iterrows():
-                                folium.CircleMarker(
-                                    [row[col_lat], row[col_lon]],
-                                    radius=4,
-                                    color=colores_delitos.get(tipo, 'gray'),
-                                    fill=True,
-                                    fill_color=colores_delitos.get(tipo, 'gray'),
-                                    fill_opacity=0.7,
-                                    popup=f"{tipo}<br>Lat: {row[col_lat]}<br>Lon: {row[col_lon]}"
-                                ).add_to(feature_group)
-                            
-                            feature_group.add_to(mapa_combinado)
+            for tipo, archivo in TIPOS_DELITOS.items():
+                # Sin volver a recorrer el dataset si ya se calculó con este mismo contenido
+                piramide = piramide_archivo(archivo)
+                if piramide is not None:
+                    # Rejilla incrustada y, con server.py, la pirámide de teselas de este tipo de delito
+                    capa_teselas(mapa_combinado, archivo.replace('.csv', ''),
+                                 colores_delitos.get(tipo, 'gray'), piramide, nombre=tipo)
             
             # Añadir control de capas
             folium.LayerControl().add_to(mapa_combinado)
             
             # Guardar mapa
-            mapa_combinado.save('visualizaciones/mapa_conjunto_delitos.html')
+            guardar_mapa(mapa_combinado, 'visualizaciones/mapa_conjunto_delitos.html')
             
         return True
     except Exception as e:
@@ -556,34 +489,47 @@ def analizar_zonas_delitos():
 # ==========================================
 
 # Lista de archivos para análisis geográfico
-archivos_analizar = [
+ARCHIVOS_ANALIZAR = [
     "Homicidios.csv",
     "Hurto_Personas.csv",
     "Hurto_Comercio.csv",
     "Hurto_Automotores.csv"
 ]
 
-# Realizar análisis geográfico
-for archivo in archivos_analizar:
-    nombre = archivo.replace(".csv", "")
-    df = load_dataset(archivo)
-    if df is not None:
-        # Buscar columnas de coordenadas
-        cols_lat = [col for col in df.columns if 'LAT' in col.upper()]
-        cols_lon = [col for col in df.columns if 'LON' in col.upper()]
-        
-        # Buscar columnas de departamento y municipio
-        cols_depto = [col for col in df.columns if 'DEPART' in col.upper() or 'DEPTO' in col.upper()]
-        cols_muni = [col for col in df.columns if 'MUNI' in col.upper() or 'CIUDAD' in col.upper()]
-        
-        if cols_lat and cols_lon and cols_depto:
-            analizar_distribucion_geografica(df, nombre, cols_lat[0], cols_lon[0], cols_depto[0], 
-                                            cols_muni[0] if cols_muni else None)
+@instrumentar('analisis')
+def analizar_geografia_dataset(df, nombre):
+    """Localiza las columnas geográficas de un dataset y genera sus gráficos y mapas"""
+    # Buscar columnas de coordenadas (en el CSV si el archivo grande llegó agregado sin ellas)
+    columnas = encabezado(df.attrs['dataset']) if es_archivo_grande(df.attrs.get('dataset')) else df.columns
+    cols_lat = [col for col in [esquemas.columna_archivo(df.attrs.get('dataset'), columnas, 'latitud')] if col]
+    cols_lon = [col for col in [esquemas.columna_archivo(df.attrs.get('dataset'), columnas, 'longitud')] if col]
+    
+    # Buscar columnas de departamento y municipio
+    cols_depto = [col for col in [esquemas.columna(df, 'departamento')] if col]
+    cols_muni = [col for col in [esquemas.columna(df, 'municipio')] if col]
+    
+    if cols_lat and cols_lon and cols_depto:
+        return analizar_distribucion_geografica(df, nombre, cols_lat[0], cols_lon[0], cols_depto[0], 
+                                                cols_muni[0] if cols_muni else None)
+    return False
+
+def main():
+    print("Iniciando análisis geográfico de seguridad y criminalidad...")
+
+    # Realizar análisis geográfico
+    for archivo in ARCHIVOS_ANALIZAR:
+        nombre = archivo.replace(".csv", "")
+        df = load_dataset(archivo, filtrar=False)
+        if df is not None:
+            analizar_geografia_dataset(df, nombre)
+
+    # Analizar frentes de seguridad
+    analizar_frentes_seguridad()
 
-# Analizar frentes de seguridad
-analizar_frentes_seguridad()
+    # Analizar zonas de delitos
+    analizar_zonas_delitos()
 
-# Analizar zonas de delitos
-analizar_zonas_delitos()
+    print("\nAnálisis geográfico completado. Visualizaciones guardadas en la carpeta 'visualizaciones'.")
 
-print("\nAnálisis geográfico completado. Visualizaciones guardadas en la carpeta 'visualizaciones'.") 
\ No newline at end of file
+if __name__ == "__main__":
+    main()
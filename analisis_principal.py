@@ -6,56 +6,379 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import os
+import sys
 import time
-import subprocess
+import json
 import datetime
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import analisis_seguridad
+import analisis_patrones
+import analisis_geografico
+import fix_geographical_maps
+import teselas
+from carga_datos import load_dataset, precargar_datasets, DATOS_DIR, ANIO_MIN, ANIO_MAX
+from cubo import precargar_cubos
+from salidas import (iniciar_registro, archivos_escritos, asegurar_plotlyjs, ruta_especificacion,
+                     activar_cola, extraer_cola, escribir_trabajo)
+import manifiesto
+import instrumentacion
 import warnings
 warnings.filterwarnings('ignore')
 
-print("=" * 80)
-print("ANÁLISIS INTEGRAL DE DATOS DE SEGURIDAD Y CRIMINALIDAD")
-print("=" * 80)
-print(f"Fecha de ejecución: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-print("=" * 80)
-
 # Crear directorio de visualizaciones si no existe
 os.makedirs('visualizaciones', exist_ok=True)
 
 # Crear directorio para el informe
 os.makedirs('informe', exist_ok=True)
 
-# Función para ejecutar un script y medir tiempo
-def ejecutar_script(nombre_script):
-    print(f"\nEjecutando {nombre_script}...")
-    tiempo_inicio = time.time()
-    
-    try:
-        subprocess.run(['python', nombre_script], check=True)
-        tiempo_fin = time.time()
-        tiempo_total = tiempo_fin - tiempo_inicio
-        print(f"Completado {nombre_script} en {tiempo_total:.2f} segundos")
-        return True
-    except Exception as e:
-        print(f"Error al ejecutar {nombre_script}: {e}")
-        return False
-
-# Ejecutar los scripts de análisis en secuencia
-scripts = [
-    'analisis_seguridad.py',
-    'analisis_patrones.py',
-    'analisis_geografico.py',
-    'fix_geographical_maps.py'  # Agregado script para generar los mapas
-]
-
-resultados_scripts = {}
-for script in scripts:
-    resultado = ejecutar_script(script)
-    resultados_scripts[script] = resultado
+# ==========================================
+# Orquestación de las etapas de análisis
+# ==========================================
+
+# Unidad de trabajo: etapa, dataset o descripción, función a ejecutar,
+# archivos que recibe como DataFrames, si se filtran por año y archivos de los que depende
+Tarea = namedtuple('Tarea', ['etapa', 'nombre', 'funcion', 'archivos', 'filtrar', 'entradas'])
+
+def construir_tareas():
+    """Arma la lista de tareas independientes de los scripts de análisis"""
+    tareas = []
+
+    # Tendencias temporales, distribución por departamento y variables categóricas
+    for archivo in analisis_seguridad.ARCHIVOS:
+        nombre = archivo.replace(".csv", "")
+        tareas.append(Tarea('tendencias_temporales', nombre, analisis_seguridad.analizar_tendencias_dataset, [archivo], True, [archivo]))
+        tareas.append(Tarea('distribucion_departamentos', nombre, analisis_seguridad.analizar_geografia_dataset, [archivo], True, [archivo]))
+        tareas.append(Tarea('variables_categoricas', nombre, analisis_seguridad.analizar_variables_categoricas, [archivo], True, [archivo]))
+    archivos = ['Homicidios.csv', 'Capturas.csv']
+    tareas.append(Tarea('correlaciones', 'Homicidios_Capturas', analisis_seguridad.analizar_correlacion_homicidios_capturas,
+                        archivos, True, archivos))
+
+    # Patrones temporales y comparativas entre delitos
+    for archivo in analisis_patrones.ARCHIVOS_ANALIZAR:
+        nombre = archivo.replace(".csv", "")
+        tareas.append(Tarea('patrones_temporales', nombre, analisis_patrones.analizar_patrones_dataset, [archivo], True, [archivo]))
+    tareas.append(Tarea('comparativas', 'comparativa_delitos', analisis_patrones.comparativa_delitos, [], True,
+                        [f"{nombre}.csv" for nombre in analisis_patrones.DATASETS_COMPARAR]))
+    tareas.append(Tarea('comparativas', 'presupuesto_vs_delitos', analisis_patrones.analizar_presupuesto_vs_delitos, [], True,
+                        ['Presupuesto_de_Gastos.csv', 'Homicidios.csv']))
+
+    # Mapas geográficos (sin filtrar por año)
+    for archivo in analisis_geografico.ARCHIVOS_ANALIZAR:
+        nombre = archivo.replace(".csv", "")
+        tareas.append(Tarea('mapas_geograficos', nombre, analisis_geografico.analizar_geografia_dataset, [archivo], False, [archivo]))
+    tareas.append(Tarea('mapas_geograficos', 'zonas_delitos', analisis_geografico.analizar_zonas_delitos, [], False,
+                        list(analisis_geografico.TIPOS_DELITOS.values())))
+
+    # Pirámides de teselas de los mapas (las sirve server.py en /tiles/<capa>/<z>/<x>/<y>)
+    for archivo in teselas.archivos_teselas():
+        nombre = archivo.replace(".csv", "")
+        tareas.append(Tarea('teselas', nombre, teselas.construir_teselas_dataset, [archivo], False, [archivo]))
+
+    # Frentes de seguridad
+    tareas.append(Tarea('frentes_seguridad', 'analisis_frentes', analisis_geografico.analizar_frentes_seguridad, [], False,
+                        ['Frentes_De_Seguridad.csv']))
+    tareas.append(Tarea('frentes_seguridad', 'mapa_frentes_bogota', fix_geographical_maps.generar_mapa_frentes_seguridad_bogota, [], False,
+                        ['Frentes_De_Seguridad.csv']))
+
+    return tareas
+
+def archivos_requeridos(tareas):
+    """Devuelve todos los archivos que leen las tareas, incluidos los que cargan internamente"""
+    archivos = []
+    for tarea in tareas:
+        for archivo in tarea.entradas:
+            if archivo not in archivos:
+                archivos.append(archivo)
+    return archivos
+
+def clave_tarea(tarea):
+    return f"{tarea.etapa}/{tarea.nombre}"
+
+def firma(manifiesto_construccion, tarea):
+    """Firma de la tarea según el contenido de sus CSV, sus parámetros y la versión del código"""
+    parametros = {
+        'etapa': tarea.etapa,
+        'nombre': tarea.nombre,
+        'filtrar': tarea.filtrar,
+        'anios': [ANIO_MIN, ANIO_MAX] if tarea.filtrar else None
+    }
+    entradas = [os.path.join(DATOS_DIR, archivo) for archivo in tarea.entradas]
+    return manifiesto.firma_tarea(manifiesto_construccion, tarea.funcion, entradas, parametros)
+
+def ejecutar_tarea(tarea, diferir=False):
+    """Ejecuta una tarea en el proceso actual y devuelve su registro de tiempo y salidas.
+
+    Con diferir=True las figuras y mapas no se escriben: vuelven en 'escrituras' para que
+    ejecutar_tareas reparta su escritura entre los procesos.
+    """
+    inicio = time.perf_counter()
+    resultado = False
+    error = False
+    iniciar_registro()
+    instrumentacion.reiniciar()
+    if diferir:
+        activar_cola()
+
+    with instrumentacion.medir('tarea', clave_tarea(tarea)):
+        try:
+            if tarea.archivos:
+                dfs = [load_dataset(archivo, filtrar=tarea.filtrar) for archivo in tarea.archivos]
+                if len(dfs) == 1:
+                    # Tareas por dataset: reciben el DataFrame y su nombre
+                    resultado = dfs[0] is not None and bool(tarea.funcion(dfs[0], tarea.nombre))
+                else:
+                    resultado = bool(tarea.funcion(*dfs))
+            else:
+                resultado = bool(tarea.funcion())
+        except Exception as e:
+            print(f"Error en la etapa {tarea.etapa} ({tarea.nombre}): {e}")
+            error = True
+
+    registro = {
+        'etapa': tarea.etapa,
+        'nombre': tarea.nombre,
+        'completada': resultado,
+        'omitida': False,
+        'error': error,
+        'segundos': round(time.perf_counter() - inicio, 3),
+        'proceso': os.getpid(),
+        'salidas': archivos_escritos(),
+        # Los eventos medidos en un proceso hijo vuelven al principal con el registro
+        'eventos': instrumentacion.eventos()
+    }
+    if diferir:
+        registro['escrituras'] = extraer_cola()
+    return registro
+
+def ejecutar_tareas(tareas, procesos=None):
+    """Ejecuta las tareas en un grupo de procesos del tamaño de la máquina"""
+    procesos = procesos or os.cpu_count() or 1
+    registros = []
+
+    if procesos == 1 or len(tareas) <= 1:
+        # Sin paralelismo disponible: ejecutar en el mismo proceso
+        for tarea in tareas:
+            registros.append(ejecutar_tarea(tarea))
+        return registros
+
+    # Los datasets precargados se comparten con los procesos hijos al hacer fork.
+    # Las figuras y mapas que devuelve cada tarea se escriben en el mismo grupo de procesos,
+    # repartidos entre todos; una tarea termina (con sus salidas y eventos) cuando se
+    # escribió lo último que encoló, y no se vuelve hasta vaciar la cola
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        futuros = {pool.submit(ejecutar_tarea, tarea, True): tarea for tarea in tareas}
+        pendientes = {}
+        while futuros:
+            listos, _ = wait(futuros, return_when=FIRST_COMPLETED)
+            for futuro in listos:
+                origen = futuros.pop(futuro)
+                if isinstance(origen, Tarea):
+                    tarea = origen
+                    try:
+                        registro = futuro.result()
+                    except Exception as e:
+                        print(f"Error en la etapa {tarea.etapa} ({tarea.nombre}): {e}")
+                        registros.append({'etapa': tarea.etapa, 'nombre': tarea.nombre, 'completada': False,
+                                          'omitida': False, 'error': True, 'segundos': None, 'proceso': None, 'salidas': []})
+                        continue
+                    clave = clave_tarea(tarea)
+                    escrituras = registro.pop('escrituras')
+                    pendientes[clave] = len(escrituras)
+                    for trabajo in escrituras:
+                        futuros[pool.submit(escribir_trabajo, trabajo)] = (registro, trabajo['ruta'])
+                else:
+                    registro, ruta = origen
+                    clave = f"{registro['etapa']}/{registro['nombre']}"
+                    try:
+                        escritura = futuro.result()
+                        registro['salidas'] += [salida for salida in escritura['salidas'] if salida not in registro['salidas']]
+                        registro['eventos'] += escritura['eventos']
+                        registro['segundos'] = round(registro['segundos'] + escritura['segundos'], 3)
+                    except Exception as e:
+                        print(f"Error al escribir {ruta} ({registro['etapa']}/{registro['nombre']}): {e}")
+                        registro['error'] = True
+                    pendientes[clave] -= 1
+
+                if not pendientes[clave]:
+                    registros.append(registro)
+
+    return registros
+
+def generar_reporte_tiempos(registros, tiempo_carga, tiempo_total, procesos, ruta='informe/tiempos_ejecucion.json'):
+    """Resume los tiempos por etapa, los imprime y los guarda en formato JSON"""
+    etapas = {}
+    for registro in registros:
+        etapa = etapas.setdefault(registro['etapa'], {'tareas': 0, 'omitidas': 0, 'fallidas': 0, 'segundos': 0.0})
+        etapa['tareas'] += 1
+        if registro['omitida']:
+            etapa['omitidas'] += 1
+        elif not registro['completada']:
+            etapa['fallidas'] += 1
+        etapa['segundos'] = round(etapa['segundos'] + (registro['segundos'] or 0), 3)
+
+    reporte = {
+        'fecha': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'procesos': procesos,
+        'segundos_carga': round(tiempo_carga, 3),
+        'segundos_total': round(tiempo_total, 3),
+        'etapas': etapas,
+        'tareas': sorted(registros, key=lambda r: (r['etapa'], r['nombre']))
+    }
+
+    print("\nTiempos por etapa:")
+    print(f"  {'carga de datos':<28} {tiempo_carga:>8.2f} s")
+    for nombre, etapa in etapas.items():
+        print(f"  {nombre:<28} {etapa['segundos']:>8.2f} s  ({etapa['tareas']} tareas, "
+              f"{etapa['omitidas']} sin cambios, {etapa['fallidas']} sin resultado)")
+    print(f"  {'total (tiempo real)':<28} {tiempo_total:>8.2f} s")
+
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(reporte, f, ensure_ascii=False, indent=2)
+    print(f"Reporte de tiempos guardado en '{ruta}'")
+
+    return reporte
+
+def ejecutar_analisis(procesos=None, forzar=False):
+    """Ejecuta las etapas de análisis cuyas entradas, parámetros o código cambiaron.
+
+    Las tareas cuya firma coincide con la registrada en el manifiesto de construcción
+    y cuyas salidas siguen existiendo se omiten, salvo que forzar sea True.
+    """
+    procesos = procesos or os.cpu_count() or 1
+    tareas = construir_tareas()
+    inicio = time.perf_counter()
+
+    # Comparar cada tarea con el manifiesto de la construcción anterior
+    manifiesto_construccion = manifiesto.cargar_manifiesto()
+    firmas = {}
+    pendientes = []
+    registros = []
+    for tarea in tareas:
+        firmas[clave_tarea(tarea)] = firma(manifiesto_construccion, tarea)
+        if not forzar and manifiesto.tarea_vigente(manifiesto_construccion, clave_tarea(tarea), firmas[clave_tarea(tarea)]):
+            registros.append({'etapa': tarea.etapa, 'nombre': tarea.nombre, 'completada': True, 'omitida': True,
+                              'error': False, 'segundos': 0.0, 'proceso': None, 'salidas': []})
+        else:
+            pendientes.append(tarea)
+
+    print(f"\n{len(tareas) - len(pendientes)} tareas sin cambios desde la última ejecución")
+
+    instrumentacion.reiniciar()
+    print("\nCargando datasets...")
+    with instrumentacion.medir('precarga', 'datasets'):
+        precargar_datasets(archivos_requeridos(pendientes))
+
+    print("\nPreparando cubos de conteos...")
+    with instrumentacion.medir('precarga', 'cubos'):
+        precargar_cubos(archivos_requeridos(pendientes))
+    tiempo_carga = time.perf_counter() - inicio
+    eventos = instrumentacion.eventos()
+
+    print(f"\nEjecutando {len(pendientes)} tareas de análisis en {procesos} proceso(s)...")
+    ejecutados = ejecutar_tareas(pendientes, procesos)
+    registros += ejecutados
+
+    # Registrar las tareas que terminaron sin errores junto con sus salidas
+    for registro in ejecutados:
+        if not registro['error']:
+            clave = f"{registro['etapa']}/{registro['nombre']}"
+            manifiesto.registrar_tarea(manifiesto_construccion, clave, firmas[clave], registro['salidas'])
+    manifiesto.guardar_manifiesto(manifiesto_construccion)
+
+    for registro in ejecutados:
+        eventos += registro.pop('eventos', [])
+    tiempo_total = time.perf_counter() - inicio
+    instrumentacion.guardar_reporte(eventos, 'informe/run_report.json', {
+        'procesos': procesos,
+        'segundos_carga': round(tiempo_carga, 3),
+        'segundos_total': round(tiempo_total, 3),
+        'tareas_ejecutadas': len(ejecutados),
+        'tareas_omitidas': len(tareas) - len(pendientes)
+    })
+    return generar_reporte_tiempos(registros, tiempo_carga, tiempo_total, procesos)
 
 # ==========================================
 # Generar informe HTML con los resultados
 # ==========================================
 
+# Monta cada figura solo cuando entra en pantalla y la desmonta al salir, con un único
+# plotly.js para toda la página. Las figuras de plotly se dibujan desde su especificación
+# JSON incrustada; los mapas de folium se cargan en un iframe que también se descarta.
+SCRIPT_CARGA_DIFERIDA = """
+    <script>
+    (function () {
+        function montar(el) {
+            if (el.dataset.montado) return;
+            el.dataset.montado = '1';
+            if (el.dataset.src) {
+                var iframe = document.createElement('iframe');
+                iframe.src = el.dataset.src;
+                el.appendChild(iframe);
+                return;
+            }
+            var spec = JSON.parse(document.getElementById(el.dataset.spec).textContent);
+            var layout = spec.layout || {};
+            // La plantilla compartida por las figuras se incrusta una sola vez en la página
+            if (spec.plantilla) layout.template = JSON.parse(document.getElementById(spec.plantilla).textContent);
+            delete layout.width;
+            delete layout.height;
+            layout.autosize = true;
+            Plotly.newPlot(el, {data: spec.data, layout: layout, frames: spec.frames, config: {responsive: true}});
+        }
+        function desmontar(el) {
+            if (!el.dataset.montado) return;
+            delete el.dataset.montado;
+            if (!el.dataset.src) Plotly.purge(el);
+            el.innerHTML = '';
+        }
+        var observador = new IntersectionObserver(function (entradas) {
+            entradas.forEach(function (entrada) {
+                if (entrada.isIntersecting) montar(entrada.target);
+                else desmontar(entrada.target);
+            });
+        }, {rootMargin: '300px 0px'});
+        document.querySelectorAll('.viz-figura').forEach(function (el) { observador.observe(el); });
+    })();
+    </script>
+"""
+
+def script_plotly_informe():
+    """Etiqueta <script> que carga la copia compartida de plotly.js desde informe/"""
+    nombre = asegurar_plotlyjs('visualizaciones')
+    return f'<script charset="utf-8" src="../visualizaciones/{nombre}"></script>'
+
+def figura_diferida(archivo, indice, plantillas=None):
+    """Contenedor de una visualización que se monta al hacerse visible.
+
+    Si la figura tiene especificación JSON se incrusta en la página (y se anota en
+    plantillas la plantilla que usa); si no (mapas de folium) se carga el HTML en un iframe.
+    """
+    especificacion = ruta_especificacion(os.path.join('visualizaciones', archivo))
+    if not os.path.exists(especificacion):
+        return f'<div class="viz-figura" data-src="../visualizaciones/{archivo}"></div>'
+
+    with open(especificacion, encoding='utf-8') as f:
+        contenido = f.read()
+    plantilla = json.loads(contenido).get('plantilla')
+    if plantilla and plantillas is not None:
+        plantillas.add(plantilla)
+    # Evitar que un "</script>" dentro de los datos cierre la etiqueta
+    contenido = contenido.replace('</', '<\\/')
+    return (f'<div class="viz-figura" data-spec="spec-{indice}"></div>\n'
+            f'                        <script type="application/json" id="spec-{indice}">{contenido}</script>')
+
+def plantillas_incrustadas(plantillas):
+    """Etiquetas <script> con las plantillas de layout que usan las figuras de la página"""
+    etiquetas = []
+    for nombre in sorted(plantillas):
+        ruta = os.path.join('visualizaciones', nombre)
+        if os.path.exists(ruta):
+            with open(ruta, encoding='utf-8') as f:
+                contenido = f.read().replace('</', '<\\/')
+            etiquetas.append(f'<script type="application/json" id="{nombre}">{contenido}</script>')
+    return '\n    '.join(etiquetas)
+
 def generar_informe_html():
     print("\nGenerando informe HTML con los resultados del análisis...")
     
@@ -100,6 +423,7 @@ def generar_informe_html():
         <meta charset="UTF-8">
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
         <title>Análisis de Datos de Seguridad y Criminalidad</title>
+        {script_plotly_informe()}
         <style>
             body {{
                 font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
@@ -159,11 +483,15 @@ def generar_informe_html():
                 font-size: 14px;
                 text-align: center;
             }}
-            iframe {{
-                border: none;
+            .viz-figura {{
                 width: 100%;
                 height: 400px;
             }}
+            .viz-figura iframe {{
+                border: none;
+                width: 100%;
+                height: 100%;
+            }}
             .footer {{
                 text-align: center;
                 margin-top: 50px;
@@ -198,6 +526,8 @@ def generar_informe_html():
     """
     
     # Agregar secciones para cada categoría
+    indice = 0
+    plantillas = set()
     for categoria, archivos in categorias.items():
         if archivos:
             html_content += f"""
@@ -211,9 +541,10 @@ def generar_informe_html():
                 html_content += f"""
                     <div class="viz-item">
                         <h4>{nombre_visual}</h4>
-                        <iframe src="../visualizaciones/{archivo}"></iframe>
+                        {figura_diferida(archivo, indice, plantillas)}
                     </div>
                 """
+                indice += 1
             
             html_content += """
                 </div>
@@ -226,6 +557,7 @@ def generar_informe_html():
             <p>Análisis realizado con Python utilizando pandas, matplotlib, seaborn, plotly y folium.</p>
             <p>Análisis de Datos de Seguridad y Criminalidad</p>
         </div>
+    """ + plantillas_incrustadas(plantillas) + SCRIPT_CARGA_DIFERIDA + """
     </body>
     </html>
     """
@@ -236,8 +568,6 @@ def generar_informe_html():
     
     print(f"Informe HTML generado exitosamente en 'informe/reporte_analisis.html'")
 
-# Generar informe HTML
-generar_informe_html()
 
 # ==========================================
 # Generar informe HTML con visualizaciones a pantalla completa
@@ -287,6 +617,7 @@ def generar_informe_pantalla_completa():
         <meta charset="UTF-8">
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
         <title>Análisis de Datos de Seguridad y Criminalidad - Pantalla Completa</title>
+        {script_plotly_informe()}
         <style>
             body {{
                 font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
@@ -345,11 +676,15 @@ def generar_informe_pantalla_completa():
                 font-size: 18px;
                 text-align: center;
             }}
-            iframe {{
-                border: none;
+            .viz-figura {{
                 width: 100%;
                 height: 800px;
             }}
+            .viz-figura iframe {{
+                border: none;
+                width: 100%;
+                height: 100%;
+            }}
             .footer {{
                 text-align: center;
                 margin-top: 50px;
@@ -395,7 +730,7 @@ def generar_informe_pantalla_completa():
                 .nav {{
                     display: none;
                 }}
-                iframe {{
+                .viz-figura {{
                     height: 500px;
                 }}
                 .viz-item {{
@@ -428,6 +763,8 @@ def generar_informe_pantalla_completa():
     """
     
     # Agregar secciones para cada categoría
+    indice = 0
+    plantillas = set()
     for categoria, archivos in categorias.items():
         if archivos:
             seccion_id = categoria.lower().replace(" ", "-")
@@ -442,9 +779,10 @@ def generar_informe_pantalla_completa():
                 html_content += f"""
                     <div class="viz-item">
                         <h4>{nombre_visual}</h4>
-                        <iframe src="../visualizaciones/{archivo}"></iframe>
+                        {figura_diferida(archivo, indice, plantillas)}
                     </div>
                 """
+                indice += 1
             
             html_content += """
                 </div>
@@ -458,6 +796,7 @@ def generar_informe_pantalla_completa():
             <p>Análisis realizado con Python utilizando pandas, matplotlib, seaborn, plotly y folium.</p>
             <p>Análisis de Datos de Seguridad y Criminalidad</p>
         </div>
+    """ + plantillas_incrustadas(plantillas) + SCRIPT_CARGA_DIFERIDA + """
     </body>
     </html>
     """
@@ -468,8 +807,6 @@ def generar_informe_pantalla_completa():
     
     print(f"Informe HTML a pantalla completa generado exitosamente en 'informe/reporte_pantalla_completa.html'")
 
-# Generar informe HTML a pantalla completa
-generar_informe_pantalla_completa()
 
 # ==========================================
 # Generar archivo README.md con instrucciones
@@ -489,12 +826,28 @@ Este proyecto realiza un análisis exhaustivo de diversos conjuntos de datos rel
 - **analisis_geografico.py**: Realiza análisis geográficos y mapas.
 - **fix_geographical_maps.py**: Genera mapas interactivos de delitos por departamentos y municipios.
 - **analisis_principal.py**: Coordina la ejecución de todos los scripts de análisis.
+- **carga_datos.py**: Carga compartida de los CSV con caché columnar en `.cache/datasets/`.
+- **esquemas.py**: Registro de esquemas de los CSV: rol y tipo de cada columna que se lee.
+- **agregacion.py**: Conteos de casos ponderados por la columna `CANTIDAD`/`Cantidad`, iguales sobre registros individuales o sobre datasets agregados.
+- **cubo.py**: Cubos de conteos por año, mes, día de la semana, hora, departamento, municipio y categoría, con cortes densos vía NumPy (los patrones temporales y sus mapas de calor salen de un único arreglo día × hora × mes × año por dataset).
+- **capas_mapa.py**: Capas de folium (rejillas de densidad, teselas y GeoJSON) construidas en una sola pasada vectorizada sobre todas las coordenadas.
+- **densidad.py**: Rejillas de densidad de casos por nivel de zoom calculadas con NumPy sobre todas las coordenadas.
+- **teselas.py**: Pirámide de teselas z/x/y con conteos por celda para los mapas, servida por `server.py` en `/tiles/<capa>/<z>/<x>/<y>`.
+- **divipola.py**: Índice de códigos DANE de departamentos y municipios (nombres canónicos, variantes y coordenadas de referencia) para unir los datasets por código.
+- **normalizacion.py**: Detección de la codificación real de cada CSV y normalización de nombres (mojibake, tildes, mayúsculas y alias) calculada por valor distinto.
+- **gunicorn.conf.py**: Configuración de producción de `server.py` (precarga de datos, procesos e hilos).
+- **benchmark.py**: Benchmark de carga, análisis y escritura con datasets sintéticos de varios tamaños.
+- **instrumentacion.py**: Medición de tiempos, memoria, filas y bytes escritos por etapa.
+- **memoizacion.py**: Resultados intermedios guardados en disco según el contenido de los datos.
+- **salidas.py**: Escritura de las visualizaciones generadas.
+- **manifiesto.py**: Manifiesto de construcción para regenerar solo las visualizaciones cuyas entradas cambiaron.
 
 ## Resultados
 
 Los resultados del análisis se encuentran en:
 
 - **visualizaciones/**: Contiene todas las visualizaciones generadas.
+- **teselas/**: Teselas de los mapas. Abiertos desde el disco, los mapas muestran la rejilla de densidad hasta zoom 8; los niveles de zoom mayores necesitan `server.py`.
 - **informe/reporte_analisis.html**: Informe completo con todas las visualizaciones.
 
 ## Requisitos
@@ -508,6 +861,7 @@ matplotlib
 seaborn
 plotly
 folium
+pyarrow
 ```
 
 Puede instalar todas las dependencias con:
@@ -516,12 +870,15 @@ Puede instalar todas las dependencias con:
 pip install -r requirements.txt
 ```
 
-## Ejecución
+## Arquitectura / ejecución
 
-Para ejecutar el análisis completo:
+`analisis_principal.py` carga cada CSV una sola vez (caché en `.cache/`), reparte las tareas de análisis entre procesos y solo regenera las visualizaciones cuyas entradas cambiaron (`--forzar` las regenera todas). `server.py` sirve `visualizaciones/`, las consultas a los cubos de conteos (`/api/agg/<dataset>`) y las teselas de los mapas. `benchmark.py` mide carga, análisis y escritura con datasets sintéticos.
 
 ```
 python analisis_principal.py
+gunicorn server:app
+python benchmark.py
+python -m pytest
 ```
 
 """
@@ -532,8 +889,6 @@ python analisis_principal.py
     
     print("Archivo README.md generado exitosamente")
 
-# Generar README
-generar_readme()
 
 # Generar archivo de requisitos
 def generar_requirements():
@@ -543,8 +898,11 @@ def generar_requirements():
 numpy>=1.20.0
 matplotlib>=3.4.0
 seaborn>=0.11.0
-plotly>=5.0.0
+plotly>=5.19.0
 folium>=0.14.0
+pyarrow>=8.0.0
+brotli>=1.0.0
+orjson>=3.9.0
 """
     
     # Guardar archivo de requisitos
@@ -553,17 +911,45 @@ folium>=0.14.0
     
     print("Archivo requirements.txt generado exitosamente")
 
-# Generar requirements.txt
-generar_requirements()
-
-print("\n" + "=" * 80)
-print("ANÁLISIS COMPLETADO")
-print("=" * 80)
-print(f"Fecha y hora de finalización: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-print(f"Visualizaciones generadas: {len(os.listdir('visualizaciones'))}")
-print(f"Informes generados:")
-print(f"  - Informe principal: informe/reporte_analisis.html")
-print(f"  - Informe a pantalla completa: informe/reporte_pantalla_completa.html")
-print("=" * 80)
-print("\nPara ver los informes completos, abra los archivos HTML en su navegador.") 
-print("El informe 'reporte_pantalla_completa.html' muestra cada visualización a tamaño completo para una mejor exploración de los detalles.") 
\ No newline at end of file
+# ==========================================
+# Ejecución principal
+# ==========================================
+
+def main():
+    print("=" * 80)
+    print("ANÁLISIS INTEGRAL DE DATOS DE SEGURIDAD Y CRIMINALIDAD")
+    print("=" * 80)
+    print(f"Fecha de ejecución: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 80)
+
+    # Ejecutar las etapas de análisis compartiendo los datasets cargados;
+    # con --forzar se regeneran todas las visualizaciones y con --perfil se guarda un
+    # perfil de cProfile (en un solo proceso, para que incluya el trabajo de todas las tareas)
+    perfil = '--perfil' in sys.argv[1:]
+    with instrumentacion.perfilar('informe/run_profile.prof' if perfil else None):
+        ejecutar_analisis(procesos=1 if perfil else None, forzar='--forzar' in sys.argv[1:])
+
+    # Generar informes HTML
+    generar_informe_html()
+    generar_informe_pantalla_completa()
+
+    # Generar README y requirements.txt
+    generar_readme()
+    generar_requirements()
+
+    print("\n" + "=" * 80)
+    print("ANÁLISIS COMPLETADO")
+    print("=" * 80)
+    print(f"Fecha y hora de finalización: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"Visualizaciones generadas: {len(os.listdir('visualizaciones'))}")
+    print(f"Informes generados:")
+    print(f"  - Informe principal: informe/reporte_analisis.html")
+    print(f"  - Informe a pantalla completa: informe/reporte_pantalla_completa.html")
+    print(f"  - Tiempos de ejecución: informe/tiempos_ejecucion.json")
+    print("=" * 80)
+    print("\nPara ver los informes completos, abra los archivos HTML en su navegador.") 
+    print("El informe 'reporte_pantalla_completa.html' muestra cada visualización a tamaño completo para una mejor exploración de los detalles.")
+
+if __name__ == "__main__":
+    main()
+ 
\ No newline at end of file
@@ -7,6 +7,11 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import os
 from datetime import datetime
+from carga_datos import load_dataset, reemplazar_valores
+import esquemas
+from agregacion import contar, contar_valores, total_registros, total_casos
+from instrumentacion import instrumentar
+from salidas import guardar_figura
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -23,78 +28,12 @@ colors = px.colors.qualitative.Plotly
 # Create output directory for visualizations
 os.makedirs('visualizaciones', exist_ok=True)
 
-print("Iniciando análisis de datos de seguridad y criminalidad...")
-
-# Function to load and clean datasets
-def load_dataset(filename):
-    print(f"Cargando {filename}...")
-    try:
-        # Intentar cargar con punto y coma como delimitador
-        df = pd.read_csv(f"datos/{filename}", encoding='latin1', low_memory=False, sep=';')
-        
-        # Verificar si los datos se cargaron en una sola columna
-        if df.shape[1] == 1 and ',' in df.iloc[0, 0]:
-            # Si es así, dividir la columna
-            column_name = df.columns[0]
-            new_df = df[column_name].str.split(',', expand=True)
-            
-            # Extraer los nombres de las columnas de la primera fila si contiene encabezados
-            if ',' in column_name:
-                headers = column_name.split(',')
-                new_df.columns = headers
-            
-            df = new_df
-        
-        # Filtrar datos entre 2010 y 2024 si hay columna de año
-        posibles_cols_anio = [col for col in df.columns if 'AÃ±o' in col or 'Año' in col or 'ANO' in col.upper() or 'YEAR' in col.upper()]
-        
-        if posibles_cols_anio:
-            anio_col = posibles_cols_anio[0]
-            print(f"  Filtrando datos entre 2010 y 2024 usando columna {anio_col}")
-            
-            # Convertir a numérico y filtrar
-            df[anio_col] = pd.to_numeric(df[anio_col], errors='coerce')
-            df = df[(df[anio_col] >= 2010) & (df[anio_col] <= 2024)]
-        elif 'FECHA' in df.columns:
-            print(f"  Filtrando datos entre 2010 y 2024 usando columna FECHA")
-            # Convertir a datetime y filtrar
-            df['FECHA'] = pd.to_datetime(df['FECHA'], errors='coerce')
-            df = df[(df['FECHA'].dt.year >= 2010) & (df['FECHA'].dt.year <= 2024)]
-        
-        print(f"  Filas después de filtrar por año: {df.shape[0]}, Columnas: {df.shape[1]}")
-        return df
-    except Exception as e:
-        # Si falla, intentar con coma como delimitador
-        try:
-            df = pd.read_csv(f"datos/{filename}", encoding='latin1', low_memory=False)
-            
-            # Filtrar datos entre 2010 y 2024 si hay columna de año
-            posibles_cols_anio = [col for col in df.columns if 'AÃ±o' in col or 'Año' in col or 'ANO' in col.upper() or 'YEAR' in col.upper()]
-            
-            if posibles_cols_anio:
-                anio_col = posibles_cols_anio[0]
-                print(f"  Filtrando datos entre 2010 y 2024 usando columna {anio_col}")
-                
-                # Convertir a numérico y filtrar
-                df[anio_col] = pd.to_numeric(df[anio_col], errors='coerce')
-                df = df[(df[anio_col] >= 2010) & (df[anio_col] <= 2024)]
-            elif 'FECHA' in df.columns:
-                print(f"  Filtrando datos entre 2010 y 2024 usando columna FECHA")
-                # Convertir a datetime y filtrar
-                df['FECHA'] = pd.to_datetime(df['FECHA'], errors='coerce')
-                df = df[(df['FECHA'].dt.year >= 2010) & (df['FECHA'].dt.year <= 2024)]
-            
-            print(f"  Filas después de filtrar por año: {df.shape[0]}, Columnas: {df.shape[1]}")
-            return df
-        except Exception as e:
-            print(f"Error al cargar {filename}: {e}")
-            return None
-
 # Helper function to get dataset summary
 def dataset_summary(df, name):
     summary = {
         "nombre": name,
-        "filas": df.shape[0],
+        "filas": total_registros(df),
+        "casos": total_casos(df),
         "columnas": df.shape[1],
         "columnas_datos": list(df.columns),
         "tipos_datos": {col: str(df[col].dtype) for col in df.columns},
@@ -108,7 +47,7 @@ def dataset_summary(df, name):
 # ==========================================
 
 # Lista de archivos
-archivos = [
+ARCHIVOS = [
     "Hurto_Personas.csv",
     "Capturas.csv",
     "Frentes_De_Seguridad.csv",
@@ -123,111 +62,119 @@ archivos = [
     "Violencia_Intrafamiliar.csv"
 ]
 
-# Diccionario para almacenar datasets
-datasets = {}
-summaries = []
-
-# Cargar cada dataset
-for archivo in archivos:
-    nombre = archivo.replace(".csv", "")
-    df = load_dataset(archivo)
-    if df is not None:
-        datasets[nombre] = df
-        summaries.append(dataset_summary(df, nombre))
-
-print("\nResumen de los datasets cargados:")
-for summary in summaries:
-    print(f"\n{summary['nombre']}:")
-    print(f"  Filas: {summary['filas']}, Columnas: {summary['columnas']}")
-    print(f"  Valores nulos: {summary['valores_nulos']} ({summary['porcentaje_nulos']}%)")
-    print(f"  Columnas: {', '.join(summary['columnas_datos'][:5])}{'...' if len(summary['columnas_datos']) > 5 else ''}")
+def cargar_datasets(archivos=ARCHIVOS):
+    """Carga cada dataset de la lista y devuelve un diccionario nombre -> DataFrame"""
+    # Diccionario para almacenar datasets
+    datasets = {}
+
+    # Cargar cada dataset
+    for archivo in archivos:
+        nombre = archivo.replace(".csv", "")
+        df = load_dataset(archivo)
+        if df is not None:
+            datasets[nombre] = df
+
+    return datasets
+
+def imprimir_resumen(datasets):
+    """Imprime el resumen de filas, columnas y nulos de los datasets cargados"""
+    summaries = [dataset_summary(df, nombre) for nombre, df in datasets.items()]
+
+    print("\nResumen de los datasets cargados:")
+    for summary in summaries:
+        print(f"\n{summary['nombre']}:")
+        print(f"  Filas: {summary['filas']}, Casos: {summary['casos']}, Columnas: {summary['columnas']}")
+        print(f"  Valores nulos: {summary['valores_nulos']} ({summary['porcentaje_nulos']}%)")
+        print(f"  Columnas: {', '.join(summary['columnas_datos'][:5])}{'...' if len(summary['columnas_datos']) > 5 else ''}")
 
 # ==========================================
 # Análisis de tendencias temporales
 # ==========================================
 
+# Valores de género sin información que se agrupan como 'NO REPORTADO'
+NO_REPORTADO = ['NO REPORTA', '-', 'NO REPORTADO', 'NO INFORMA', 'SIN INFORMACIÓN', 'DESCONOCIDO']
+
+def valores_categoria(df, columna):
+    """Valores de una columna categórica listos para contar, sin modificar df;
+    en las columnas de género los valores sin información se agrupan como 'NO REPORTADO'"""
+    if columna == esquemas.columna(df, 'genero'):
+        return reemplazar_valores(df[columna], NO_REPORTADO, 'NO REPORTADO')
+    return df[columna]
+
+@instrumentar('analisis')
 def analizar_tendencia_temporal(df, nombre, columna_fecha=None, columna_categoria=None):
     """Analiza y visualiza tendencias temporales en los datos"""
     try:
         print(f"\nAnalizando tendencias temporales en {nombre}...")
         
         # Caso 1: Columnas separadas de Año, Mes, Día
-        if 'Año' in df.columns or 'AÑO' in df.columns:
-            # Identificar la columna de año (puede variar en mayúsculas/minúsculas o tener acentos)
-            columna_anio = next((col for col in df.columns if col.upper() in ['AÑO', 'ANO', 'YEAR']), None)
+        columna_anio = esquemas.columna(df, 'anio')
+        if columna_anio:
+            print(f"  Usando columna de año: {columna_anio}")
+            # Asegurarse que es numérico (Series derivada: df no se modifica)
+            anios = pd.to_numeric(df[columna_anio], errors='coerce').rename('año')
             
-            if columna_anio:
-                print(f"  Usando columna de año: {columna_anio}")
-                # Asegurarse que es numérico
-                df['año'] = pd.to_numeric(df[columna_anio], errors='coerce')
-                
-                # Crear agregación por año
-                yearly_counts = df.groupby('año').size().reset_index(name='cantidad')
-                
-                # Visualización con Plotly
-                fig = px.line(yearly_counts, x='año', y='cantidad', 
-                             title=f'Tendencia Anual - {nombre}',
-                             labels={'cantidad': 'Cantidad de Casos', 'año': 'Año'},
-                             markers=True,
-                             width=1200,  # Mayor ancho
-                             height=700)  # Mayor altura
-                
-                fig.update_layout(
-                    template='plotly_white',
-                    legend_title_text='',
-                    plot_bgcolor='white',
-                    font=dict(family="Arial", size=14),  # Fuente más grande
-                    title=dict(font=dict(size=24)),  # Título más grande
-                    xaxis=dict(showgrid=True, gridcolor='lightgray'),
-                    yaxis=dict(showgrid=True, gridcolor='lightgray')
-                )
-                
-                fig.write_html(f'visualizaciones/{nombre}_tendencia_anual.html')
-                
-                # Si hay una columna de categoría, analizar tendencias por categoría
-                if columna_categoria and columna_categoria in df.columns:
-                    if df[columna_categoria].nunique() <= 10:  # Solo si hay un número razonable de categorías
-                        # Crear copia del dataframe para no modificar el original
-                        df_copy = df.copy()
-                        
-                        # Normalizar valores de género si corresponde
-                        if columna_categoria.upper() in ['GENERO', 'GÉNERO', 'GÃ©NERO']:
-                            # Normalizar valores no reportados
-                            no_reportado = ['NO REPORTA', '-', 'NO REPORTADO', 'NO INFORMA', 'SIN INFORMACIÓN', 'DESCONOCIDO']
-                            df_copy[columna_categoria] = df_copy[columna_categoria].replace(no_reportado, 'NO REPORTADO')
-                        
-                        category_yearly = df_copy.groupby(['año', columna_categoria]).size().reset_index(name='cantidad')
-                        
-                        fig = px.line(category_yearly, x='año', y='cantidad', color=columna_categoria,
-                                     title=f'Tendencia Anual por {columna_categoria} - {nombre}',
-                                     labels={'cantidad': 'Cantidad de Casos', 'año': 'Año'},
-                                     markers=True,
-                                     width=1200,  # Mayor ancho
-                                     height=700)  # Mayor altura
-                        
-                        fig.update_layout(
-                            template='plotly_white',
-                            legend_title_text=columna_categoria,
-                            plot_bgcolor='white',
-                            font=dict(family="Arial", size=14),  # Fuente más grande
-                            title=dict(font=dict(size=24)),  # Título más grande
-                            xaxis=dict(showgrid=True, gridcolor='lightgray'),
-                            yaxis=dict(showgrid=True, gridcolor='lightgray')
-                        )
-                        
-                        fig.write_html(f'visualizaciones/{nombre}_tendencia_por_{columna_categoria}.html')
-                
-                return True
+            # Crear agregación por año
+            yearly_counts = contar(df, anios).reset_index(name='cantidad')
+            
+            # Visualización con Plotly
+            fig = px.line(yearly_counts, x='año', y='cantidad', 
+                         title=f'Tendencia Anual - {nombre}',
+                         labels={'cantidad': 'Cantidad de Casos', 'año': 'Año'},
+                         markers=True,
+                         width=1200,  # Mayor ancho
+                         height=700)  # Mayor altura
+            
+            fig.update_layout(
+                template='plotly_white',
+                legend_title_text='',
+                plot_bgcolor='white',
+                font=dict(family="Arial", size=14),  # Fuente más grande
+                title=dict(font=dict(size=24)),  # Título más grande
+                xaxis=dict(showgrid=True, gridcolor='lightgray'),
+                yaxis=dict(showgrid=True, gridcolor='lightgray')
+            )
+            
+            guardar_figura(fig, f'visualizaciones/{nombre}_tendencia_anual.html')
+            
+            # Si hay una columna de categoría, analizar tendencias por categoría
+            if columna_categoria and columna_categoria in df.columns:
+                if df[columna_categoria].nunique() <= 10:  # Solo si hay un número razonable de categorías
+                    # Normalizar valores de género si corresponde
+                    categoria = valores_categoria(df, columna_categoria)
+                    
+                    category_yearly = contar(df, [anios, categoria]).reset_index(name='cantidad')
+                    
+                    fig = px.line(category_yearly, x='año', y='cantidad', color=columna_categoria,
+                                 title=f'Tendencia Anual por {columna_categoria} - {nombre}',
+                                 labels={'cantidad': 'Cantidad de Casos', 'año': 'Año'},
+                                 markers=True,
+                                 width=1200,  # Mayor ancho
+                                 height=700)  # Mayor altura
+                    
+                    fig.update_layout(
+                        template='plotly_white',
+                        legend_title_text=columna_categoria,
+                        plot_bgcolor='white',
+                        font=dict(family="Arial", size=14),  # Fuente más grande
+                        title=dict(font=dict(size=24)),  # Título más grande
+                        xaxis=dict(showgrid=True, gridcolor='lightgray'),
+                        yaxis=dict(showgrid=True, gridcolor='lightgray')
+                    )
+                    
+                    guardar_figura(fig, f'visualizaciones/{nombre}_tendencia_por_{columna_categoria}.html')
+            
+            return True
         
         # Caso 2: Una sola columna de fecha
         elif columna_fecha and columna_fecha in df.columns:
             print(f"  Usando columna de fecha: {columna_fecha}")
-            # Convertir columna de fecha
-            df[columna_fecha] = pd.to_datetime(df[columna_fecha], errors='coerce')
-            df['año'] = df[columna_fecha].dt.year
+            # Convertir columna de fecha (Series derivadas: df no se modifica)
+            fechas = pd.to_datetime(df[columna_fecha], errors='coerce', dayfirst=True)
+            anios = fechas.dt.year.rename('año')
             
             # Crear agregación por año
-            yearly_counts = df.groupby('año').size().reset_index(name='cantidad')
+            yearly_counts = contar(df, anios).reset_index(name='cantidad')
             
             # Visualización con Plotly
             fig = px.line(yearly_counts, x='año', y='cantidad', 
@@ -247,21 +194,15 @@ def analizar_tendencia_temporal(df, nombre, columna_fecha=None, columna_categori
                 yaxis=dict(showgrid=True, gridcolor='lightgray')
             )
             
-            fig.write_html(f'visualizaciones/{nombre}_tendencia_anual.html')
+            guardar_figura(fig, f'visualizaciones/{nombre}_tendencia_anual.html')
             
             # Si hay una columna de categoría, analizar tendencias por categoría
             if columna_categoria and columna_categoria in df.columns:
                 if df[columna_categoria].nunique() <= 10:  # Solo si hay un número razonable de categorías
-                    # Crear copia del dataframe para no modificar el original
-                    df_copy = df.copy()
-                    
                     # Normalizar valores de género si corresponde
-                    if columna_categoria.upper() in ['GENERO', 'GÉNERO', 'GÃ©NERO']:
-                        # Normalizar valores no reportados
-                        no_reportado = ['NO REPORTA', '-', 'NO REPORTADO', 'NO INFORMA', 'SIN INFORMACIÓN', 'DESCONOCIDO']
-                        df_copy[columna_categoria] = df_copy[columna_categoria].replace(no_reportado, 'NO REPORTADO')
+                    categoria = valores_categoria(df, columna_categoria)
                     
-                    category_yearly = df_copy.groupby(['año', columna_categoria]).size().reset_index(name='cantidad')
+                    category_yearly = contar(df, [anios, categoria]).reset_index(name='cantidad')
                     
                     fig = px.line(category_yearly, x='año', y='cantidad', color=columna_categoria,
                                  title=f'Tendencia Anual por {columna_categoria} - {nombre}',
@@ -280,7 +221,7 @@ def analizar_tendencia_temporal(df, nombre, columna_fecha=None, columna_categori
                         yaxis=dict(showgrid=True, gridcolor='lightgray')
                     )
                     
-                    fig.write_html(f'visualizaciones/{nombre}_tendencia_por_{columna_categoria}.html')
+                    guardar_figura(fig, f'visualizaciones/{nombre}_tendencia_por_{columna_categoria}.html')
             
             return True
         else:
@@ -290,15 +231,19 @@ def analizar_tendencia_temporal(df, nombre, columna_fecha=None, columna_categori
         print(f"  Error al analizar tendencias temporales en {nombre}: {e}")
         return False
 
-# Analizar tendencias en cada dataset según sus columnas
-for nombre, df in datasets.items():
+@instrumentar('analisis')
+def analizar_tendencias_dataset(df, nombre):
+    """Analiza las tendencias de un dataset según sus columnas de año o fecha.
+
+    Cuenta sobre los registros (o los conteos agregados) con agregacion.contar y no sobre
+    el cubo: sus columnas de categoría (p. ej. MODALIDAD o TIPO) no son dimensiones del cubo.
+    """
     fecha_encontrada = False
     
-    # Caso 1: Columnas separadas de Año, Mes, Día (con normalización de nombres y manejo de codificación)
-    # Buscar todas las columnas que podrían ser año, mes o día
-    posibles_cols_anio = [col for col in df.columns if 'AÃ±o' in col or 'Año' in col or 'ANO' in col.upper() or 'YEAR' in col.upper()]
-    posibles_cols_mes = [col for col in df.columns if 'Mes' in col or 'MES' in col.upper() or 'MONTH' in col.upper()]
-    posibles_cols_dia = [col for col in df.columns if 'DÃ­a' in col or 'Día' in col or 'DIA' in col.upper() or 'DAY' in col.upper()]
+    # Caso 1: Columnas separadas de Año, Mes, Día (según los roles declarados en esquemas.py)
+    posibles_cols_anio = [col for col in [esquemas.columna(df, 'anio')] if col]
+    posibles_cols_mes = [col for col in [esquemas.columna(df, 'mes')] if col]
+    posibles_cols_dia = [col for col in [esquemas.columna(df, 'dia_semana')] if col]
     
     print(f"\nAnalizando tendencias temporales en {nombre}...")
     print(f"  Columnas de año encontradas: {posibles_cols_anio}")
@@ -310,17 +255,17 @@ for nombre, df in datasets.items():
         
         # Identificar posibles columnas de categoría según el dataset
         col_categoria = None
-        for posible_col in ['Armas / Medios', 'MODALIDAD', 'DELITO', 'TIPO', 'GÃ©nero', 'Género', 'GENERO']:
+        for posible_col in ['Armas / Medios', 'MODALIDAD', 'DELITO', 'TIPO', 'Género', 'GENERO']:
             if posible_col in df.columns:
                 col_categoria = posible_col
                 break
         
         # Usar el valor de año directamente para crear series de tiempo
         anio_col = posibles_cols_anio[0]
-        df['año_num'] = pd.to_numeric(df[anio_col], errors='coerce')
+        anios = pd.to_numeric(df[anio_col], errors='coerce').rename('año_num')
         
         # Crear agregación por año
-        yearly_counts = df.groupby('año_num').size().reset_index(name='cantidad')
+        yearly_counts = contar(df, anios).reset_index(name='cantidad')
         
         # Visualización con Plotly
         fig = px.line(yearly_counts, x='año_num', y='cantidad', 
@@ -340,21 +285,15 @@ for nombre, df in datasets.items():
             yaxis=dict(showgrid=True, gridcolor='lightgray')
         )
         
-        fig.write_html(f'visualizaciones/{nombre}_tendencia_anual.html')
+        guardar_figura(fig, f'visualizaciones/{nombre}_tendencia_anual.html')
         
         # Si hay una columna de categoría, analizar tendencias por categoría
         if col_categoria and col_categoria in df.columns:
             if df[col_categoria].nunique() <= 10:  # Solo si hay un número razonable de categorías
-                # Crear copia del dataframe para no modificar el original
-                df_copy = df.copy()
-                
                 # Normalizar valores de género si corresponde
-                if col_categoria.upper() in ['GENERO', 'GÉNERO', 'GÃ©NERO']:
-                    # Normalizar valores no reportados
-                    no_reportado = ['NO REPORTA', '-', 'NO REPORTADO', 'NO INFORMA', 'SIN INFORMACIÓN', 'DESCONOCIDO']
-                    df_copy[col_categoria] = df_copy[col_categoria].replace(no_reportado, 'NO REPORTADO')
+                categoria = valores_categoria(df, col_categoria)
                 
-                category_yearly = df_copy.groupby(['año_num', col_categoria]).size().reset_index(name='cantidad')
+                category_yearly = contar(df, [anios, categoria]).reset_index(name='cantidad')
                 
                 fig = px.line(category_yearly, x='año_num', y='cantidad', color=col_categoria,
                              title=f'Tendencia Anual por {col_categoria} - {nombre}',
@@ -373,19 +312,16 @@ for nombre, df in datasets.items():
                     yaxis=dict(showgrid=True, gridcolor='lightgray')
                 )
                 
-                fig.write_html(f'visualizaciones/{nombre}_tendencia_por_{col_categoria}.html')
+                guardar_figura(fig, f'visualizaciones/{nombre}_tendencia_por_{col_categoria}.html')
         
         fecha_encontrada = True
     
     # Caso 2: Columna única de fecha
     if not fecha_encontrada:
-        # Intentar encontrar la columna de fecha correcta (varios nombres posibles)
-        columnas_fecha_posibles = [
-            'FECHA', 'FECHA_HECHO', 'FECHA HECHO', 'FECHA_COMISION', 'FECHA COMISION',
-            'FECHA_REGISTRO', 'FECHA REGISTRO'
-        ]
+        # Columna de fecha declarada en el esquema del dataset
+        col_fecha = esquemas.columna(df, 'fecha')
         
-        for col_fecha in columnas_fecha_posibles:
+        if col_fecha:
             if col_fecha in df.columns:
                 # Identificar posibles columnas de categoría según el dataset
                 col_categoria = None
@@ -403,15 +339,17 @@ for nombre, df in datasets.items():
                     col_categoria = 'Armas / Medios'
                     
                 fecha_encontrada = analizar_tendencia_temporal(df, nombre, col_fecha, col_categoria)
-                break
     
     if not fecha_encontrada:
         print(f"  No se pudo encontrar una columna de fecha válida en {nombre}")
 
+    return fecha_encontrada
+
 # ==========================================
 # Análisis geográfico
 # ==========================================
 
+@instrumentar('analisis')
 def analizar_geografia(df, nombre, col_departamento='DEPARTAMENTO', col_municipio='MUNICIPIO'):
     """Analiza y visualiza la distribución geográfica de los casos"""
     try:
@@ -427,7 +365,7 @@ def analizar_geografia(df, nombre, col_departamento='DEPARTAMENTO', col_municipi
         if len(geo_cols) > 0:
             # Analizar por departamento
             if col_departamento in df.columns:
-                dept_counts = df[col_departamento].value_counts().reset_index()
+                dept_counts = contar_valores(df, col_departamento).reset_index()
                 dept_counts.columns = [col_departamento, 'cantidad']
                 dept_counts = dept_counts.sort_values('cantidad', ascending=False).head(15)
                 
@@ -450,7 +388,7 @@ def analizar_geografia(df, nombre, col_departamento='DEPARTAMENTO', col_municipi
                     yaxis=dict(categoryorder='total ascending')
                 )
                 
-                fig.write_html(f'visualizaciones/{nombre}_distribucion_departamentos.html')
+                guardar_figura(fig, f'visualizaciones/{nombre}_distribucion_departamentos.html')
                 
             return True
         else:
@@ -460,24 +398,22 @@ def analizar_geografia(df, nombre, col_departamento='DEPARTAMENTO', col_municipi
         print(f"  Error al analizar distribución geográfica en {nombre}: {e}")
         return False
 
-# Analizar geografía en cada dataset
-for nombre, df in datasets.items():
-    # Diferentes posibles nombres para columnas geográficas
-    cols_departamento = ['DEPARTAMENTO', 'DEPTO', 'DEPARTAMENTO_HECHO', 'DEPTO_HECHO']
-    cols_municipio = ['MUNICIPIO', 'CIUDAD', 'MUNICIPIO_HECHO', 'CIUDAD_HECHO']
-    
-    for col_depto in cols_departamento:
-        for col_muni in cols_municipio:
-            if col_depto in df.columns or col_muni in df.columns:
-                analizar_geografia(df, nombre, col_depto, col_muni)
-                break
+@instrumentar('analisis')
+def analizar_geografia_dataset(df, nombre):
+    """Analiza la geografía de un dataset con sus columnas de departamento y municipio"""
+    return analizar_geografia(df, nombre, esquemas.columna(df, 'departamento'), esquemas.columna(df, 'municipio'))
 
 # ==========================================
 # Análisis de variables categóricas
 # ==========================================
 
+@instrumentar('analisis')
 def analizar_variables_categoricas(df, nombre):
-    """Analiza y visualiza las variables categóricas más importantes"""
+    """Analiza y visualiza las variables categóricas más importantes.
+
+    Como las tendencias, cuenta con agregacion.contar: la mayoría de estas columnas
+    (clase de sitio, clase de bien, concepto...) no son dimensiones del cubo.
+    """
     print(f"\nAnalizando variables categóricas en {nombre}...")
     
     # Lista de posibles columnas categóricas de interés según el dataset
@@ -491,13 +427,13 @@ def analizar_variables_categoricas(df, nombre):
     elif nombre == 'Delitos_Informáticos':
         columnas_categoricas = ['Descripcion Conducta', 'Municipio']
     elif nombre == 'Homicidios':
-        columnas_categoricas = ['Clase de Sitio', 'Armas / Medios', 'GÃ©nero', 'Género', 'Zona']
+        columnas_categoricas = ['Clase de Sitio', 'Armas / Medios', 'Género', 'Zona']
     elif nombre == 'Hurto_Automotores':
         columnas_categoricas = ['Armas / Medios', 'Zona', 'Clase de Sitio', 'Clase Bien']
     elif nombre == 'Hurto_Comercio':
         columnas_categoricas = ['Armas / Medios', 'Zona', 'Clase de Sitio']
     elif nombre == 'Hurto_Personas':
-        columnas_categoricas = ['Armas / Medios', 'GÃ©nero', 'Género', 'Zona', 'Clase de Sitio']
+        columnas_categoricas = ['Armas / Medios', 'Género', 'Zona', 'Clase de Sitio']
     elif nombre == 'Incautación_Estupefacientes':
         columnas_categoricas = ['CLASE BIEN', 'MUNICIPIO']
     elif nombre == 'invasión_Usurpación_Tierras':
@@ -511,7 +447,7 @@ def analizar_variables_categoricas(df, nombre):
     else:
         # Lista genérica si no se encuentra el dataset específico
         columnas_categoricas = [
-            'MODALIDAD', 'TIPO', 'ARMAS MEDIOS', 'Armas / Medios', 'GENERO', 'GÃ©nero', 'Género', 'DELITO', 
+            'MODALIDAD', 'TIPO', 'ARMAS MEDIOS', 'Armas / Medios', 'GENERO', 'Género', 'DELITO', 
             'TIPO_HURTO', 'TIPO_HOMICIDIO', 'SEXO', 'CLASE', 'MARCA', 'COLOR', 'ZONA', 'Zona',
             'DESCRIPCION CONDUCTA', 'DESCRIPCION CONDUCTA CAPTURA', 'DESCRIPCION_CONDUCTA',
             'Clase de Sitio', 'CLASE BIEN', 'Descripcion Conducta', 'MUNICIPIO', 'Municipio'
@@ -528,9 +464,9 @@ def analizar_variables_categoricas(df, nombre):
                     df[col] = df[col].replace({',': ''}, regex=True).astype(float)
             
             # Agrupar por concepto y sumar valores
-            concepto_presupuesto = df.groupby('CONCEPTO')['PRESUPUESTO VIGENTE (PV)'].sum().reset_index()
-            concepto_compromisos = df.groupby('CONCEPTO')['COMPROMISOS (CP)'].sum().reset_index()
-            concepto_pagos = df.groupby('CONCEPTO')['PAGOS (PG)'].sum().reset_index()
+            concepto_presupuesto = df.groupby('CONCEPTO', observed=True)['PRESUPUESTO VIGENTE (PV)'].sum().reset_index()
+            concepto_compromisos = df.groupby('CONCEPTO', observed=True)['COMPROMISOS (CP)'].sum().reset_index()
+            concepto_pagos = df.groupby('CONCEPTO', observed=True)['PAGOS (PG)'].sum().reset_index()
             
             # Ordenar por presupuesto
             concepto_presupuesto = concepto_presupuesto.sort_values('PRESUPUESTO VIGENTE (PV)', ascending=False)
@@ -538,7 +474,9 @@ def analizar_variables_categoricas(df, nombre):
             # Convertir a formato largo para Plotly
             concepto_top = concepto_presupuesto.head(15)['CONCEPTO'].tolist()
             
-            df_filtered = df[df['CONCEPTO'].isin(concepto_top)].copy()
+            # Solo las columnas que se pasan a formato largo
+            df_filtered = df.loc[df['CONCEPTO'].isin(concepto_top),
+                                 ['CONCEPTO', 'PRESUPUESTO VIGENTE (PV)', 'COMPROMISOS (CP)', 'PAGOS (PG)']]
             
             # Preparar datos en formato largo
             presupuesto_largo = pd.melt(
@@ -576,7 +514,7 @@ def analizar_variables_categoricas(df, nombre):
             
             # Guardar visualización
             nombre_archivo = f"visualizaciones/{nombre}_presupuesto_concepto.html"
-            fig.write_html(nombre_archivo)
+            guardar_figura(fig, nombre_archivo)
             print(f"  Visualización creada: {nombre_archivo}")
             
             visualizaciones_creadas += 1
@@ -588,17 +526,11 @@ def analizar_variables_categoricas(df, nombre):
     for col in columnas_categoricas:
         if col in df.columns:
             try:
-                # Crear copia para no modificar el original
-                df_copy = df.copy()
-                
-                # Normalizar valores de género
-                if col.upper() in ['GENERO', 'GÉNERO', 'GÃ©NERO']:
-                    # Normalizar valores no reportados
-                    no_reportado = ['NO REPORTA', '-', 'NO REPORTADO', 'NO INFORMA', 'SIN INFORMACIÓN', 'DESCONOCIDO']
-                    df_copy[col] = df_copy[col].replace(no_reportado, 'NO REPORTADO')
+                # Normalizar valores de género (Series derivada: df no se copia ni se modifica)
+                valores = valores_categoria(df, col)
                 
                 # Contar valores
-                conteo = df_copy[col].value_counts().reset_index()
+                conteo = contar_valores(df, valores).reset_index()
                 conteo.columns = [col, 'cantidad']
                 
                 # Manejar datasets con muchos valores (como municipios)
@@ -633,28 +565,26 @@ def analizar_variables_categoricas(df, nombre):
                 # Guardar visualización
                 column_name = col.replace(' ', '_').replace('/', '_').lower()
                 nombre_archivo = f"visualizaciones/{nombre}_{column_name}.html"
-                fig.write_html(nombre_archivo)
+                guardar_figura(fig, nombre_archivo)
                 print(f"  Visualización creada: {nombre_archivo}")
                 
                 visualizaciones_creadas += 1
                 
                 # Si también hay columna de año, analizar evolución de categorías en el tiempo
-                posibles_cols_anio = [c for c in df.columns if 'AÃ±o' in c or 'Año' in c or 'ANO' in c.upper() or 'YEAR' in c.upper()]
+                anio_col = esquemas.columna(df, 'anio')
                 
-                if posibles_cols_anio:
-                    anio_col = posibles_cols_anio[0]
-                    
+                if anio_col:
                     # Convertir a numérico
-                    df_copy['año_num'] = pd.to_numeric(df_copy[anio_col], errors='coerce')
+                    anios = pd.to_numeric(df[anio_col], errors='coerce').rename('año_num')
                     
                     # Obtener las 5 categorías más frecuentes
                     top_categorias = conteo.head(5)[col].tolist()
                     
-                    # Filtrar datos
-                    df_filtrado = df_copy[df_copy[col].isin(top_categorias)]
-                    
-                    # Agrupar por año y categoría
-                    evolucion = df_filtrado.groupby(['año_num', col]).size().reset_index(name='cantidad')
+                    # Agrupar por año y categoría y conservar solo las principales
+                    # (filtrar los grupos y no las filas evita copiar df)
+                    evolucion = contar(df, [anios, valores])
+                    evolucion = evolucion[evolucion.index.get_level_values(col).isin(top_categorias)]
+                    evolucion = evolucion.reset_index(name='cantidad')
                     
                     # Crear visualización
                     fig = px.line(evolucion, x='año_num', y='cantidad', color=col,
@@ -676,7 +606,7 @@ def analizar_variables_categoricas(df, nombre):
                     
                     # Guardar visualización
                     nombre_archivo = f"visualizaciones/{nombre}_{column_name}_evolucion.html"
-                    fig.write_html(nombre_archivo)
+                    guardar_figura(fig, nombre_archivo)
                     print(f"  Visualización creada: {nombre_archivo}")
                     
                     visualizaciones_creadas += 1
@@ -690,26 +620,32 @@ def analizar_variables_categoricas(df, nombre):
 # Análisis de correlaciones entre datasets
 # ==========================================
 
-print("\nAnalizando posibles correlaciones entre datasets...")
+def anios_dataset(df):
+    """Año de cada registro (columna de año o, si no hay, año de la fecha del hecho), o None"""
+    col_anio = esquemas.columna(df, 'anio')
+    if col_anio is not None:
+        return pd.to_numeric(df[col_anio], errors='coerce').rename('año')
+    col_fecha = esquemas.columna(df, 'fecha')
+    if col_fecha is not None:
+        return pd.to_datetime(df[col_fecha], errors='coerce', dayfirst=True).dt.year.rename('año')
+    return None
+
+@instrumentar('analisis')
+def analizar_correlacion_homicidios_capturas(homicidios, capturas):
+    """Compara la evolución anual de homicidios y capturas"""
+    print("\nAnalizando posibles correlaciones entre datasets...")
+
+    # Intentar encontrar correlaciones entre homicidios y capturas
+    if homicidios is None or capturas is None:
+        return False
 
-# Intentar encontrar correlaciones entre homicidios y capturas
-if 'Homicidios' in datasets and 'Capturas' in datasets:
     try:
         # Preparar datos por año
-        homicidios = datasets['Homicidios']
-        capturas = datasets['Capturas']
-        
-        if 'FECHA' in homicidios.columns and 'FECHA' in capturas.columns:
-            # Convertir fechas
-            homicidios['FECHA'] = pd.to_datetime(homicidios['FECHA'], errors='coerce')
-            capturas['FECHA'] = pd.to_datetime(capturas['FECHA'], errors='coerce')
-            
-            # Agregar por año
-            homicidios['año'] = homicidios['FECHA'].dt.year
-            capturas['año'] = capturas['FECHA'].dt.year
-            
-            hom_por_año = homicidios.groupby('año').size().reset_index(name='homicidios')
-            cap_por_año = capturas.groupby('año').size().reset_index(name='capturas')
+        anios_homicidios = anios_dataset(homicidios)
+        anios_capturas = anios_dataset(capturas)
+        if anios_homicidios is not None and anios_capturas is not None:
+            hom_por_año = contar(homicidios, anios_homicidios).reset_index(name='homicidios')
+            cap_por_año = contar(capturas, anios_capturas).reset_index(name='capturas')
             
             # Unir datos
             correlacion = pd.merge(hom_por_año, cap_por_año, on='año', how='inner')
@@ -745,20 +681,42 @@ if 'Homicidios' in datasets and 'Capturas' in datasets:
                 fig.update_yaxes(title_text="Número de Homicidios", secondary_y=False)
                 fig.update_yaxes(title_text="Número de Capturas", secondary_y=True)
                 
-                fig.write_html('visualizaciones/correlacion_homicidios_capturas.html')
+                guardar_figura(fig, 'visualizaciones/correlacion_homicidios_capturas.html')
                 
                 # Calcular correlación
                 corr = correlacion['homicidios'].corr(correlacion['capturas'])
                 print(f"  Correlación entre homicidios y capturas: {corr:.2f}")
+                return True
     except Exception as e:
         print(f"  Error al analizar correlación entre homicidios y capturas: {e}")
 
+    return False
+
 # ==========================================
-# Análisis de variables categóricas
+# Ejecución del análisis
 # ==========================================
 
-print("\nAnalizando variables categóricas en los datasets...")
-for nombre, df in datasets.items():
-    analizar_variables_categoricas(df, nombre)
+def main():
+    print("Iniciando análisis de datos de seguridad y criminalidad...")
+
+    datasets = cargar_datasets()
+    imprimir_resumen(datasets)
+
+    # Analizar tendencias en cada dataset según sus columnas
+    for nombre, df in datasets.items():
+        analizar_tendencias_dataset(df, nombre)
+
+    # Analizar geografía en cada dataset
+    for nombre, df in datasets.items():
+        analizar_geografia_dataset(df, nombre)
+
+    analizar_correlacion_homicidios_capturas(datasets.get('Homicidios'), datasets.get('Capturas'))
+
+    print("\nAnalizando variables categóricas en los datasets...")
+    for nombre, df in datasets.items():
+        analizar_variables_categoricas(df, nombre)
+
+    print("\nAnálisis completado. Visualizaciones guardadas en la carpeta 'visualizaciones'.")
 
-print("\nAnálisis completado. Visualizaciones guardadas en la carpeta 'visualizaciones'.") 
\ No newline at end of file
+if __name__ == "__main__":
+    main()
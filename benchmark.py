@@ -0,0 +1,279 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import subprocess
+import contextlib
+import multiprocessing
+import numpy as np
+import pandas as pd
+from normalizacion import detectar_codificacion
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# ==========================================
+# Benchmark de carga, análisis y escritura con datasets sintéticos
+# ==========================================
+
+# Carpeta con los CSV reales que sirven de modelo
+DATOS_DIR = 'datos'
+
+# Carpeta de trabajo: CSV sintéticos, cachés y visualizaciones del benchmark
+BENCHMARK_DIR = os.path.join('.cache', 'benchmark')
+
+# Tamaños (filas) de los datasets sintéticos
+TAMANOS = [10_000, 1_000_000, 10_000_000]
+
+# Filas leídas del CSV real para estimar la distribución de cada columna
+FILAS_MUESTRA = 1_000_000
+
+# Filas escritas por bloque al generar un CSV sintético
+FILAS_POR_BLOQUE = 1_000_000
+
+# Aumento relativo de tiempo a partir del cual --comparar marca una regresión
+UMBRAL_REGRESION = 0.2
+
+# Etapas de análisis: nombre, (módulo, función) que reciben (df, nombre) y si filtran por año.
+# Son las mismas funciones que ejecuta analisis_principal.py; las columnas se resuelven por rol
+# con esquemas.columna, y la etapa geográfica incluye rejillas de densidad y teselas
+ETAPAS = [
+    ('temporal', [('analisis_seguridad', 'analizar_tendencias_dataset'),
+                  ('analisis_patrones', 'analizar_patrones_dataset')], True),
+    ('categorica', [('analisis_seguridad', 'analizar_variables_categoricas')], True),
+    ('geografica', [('analisis_seguridad', 'analizar_geografia_dataset'),
+                    ('analisis_geografico', 'analizar_geografia_dataset'),
+                    ('teselas', 'construir_teselas_dataset')], False)
+]
+
+# Funciones de escritura que se cronometran aparte en cada módulo de análisis
+# (registrar_salida cuenta las pirámides de teselas, que se escriben sin guardar_*)
+FUNCIONES_ESCRITURA = ['guardar_figura', 'guardar_mapa', 'registrar_salida']
+
+def _separador(ruta, codificacion):
+    with open(ruta, encoding=codificacion) as f:
+        encabezado = f.readline()
+    return ';' if encabezado.count(';') > encabezado.count(',') else ','
+
+def perfil_csv(ruta, filas_muestra=FILAS_MUESTRA):
+    """Encabezados, separador, codificación y distribución de valores de cada columna de un CSV"""
+    codificacion = detectar_codificacion(ruta)
+    separador = _separador(ruta, codificacion)
+    # utf-8-sig ya quita el BOM al leer; los valores se conservan como texto tal cual
+    muestra = pd.read_csv(ruta, sep=separador, encoding=codificacion, dtype=str,
+                          keep_default_na=False, nrows=filas_muestra)
+    columnas = {}
+    for col in muestra.columns:
+        frecuencias = muestra[col].value_counts(normalize=True, sort=False)
+        columnas[col] = (frecuencias.index.to_numpy(dtype=object), frecuencias.to_numpy(dtype=np.float64))
+    return {'separador': separador, 'codificacion': codificacion, 'columnas': columnas, 'filas_muestra': len(muestra)}
+
+def generar_csv(perfil, filas, destino, semilla=0):
+    """Escribe un CSV sintético con la forma del perfil: mismos encabezados, separador y
+    codificación, y valores muestreados de la distribución de cada columna (así se
+    conservan las cardinalidades, hasta el número de valores distintos de la muestra)"""
+    generador = np.random.default_rng(semilla)
+    temporal = f'{destino}.{os.getpid()}.tmp'
+    with open(temporal, 'w', encoding=perfil['codificacion'], newline='') as f:
+        for inicio in range(0, filas, FILAS_POR_BLOQUE):
+            n = min(FILAS_POR_BLOQUE, filas - inicio)
+            bloque = pd.DataFrame({
+                col: valores[generador.choice(len(valores), size=n, p=frecuencias)]
+                for col, (valores, frecuencias) in perfil['columnas'].items()
+            })
+            bloque.to_csv(f, sep=perfil['separador'], index=False, header=inicio == 0)
+    os.replace(temporal, destino)
+
+def preparar_datos(archivos, filas, directorio=BENCHMARK_DIR):
+    """Genera (si no existen) los CSV sintéticos de un tamaño y devuelve su carpeta"""
+    carpeta = os.path.join(directorio, f'datos_{filas}')
+    os.makedirs(carpeta, exist_ok=True)
+    for archivo in archivos:
+        destino = os.path.join(carpeta, archivo)
+        origen = os.path.join(DATOS_DIR, archivo)
+        if os.path.exists(destino) and os.path.getmtime(destino) >= os.path.getmtime(origen):
+            continue
+        print(f"  Generando {archivo} sintético con {filas} filas...")
+        generar_csv(perfil_csv(origen), filas, destino)
+    return carpeta
+
+def _rss_pico_mb():
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo informa en KB y macOS en bytes
+    return round(pico / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def medir_dataset(archivo, carpeta_datos, carpeta_trabajo):
+    """Mide carga, etapas de análisis y escritura de un dataset en el proceso actual.
+
+    Se ejecuta en un proceso nuevo por dataset y tamaño para que el pico de memoria
+    (que solo crece) corresponda a esa medición; el pico se toma al final de cada etapa.
+    Una etapa que no escribe nada (el dataset no tiene las columnas que necesita) se marca
+    como omitida en lugar de registrar un tiempo casi nulo.
+    """
+    os.makedirs(carpeta_trabajo, exist_ok=True)
+    os.chdir(carpeta_trabajo)
+    import importlib
+    import carga_datos
+    import cubo
+
+    # Leer los CSV sintéticos y guardar las cachés dentro de la carpeta de trabajo
+    carga_datos.DATOS_DIR = cubo.DATOS_DIR = os.path.abspath(carpeta_datos)
+    carga_datos.CACHE_DIR = os.path.join(carpeta_trabajo, '.cache', 'datasets')
+    cubo.CUBOS_DIR = os.path.join(carpeta_trabajo, '.cache', 'cubos')
+    shutil.rmtree(os.path.join(carpeta_trabajo, '.cache'), ignore_errors=True)
+
+    escritura = {'segundos': 0.0, 'archivos': 0}
+    def cronometrar(funcion):
+        def envoltura(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                escritura['segundos'] += time.perf_counter() - inicio
+                escritura['archivos'] += 1
+        return envoltura
+
+    modulos = {}
+    for _, funciones, _ in ETAPAS:
+        for nombre_modulo, _ in funciones:
+            if nombre_modulo not in modulos:
+                modulos[nombre_modulo] = importlib.import_module(nombre_modulo)
+                for funcion in FUNCIONES_ESCRITURA:
+                    if hasattr(modulos[nombre_modulo], funcion):
+                        setattr(modulos[nombre_modulo], funcion, cronometrar(getattr(modulos[nombre_modulo], funcion)))
+
+    resultados = {}
+    nombre = os.path.splitext(archivo)[0]
+    with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+        # Carga desde el CSV (sin caché) y desde la caché columnar recién escrita
+        for etapa in ['carga_csv', 'carga_cache']:
+            carga_datos.liberar_memoria()
+            inicio = time.perf_counter()
+            df = carga_datos.load_dataset(archivo, filtrar=False)
+            resultados[etapa] = {
+                'segundos': round(time.perf_counter() - inicio, 4),
+                'filas': None if df is None else len(df),
+                'rss_pico_mb': _rss_pico_mb()
+            }
+        if df is None:
+            return resultados
+
+        for etapa, funciones, filtrar in ETAPAS:
+            df = carga_datos.load_dataset(archivo, filtrar=filtrar)
+            escritura.update(segundos=0.0, archivos=0)
+            sin_resultado = []
+            inicio = time.perf_counter()
+            for nombre_modulo, nombre_funcion in funciones:
+                try:
+                    if not getattr(modulos[nombre_modulo], nombre_funcion)(df, nombre):
+                        sin_resultado.append(f'{nombre_modulo}.{nombre_funcion}')
+                except Exception as e:
+                    resultados.setdefault('errores', []).append(f'{etapa}/{nombre_funcion}: {e}')
+            total = time.perf_counter() - inicio
+            if not escritura['archivos']:
+                resultados[etapa] = {'omitida': True, 'segundos': None, 'rss_pico_mb': _rss_pico_mb()}
+                continue
+            resultados[etapa] = {
+                'sin_resultado': sin_resultado,
+                'segundos': round(total - escritura['segundos'], 4),
+                'escritura_segundos': round(escritura['segundos'], 4),
+                'archivos_escritos': escritura['archivos'],
+                'rss_pico_mb': _rss_pico_mb()
+            }
+    return resultados
+
+def _commit():
+    try:
+        salida = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True)
+        return salida.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def ejecutar_benchmark(archivos, tamanos):
+    """Mide cada dataset en cada tamaño, cada medición en un proceso nuevo"""
+    contexto = multiprocessing.get_context('spawn')
+    resultados = {
+        'commit': _commit(),
+        'fecha': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'entorno': {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'plataforma': platform.platform(),
+            'cpus': os.cpu_count()
+        },
+        'mediciones': []
+    }
+    for filas in tamanos:
+        carpeta = preparar_datos(archivos, filas)
+        for archivo in archivos:
+            print(f"Midiendo {archivo} con {filas} filas...")
+            trabajo = os.path.abspath(os.path.join(BENCHMARK_DIR, f'trabajo_{filas}', os.path.splitext(archivo)[0]))
+            with contexto.Pool(1) as pool:
+                etapas = pool.apply(medir_dataset, (archivo, os.path.abspath(carpeta), trabajo))
+            for etapa, medicion in etapas.items():
+                if etapa != 'errores' and medicion.get('omitida'):
+                    print(f"  {etapa}: omitida (no escribe nada)")
+                elif etapa != 'errores':
+                    escritura = f" + {medicion['escritura_segundos']} s de escritura" if 'escritura_segundos' in medicion else ''
+                    print(f"  {etapa}: {medicion['segundos']} s{escritura}, pico de memoria {medicion['rss_pico_mb']} MB")
+            for error in etapas.get('errores', []):
+                print(f"  Error: {error}")
+            resultados['mediciones'].append({'archivo': archivo, 'filas': filas, 'etapas': etapas})
+    return resultados
+
+def comparar(actual, anterior, umbral=UMBRAL_REGRESION):
+    """Compara los tiempos con un resultado anterior y devuelve las regresiones mayores al umbral"""
+    previos = {
+        (m['archivo'], m['filas'], etapa): datos['segundos']
+        for m in anterior['mediciones'] for etapa, datos in m['etapas'].items() if etapa != 'errores'
+    }
+    regresiones = []
+    print(f"\nComparación con {anterior.get('commit')} ({anterior.get('fecha')}):")
+    for m in actual['mediciones']:
+        for etapa, datos in m['etapas'].items():
+            previo = previos.get((m['archivo'], m['filas'], etapa))
+            if etapa == 'errores' or not previo or datos['segundos'] is None:
+                continue
+            cambio = datos['segundos'] / previo - 1
+            marca = ''
+            if cambio > umbral:
+                marca = '  <-- regresión'
+                regresiones.append((m['archivo'], m['filas'], etapa, previo, datos['segundos']))
+            print(f"  {m['archivo']} {m['filas']} {etapa}: {previo} s -> {datos['segundos']} s ({cambio:+.0%}){marca}")
+    return regresiones
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de carga, análisis y escritura con datasets sintéticos')
+    parser.add_argument('--filas', type=int, nargs='+', default=TAMANOS, help='tamaños de los datasets sintéticos')
+    parser.add_argument('--archivos', nargs='+', help='CSV de datos/ a medir (por defecto todos)')
+    parser.add_argument('--salida', help='archivo JSON de resultados (por defecto informe/benchmark_<commit>.json)')
+    parser.add_argument('--comparar', help='JSON de una ejecución anterior con el que comparar')
+    parser.add_argument('--umbral', type=float, default=UMBRAL_REGRESION, help='aumento relativo que cuenta como regresión')
+    args = parser.parse_args()
+
+    archivos = args.archivos or sorted(f for f in os.listdir(DATOS_DIR) if f.endswith('.csv'))
+    resultados = ejecutar_benchmark(archivos, args.filas)
+
+    salida = args.salida or os.path.join('informe', f"benchmark_{resultados['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(salida) or '.', exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump(resultados, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados guardados en {salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            regresiones = comparar(resultados, json.load(f), args.umbral)
+        if regresiones:
+            print(f"\n{len(regresiones)} etapas más de {args.umbral:.0%} más lentas")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import json
+import numpy as np
+import pandas as pd
+import folium
+import esquemas
+from agregacion import pesos
+from carga_datos import encabezado, iterar_dataset
+from densidad import LIMITES_COLOMBIA, NIVELES_TESELAS, bordes_celdas
+
+# ==========================================
+# Construcción vectorizada de capas de mapa
+# ==========================================
+
+# Escala de colores de la densidad (de menos a más casos)
+COLORES_DENSIDAD = ['#ffffb2', '#fed976', '#feb24c', '#fd8d3c', '#fc4e2a', '#e31a1c', '#b10026']
+
+# Muestra solo la capa de densidad del nivel de zoom actual (el más bajo si el zoom es menor).
+# Por encima del último nivel sigue visible ese nivel, salvo que server.py entregue las teselas
+# de la capa que lo reemplaza (evento 'teselasdisponibles' de SCRIPT_TESELAS)
+SCRIPT_NIVELES = """
+document.addEventListener('DOMContentLoaded', function () {
+    var mapa = %(mapa)s;
+    var contenedor = %(contenedor)s;
+    var niveles = {%(niveles)s};
+    var capa = %(capa)s;
+    var zooms = Object.keys(niveles).map(Number);
+    var conTeselas = false;
+    function actualizar() {
+        var z = Math.max(Math.round(mapa.getZoom()), zooms[0]);
+        if (!conTeselas) z = Math.min(z, zooms[zooms.length - 1]);
+        zooms.forEach(function (n) {
+            if (n === z) contenedor.addLayer(niveles[n]);
+            else contenedor.removeLayer(niveles[n]);
+        });
+    }
+    mapa.on('zoomend', actualizar);
+    mapa.on('teselasdisponibles', function (e) {
+        if (e.capa === capa) { conTeselas = true; actualizar(); }
+    });
+    actualizar();
+});
+"""
+
+# Capa de Leaflet que pide a server.py las teselas z/x/y de una capa y dibuja sus celdas
+# con opacidad según el número de casos (escala logarítmica relativa al máximo del nivel)
+SCRIPT_TESELAS = """
+document.addEventListener('DOMContentLoaded', function () {
+    var mapa = %(mapa)s;
+    var grupo = %(grupo)s;
+    var capa = %(capa)s;
+    var base = '%(url)s/' + capa;
+    // Sin server.py (archivo abierto desde el disco u otro servidor) la petición falla y
+    // se siguen viendo las rejillas incrustadas
+    var meta = fetch(base + '/meta.json')
+        .then(function (r) { if (!r.ok) throw new Error(r.status); return r.json(); })
+        .then(function (m) { mapa.fire('teselasdisponibles', {capa: capa}); return m; });
+    meta.catch(function () {});
+    var Capa = L.GridLayer.extend({
+        createTile: function (coords, done) {
+            var tesela = document.createElement('canvas');
+            tesela.width = tesela.height = 256;
+            Promise.all([meta, fetch(base + '/' + coords.z + '/' + coords.x + '/' + coords.y)
+                .then(function (r) { return r.status === 200 ? r.json() : {celdas: []}; })])
+                .then(function (datos) {
+                    var nivel = datos[0].niveles[coords.z] || {maximo: 1};
+                    var lado = 256 / datos[0].celdas_por_tesela;
+                    var ctx = tesela.getContext('2d');
+                    ctx.fillStyle = %(color)s;
+                    datos[1].celdas.forEach(function (c) {
+                        ctx.globalAlpha = 0.15 + 0.75 * Math.log1p(c[2]) / Math.log1p(nivel.maximo);
+                        ctx.fillRect(c[0] * lado, c[1] * lado, lado, lado);
+                    });
+                    done(null, tesela);
+                })
+                .catch(function (e) { done(e, tesela); });
+            return tesela;
+        }
+    });
+    grupo.addLayer(new Capa({minZoom: %(zoom_minimo)d, minNativeZoom: %(zoom_nativo_minimo)d,
+                             maxNativeZoom: %(zoom_nativo_maximo)d, opacity: 0.8}));
+});
+"""
+
+def coordenadas_validas(df, col_lat, col_lon, limites=LIMITES_COLOMBIA):
+    """Máscara de filas con coordenadas numéricas dentro de los límites y arreglos de latitud y longitud"""
+    lat = pd.to_numeric(df[col_lat], errors='coerce').to_numpy(dtype=np.float64)
+    lon = pd.to_numeric(df[col_lon], errors='coerce').to_numpy(dtype=np.float64)
+    lat_min, lat_max, lon_min, lon_max = limites
+    # Las comparaciones con NaN son falsas, así que los valores no numéricos quedan fuera
+    mascara = (lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)
+    return mascara, lat[mascara], lon[mascara]
+
+def bloques_coordenadas(filename, filtrar=False):
+    """Recorre un CSV por bloques entregando sus coordenadas válidas y el peso de cada punto.
+
+    Sirve para los archivos grandes, que load_dataset entrega agregados y sin coordenadas;
+    las rejillas y teselas de cada bloque se suman después porque los conteos son aditivos.
+    """
+    columnas = encabezado(filename)
+    col_lat = esquemas.columna_archivo(filename, columnas, 'latitud')
+    col_lon = esquemas.columna_archivo(filename, columnas, 'longitud')
+    if not col_lat or not col_lon:
+        return
+    cantidad = esquemas.columna_archivo(filename, columnas, 'cantidad')
+
+    for bloque in iterar_dataset(filename, [col_lat, col_lon] + ([cantidad] if cantidad else []), filtrar):
+        validas, lat, lon = coordenadas_validas(bloque, col_lat, col_lon)
+        peso = pesos(bloque)
+        yield lat, lon, None if peso is None else peso.to_numpy(dtype=np.float64)[validas]
+
+def geojson_puntos(lat, lon, propiedades=None):
+    """FeatureCollection de puntos; propiedades es un dict de nombre -> arreglo por punto"""
+    propiedades = propiedades or {}
+    nombres = list(propiedades)
+    columnas = [np.asarray(propiedades[n]).tolist() for n in nombres]
+    features = [
+        {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [x, y]},
+            'properties': dict(zip(nombres, valores))
+        }
+        for x, y, *valores in zip(lon.tolist(), lat.tolist(), *columnas)
+    ]
+    return {'type': 'FeatureCollection', 'features': features}
+
+def geojson_celdas(rejilla):
+    """FeatureCollection con un rectángulo por celda, su número de casos y su color"""
+    sur, oeste, norte, este = (b.tolist() for b in bordes_celdas(rejilla))
+    casos = rejilla['casos']
+    # Colores en escala logarítmica relativa al máximo del nivel
+    escala = np.log1p(casos) / np.log1p(casos.max()) if len(casos) else casos
+    clases = np.minimum((escala * len(COLORES_DENSIDAD)).astype(int), len(COLORES_DENSIDAD) - 1)
+    # Misma opacidad que las celdas de SCRIPT_TESELAS, para las capas de un solo color
+    opacidades = np.round(0.15 + 0.75 * escala, 3)
+    features = [
+        {
+            'type': 'Feature',
+            'geometry': {'type': 'Polygon', 'coordinates': [[[o, s], [e, s], [e, n], [o, n], [o, s]]]},
+            'properties': {'casos': int(round(c)), 'color': COLORES_DENSIDAD[k], 'opacidad': a}
+        }
+        for s, o, n, e, c, k, a in zip(sur, oeste, norte, este, casos.tolist(), clases.tolist(), opacidades.tolist())
+    ]
+    return {'type': 'FeatureCollection', 'features': features}
+
+def capa_densidad(mapa, piramide, nombre='Densidad', color=None, grupo=None, capa=None):
+    """Agrega al mapa una capa de densidad por nivel de zoom y muestra solo la del zoom actual.
+
+    Con color, las celdas usan ese color con opacidad según sus casos (como las teselas)
+    en lugar de la escala COLORES_DENSIDAD. Las capas se agregan a grupo si se indica.
+    capa es la pirámide de teselas que reemplaza a la rejilla por encima de su último
+    nivel cuando server.py la entrega; sin ella el último nivel sigue visible.
+    """
+    if color is None:
+        estilo = lambda feature: {'fillColor': feature['properties']['color'], 'fillOpacity': 0.6, 'weight': 0}
+    else:
+        estilo = lambda feature: {'fillColor': color, 'fillOpacity': feature['properties']['opacidad'], 'weight': 0}
+    contenedor = mapa if grupo is None else grupo
+    capas = {}
+    for zoom, rejilla in piramide.items():
+        capas[zoom] = folium.GeoJson(
+            geojson_celdas(rejilla),
+            name=f'{nombre} (zoom {zoom})',
+            style_function=estilo,
+            tooltip=folium.GeoJsonTooltip(fields=['casos'], aliases=['Casos'])
+        ).add_to(contenedor)
+
+    niveles = ', '.join(f'{zoom}: {capa_zoom.get_name()}' for zoom, capa_zoom in capas.items())
+    script = SCRIPT_NIVELES % {'mapa': mapa.get_name(), 'contenedor': contenedor.get_name(),
+                               'niveles': niveles, 'capa': json.dumps(capa)}
+    mapa.get_root().script.add_child(folium.Element(script))
+    return capas
+
+def capa_teselas(mapa, capa, color, piramide, nombre=None, zoom_minimo=0, url='/tiles'):
+    """Agrega al mapa una capa que dibuja la pirámide de teselas de `capa` servida por server.py.
+
+    La capa queda dentro de un FeatureGroup de folium para que aparezca en el LayerControl,
+    junto con la rejilla de densidad `piramide` incrustada del mismo color: las teselas solo
+    existen a través de server.py, así que sin él (p. ej. abriendo el HTML desde el disco)
+    el mapa sigue mostrando la rejilla hasta su último nivel de zoom.
+    Si piramide es None (porque el mapa ya tiene su propia capa_densidad) no se incrusta nada.
+    """
+    grupo = folium.FeatureGroup(name=nombre or capa).add_to(mapa)
+    if piramide is not None:
+        capa_densidad(mapa, piramide, nombre=nombre or capa, color=color, grupo=grupo, capa=capa)
+    script = SCRIPT_TESELAS % {
+        'mapa': mapa.get_name(),
+        'grupo': grupo.get_name(),
+        'url': url,
+        'capa': json.dumps(capa),
+        'color': json.dumps(color),
+        'zoom_minimo': zoom_minimo,
+        'zoom_nativo_minimo': NIVELES_TESELAS[0],
+        'zoom_nativo_maximo': NIVELES_TESELAS[-1]
+    }
+    mapa.get_root().script.add_child(folium.Element(script))
+    return grupo
@@ -0,0 +1,423 @@
+import pandas as pd
+import os
+import glob
+import hashlib
+from agregacion import COLUMNA_REGISTROS
+import esquemas
+from normalizacion import detectar_codificacion, reparar_vocabulario
+from instrumentacion import instrumentar
+import warnings
+warnings.filterwarnings('ignore')
+
+# Directorio con los archivos CSV originales
+DATOS_DIR = 'datos'
+
+# Directorio donde se guardan las copias columnares de los CSV ya procesados
+CACHE_DIR = os.path.join('.cache', 'datasets')
+
+# Incrementar si cambia la forma de interpretar los CSV para invalidar la caché
+VERSION_CACHE = 5
+
+# Rango de años considerado en el análisis
+ANIO_MIN = 2010
+ANIO_MAX = 2024
+
+# Tamaño (MB) a partir del cual un CSV se procesa por bloques y se entrega agregado
+UMBRAL_STREAMING_MB = float(os.environ.get('UMBRAL_STREAMING_MB', 512))
+
+# Filas leídas por bloque en el modo por bloques
+FILAS_POR_BLOQUE = 500_000
+
+# Tablas de referencia (no registros de hechos): siempre se cargan completas
+ARCHIVOS_SIN_AGREGAR = ['Frentes_De_Seguridad.csv', 'Presupuesto_de_Gastos.csv']
+
+# Fragmentos de nombres de columnas que se conservan como dimensiones al agregar
+# (solo para archivos sin esquema registrado en esquemas.py)
+COLUMNAS_DIMENSION = [
+    'AÑO', 'ANO', 'YEAR', 'MES', 'MONTH', 'DÍA', 'DIA', 'DAY', 'FECHA', 'HORA',
+    'DEPART', 'DEPTO', 'MUNI', 'CIUDAD', 'ZONA', 'GENERO', 'GÉNERO', 'SEXO', 'ARMAS',
+    'MODALIDAD', 'DELITO', 'TIPO', 'CLASE', 'CONDUCTA', 'ESTADO', 'CONCEPTO', 'MARCA', 'COLOR'
+]
+
+# Columnas de coordenadas: tienen demasiados valores distintos para agregarse
+COLUMNAS_EXCLUIDAS = ['LAT', 'LON']
+
+# Proporción máxima de valores distintos para guardar una columna de texto como categórica
+PROPORCION_CATEGORICA = 0.5
+
+# Datasets ya leídos en este proceso; los procesos hijos creados con fork los heredan
+_memoria = {}
+
+# Con pandas 3 (copia en escritura siempre activa) una copia superficial ya aísla al
+# llamador: los datos se duplican solo si alguno los modifica
+COPIA_SUPERFICIAL = int(pd.__version__.split('.')[0]) >= 3
+
+# Función para leer un CSV con punto y coma o coma como delimitador
+def _leer_csv(ruta):
+    # Con esquema registrado se leen solo sus columnas y con tipos explícitos
+    codificacion = detectar_codificacion(ruta)
+    opciones = esquemas.opciones_lectura(ruta)
+    if opciones is not None:
+        return esquemas.convertir_tipos(pd.read_csv(ruta, encoding=codificacion, **opciones), ruta)
+
+    try:
+        # Intentar cargar con punto y coma como delimitador
+        df = pd.read_csv(ruta, encoding=codificacion, low_memory=False, sep=';')
+
+        # Verificar si los datos se cargaron en una sola columna
+        if df.shape[1] == 1 and ',' in df.iloc[0, 0]:
+            # Si es así, dividir la columna
+            column_name = df.columns[0]
+            new_df = df[column_name].str.split(',', expand=True)
+
+            # Extraer los nombres de las columnas de la primera fila si contiene encabezados
+            if ',' in column_name:
+                headers = column_name.split(',')
+                new_df.columns = headers
+
+            df = new_df
+
+        return df
+    except Exception:
+        # Si falla, intentar con coma como delimitador
+        return pd.read_csv(ruta, encoding=codificacion, low_memory=False)
+
+def _ruta_cache(ruta):
+    """Devuelve la ruta base en caché para un CSV según su ruta, fecha de modificación y tamaño"""
+    info = os.stat(ruta)
+    clave = f"{os.path.abspath(ruta)}|{info.st_mtime_ns}|{info.st_size}|{VERSION_CACHE}"
+    digest = hashlib.sha1(clave.encode('utf-8')).hexdigest()[:16]
+    nombre = os.path.splitext(os.path.basename(ruta))[0]
+    return os.path.join(CACHE_DIR, f"{nombre}-{digest}")
+
+def _leer_cache(base):
+    """Carga la copia en caché si existe (Parquet o, como respaldo, pickle comprimido)"""
+    if os.path.exists(base + '.parquet'):
+        try:
+            return pd.read_parquet(base + '.parquet')
+        except Exception as e:
+            print(f"  No se pudo leer la caché {base}.parquet: {e}")
+    if os.path.exists(base + '.pkl.gz'):
+        try:
+            return pd.read_pickle(base + '.pkl.gz')
+        except Exception as e:
+            print(f"  No se pudo leer la caché {base}.pkl.gz: {e}")
+    return None
+
+def _guardar_cache(df, base):
+    """Guarda el DataFrame en formato columnar comprimido y elimina versiones anteriores"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    # Eliminar copias obsoletas del mismo archivo (otra fecha de modificación o tamaño)
+    prefijo = base.rsplit('-', 1)[0]
+    for anterior in glob.glob(f"{glob.escape(prefijo)}-*"):
+        if not anterior.startswith(base):
+            try:
+                os.remove(anterior)
+            except OSError:
+                pass
+
+    # Escribir primero en un archivo temporal para no dejar cachés a medio escribir
+    try:
+        df.to_parquet(base + '.parquet.tmp', compression='zstd', index=False)
+        os.replace(base + '.parquet.tmp', base + '.parquet')
+        return
+    except Exception:
+        # Sin pyarrow o con columnas de tipos mixtos: usar pickle comprimido
+        if os.path.exists(base + '.parquet.tmp'):
+            os.remove(base + '.parquet.tmp')
+
+    try:
+        df.to_pickle(base + '.pkl.gz.tmp', compression='gzip')
+        os.replace(base + '.pkl.gz.tmp', base + '.pkl.gz')
+    except Exception as e:
+        print(f"  No se pudo guardar la caché de {base}: {e}")
+
+def _es_numerica(valores):
+    """Indica si todos los valores son números escritos como texto (p. ej. '2,016' o '1.5')"""
+    numeros = pd.to_numeric(pd.Series(valores, dtype=object).astype(str).str.replace(',', '', regex=False), errors='coerce')
+    return len(valores) > 0 and numeros.notna().all()
+
+def categorizar(df):
+    """Convierte las columnas de texto con pocos valores distintos a dtype category.
+
+    El vocabulario de cada columna se normaliza una sola vez por valor distinto
+    (mojibake, espacios sobrantes y textos vacíos) en lugar de una vez por fila.
+    Las columnas numéricas escritas como texto se dejan sin convertir.
+    """
+    for col in df.columns:
+        serie = df[col]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            # Declarada como categórica en el esquema: solo se normaliza el vocabulario
+            categorias = serie
+            vocabulario = categorias.cat.categories
+        elif pd.api.types.is_object_dtype(serie) or pd.api.types.is_string_dtype(serie):
+            categorias = serie.astype('category')
+            vocabulario = categorias.cat.categories
+            if len(vocabulario) > PROPORCION_CATEGORICA * len(serie) or _es_numerica(vocabulario):
+                continue
+        else:
+            continue
+
+        normalizado = reparar_vocabulario(vocabulario)
+        if not normalizado.equals(pd.Index(vocabulario.astype(str))) or normalizado.has_duplicates:
+            reemplazos = {original: (nuevo if nuevo else None) for original, nuevo in zip(vocabulario, normalizado)}
+            categorias = categorias.map(reemplazos).astype('category')
+        df[col] = categorias
+    return df
+
+def reemplazar_valores(serie, valores, nuevo):
+    """Reemplaza valores de una columna; en columnas categóricas opera sobre las categorías"""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        valores = set(valores)
+        return serie.map(lambda valor: nuevo if valor in valores else valor).astype('category')
+    return serie.replace(valores, nuevo)
+
+def _filtrar_filas(df, mascara):
+    # Seleccionar filas copia todas las columnas: si se conservan todas, no hace falta
+    return df if mascara.all() else df[mascara]
+
+def filtrar_anios(df, mostrar=True):
+    """Filtra los registros entre ANIO_MIN y ANIO_MAX usando la columna de año o de fecha"""
+    anio_col = esquemas.columna(df, 'anio')
+    fecha_col = esquemas.columna(df, 'fecha')
+
+    if anio_col:
+        if mostrar:
+            print(f"  Filtrando datos entre {ANIO_MIN} y {ANIO_MAX} usando columna {anio_col}")
+
+        # Convertir a numérico y filtrar sin modificar el DataFrame recibido
+        anios = pd.to_numeric(df[anio_col], errors='coerce')
+        df = _filtrar_filas(df.assign(**{anio_col: anios}), (anios >= ANIO_MIN) & (anios <= ANIO_MAX))
+    elif fecha_col:
+        if mostrar:
+            print(f"  Filtrando datos entre {ANIO_MIN} y {ANIO_MAX} usando columna {fecha_col}")
+        # Convertir a datetime (las fechas vienen como día/mes/año) y filtrar
+        fechas = pd.to_datetime(df[fecha_col], errors='coerce', dayfirst=True)
+        df = _filtrar_filas(df.assign(**{fecha_col: fechas}), (fechas.dt.year >= ANIO_MIN) & (fechas.dt.year <= ANIO_MAX))
+
+    if mostrar:
+        print(f"  Filas después de filtrar por año: {df.shape[0]}, Columnas: {df.shape[1]}")
+    return df
+
+# ==========================================
+# Lectura por bloques para archivos grandes
+# ==========================================
+
+def es_archivo_grande(filename):
+    """Indica si el CSV supera UMBRAL_STREAMING_MB y debe procesarse por bloques"""
+    if filename in ARCHIVOS_SIN_AGREGAR:
+        return False
+    try:
+        return os.path.getsize(os.path.join(DATOS_DIR, filename)) > UMBRAL_STREAMING_MB * 1024 * 1024
+    except OSError:
+        return False
+
+def _detectar_separador(ruta):
+    registro = esquemas.esquema(ruta)
+    if registro is not None:
+        return registro['separador']
+    with open(ruta, encoding=detectar_codificacion(ruta)) as f:
+        encabezado = f.readline()
+    return ';' if encabezado.count(';') >= encabezado.count(',') and ';' in encabezado else ','
+
+def encabezado(filename):
+    """Nombres de las columnas de un CSV de la carpeta de datos"""
+    ruta = os.path.join(DATOS_DIR, filename)
+    return pd.read_csv(ruta, encoding=detectar_codificacion(ruta), sep=_detectar_separador(ruta), nrows=0).columns.tolist()
+
+def archivos_con_roles(*roles):
+    """CSV de la carpeta de datos que tienen una columna para cada uno de los roles de esquemas"""
+    archivos = []
+    for archivo in sorted(os.listdir(DATOS_DIR)):
+        if not archivo.endswith('.csv'):
+            continue
+        columnas = encabezado(archivo)
+        if all(esquemas.columna_archivo(archivo, columnas, rol) for rol in roles):
+            archivos.append(archivo)
+    return archivos
+
+def columnas_agregables(filename, columnas):
+    """Selecciona las columnas que se conservan como dimensiones al agregar un dataset"""
+    registradas = esquemas.dimensiones(filename, columnas)
+    if registradas is not None:
+        return registradas
+    return [
+        col for col in columnas
+        if any(clave in col.upper() for clave in COLUMNAS_DIMENSION)
+        and not any(clave in col.upper() for clave in COLUMNAS_EXCLUIDAS)
+    ]
+
+def iterar_dataset(filename, columnas=None, filtrar=True, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Recorre un CSV por bloques aplicando la proyección de columnas y el filtro de años.
+
+    Se usan los tipos del esquema registrado (las categóricas como texto, porque cada
+    bloque tendría categorías distintas); sin esquema todos los valores se leen como texto.
+    """
+    ruta = os.path.join(DATOS_DIR, filename)
+    usecols = None if columnas is None else (lambda col: col in columnas)
+    opciones = esquemas.opciones_lectura(ruta)
+    if opciones is None:
+        tipos = str
+    else:
+        tipos = {col: ('str' if tipo == 'category' else tipo) for col, tipo in opciones['dtype'].items()}
+    lector = pd.read_csv(ruta, encoding=detectar_codificacion(ruta), sep=_detectar_separador(ruta), usecols=usecols,
+                         dtype=tipos, chunksize=filas_por_bloque)
+
+    for bloque in lector:
+        bloque = esquemas.convertir_tipos(bloque, filename)
+        bloque.attrs['dataset'] = filename
+        if filtrar:
+            bloque = filtrar_anios(bloque, mostrar=False)
+        if not bloque.empty:
+            yield bloque
+
+def agregar_dataset(filename, dimensiones=None, filtrar=False, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Agrega un CSV por bloques sin cargarlo completo en memoria.
+
+    Devuelve una fila por combinación de dimensiones con el número de registros
+    (COLUMNA_REGISTROS) y, si existe, la suma de la columna de cantidad. La memoria
+    usada depende del número de combinaciones, no del tamaño del archivo.
+    """
+    columnas_csv = encabezado(filename)
+    if dimensiones is None:
+        dimensiones = columnas_agregables(filename, columnas_csv)
+    cantidad = esquemas.columna_archivo(filename, columnas_csv, 'cantidad')
+    columnas = dimensiones + ([cantidad] if cantidad else [])
+
+    medidas = {COLUMNA_REGISTROS: 'sum'}
+    if cantidad:
+        medidas[cantidad] = 'sum'
+
+    acumulado = None
+    filas = 0
+    for bloque in iterar_dataset(filename, columnas, filtrar, filas_por_bloque):
+        filas += len(bloque)
+        bloque = bloque.assign(**{COLUMNA_REGISTROS: 1})
+        if cantidad:
+            bloque[cantidad] = pd.to_numeric(bloque[cantidad], errors='coerce').fillna(0)
+
+        parcial = bloque.groupby(dimensiones, dropna=False, observed=True).agg(medidas)
+
+        # Combinar con los conteos acumulados de los bloques anteriores
+        if acumulado is None:
+            acumulado = parcial
+        else:
+            acumulado = pd.concat([acumulado, parcial]).groupby(level=list(range(len(dimensiones))), dropna=False).sum()
+
+    if acumulado is None:
+        return pd.DataFrame(columns=columnas + [COLUMNA_REGISTROS])
+
+    print(f"  {filas} registros agregados en {len(acumulado)} combinaciones de {len(dimensiones)} dimensiones")
+    return acumulado.reset_index()
+
+@instrumentar('lectura')
+def _leer_dataset(filename, usar_cache=True):
+    """Lee un CSV (o su copia en caché) sin filtrar y lo conserva en memoria"""
+    if filename in _memoria:
+        return _memoria[filename]
+
+    ruta = os.path.join(DATOS_DIR, filename)
+    df = None
+    try:
+        base = _ruta_cache(ruta) if usar_cache else None
+
+        if base is not None:
+            df = _leer_cache(base)
+            if df is not None:
+                print(f"  Usando caché columnar para {filename}")
+
+        if df is None:
+            df = categorizar(_leer_csv(ruta))
+            if base is not None:
+                _guardar_cache(df, base)
+    except Exception as e:
+        print(f"Error al cargar {filename}: {e}")
+
+    # El nombre del archivo permite resolver los roles de columna con esquemas.columna
+    if df is not None:
+        df.attrs['dataset'] = filename
+
+    # También se recuerdan los archivos que no se pudieron cargar para no reintentarlos
+    _memoria[filename] = df
+    return df
+
+@instrumentar('lectura')
+def _leer_agregado(filename, usar_cache=True):
+    """Agrega por bloques un CSV grande (sin filtrar) y conserva el resultado en memoria y caché"""
+    clave = (filename, 'agregado')
+    if clave in _memoria:
+        return _memoria[clave]
+
+    ruta = os.path.join(DATOS_DIR, filename)
+    df = None
+    try:
+        base = _ruta_cache(ruta) + '.agregado' if usar_cache else None
+
+        if base is not None:
+            df = _leer_cache(base)
+            if df is not None:
+                print(f"  Usando caché de conteos agregados para {filename}")
+
+        if df is None:
+            print(f"  {filename} supera {UMBRAL_STREAMING_MB:.0f} MB: se procesa por bloques")
+            df = categorizar(agregar_dataset(filename))
+            if base is not None:
+                _guardar_cache(df, base)
+    except Exception as e:
+        print(f"Error al agregar {filename}: {e}")
+
+    if df is not None:
+        df.attrs['dataset'] = filename
+    _memoria[clave] = df
+    return df
+
+def precargar_datasets(archivos):
+    """Lee una sola vez cada archivo para compartirlo entre las etapas del análisis"""
+    for archivo in archivos:
+        if es_archivo_grande(archivo):
+            if (archivo, 'agregado') not in _memoria:
+                print(f"Cargando {archivo}...")
+                _leer_agregado(archivo)
+        elif archivo not in _memoria:
+            print(f"Cargando {archivo}...")
+            _leer_dataset(archivo)
+
+def liberar_memoria():
+    """Descarta los datasets conservados en memoria"""
+    _memoria.clear()
+
+# Función para cargar y limpiar datasets
+@instrumentar('carga')
+def load_dataset(filename, filtrar=True, usar_cache=True):
+    """Carga un CSV de la carpeta de datos usando la caché columnar cuando está vigente.
+
+    La primera lectura convierte el CSV a Parquet (o pickle comprimido si no es posible)
+    en CACHE_DIR; las siguientes cargan esa copia mientras el archivo original no cambie.
+    Cada archivo se lee una sola vez por proceso y se entrega una copia a cada llamada
+    (superficial con pandas 3, donde los datos se duplican solo al modificarlos).
+    Los archivos mayores que UMBRAL_STREAMING_MB se leen por bloques y se entregan como
+    conteos agregados por dimensión (ver agregacion.COLUMNA_REGISTROS).
+    Si filtrar es True, se conservan solo los registros entre ANIO_MIN y ANIO_MAX.
+    """
+    print(f"Cargando {filename}...")
+    if es_archivo_grande(filename):
+        df = _leer_agregado(filename, usar_cache)
+    else:
+        df = _leer_dataset(filename, usar_cache)
+    if df is None:
+        return None
+
+    try:
+        resultado = filtrar_anios(df) if filtrar else df
+
+        # Entregar siempre un DataFrame propio para que el llamador pueda modificarlo
+        if resultado is df:
+            resultado = df.copy(deep=not COPIA_SUPERFICIAL)
+
+        if not filtrar:
+            print(f"  Filas: {resultado.shape[0]}, Columnas: {resultado.shape[1]}")
+        return resultado
+    except Exception as e:
+        print(f"Error al cargar {filename}: {e}")
+        return None
@@ -0,0 +1,317 @@
+import os
+import glob
+import hashlib
+import numpy as np
+import pandas as pd
+from carga_datos import load_dataset, DATOS_DIR, ARCHIVOS_SIN_AGREGAR
+from agregacion import COLUMNA_REGISTROS, pesos
+import esquemas
+from divipola import normalizar_codigo
+from normalizacion import claves
+
+# Directorio donde se guardan los cubos ya construidos
+CUBOS_DIR = os.path.join('.cache', 'cubos')
+
+# Incrementar si cambia la forma de construir los cubos para invalidar la caché
+VERSION_CUBO = 6
+
+# Dimensiones categóricas del cubo (roles de columna de esquemas.py)
+DIMENSIONES_CATEGORICAS = ['departamento', 'municipio', 'genero', 'armas', 'zona', 'conducta']
+
+# Dimensiones temporales (se derivan de columnas de año/mes/día/hora o de la fecha del hecho)
+DIMENSIONES_TEMPORALES = ['año', 'mes', 'dia_semana', 'hora']
+
+# Dimensiones numéricas: las temporales y el código DANE del municipio (5 dígitos)
+DIMENSIONES_NUMERICAS = DIMENSIONES_TEMPORALES + ['cod_municipio']
+
+MESES = {
+    'ENERO': 1, 'FEBRERO': 2, 'MARZO': 3, 'ABRIL': 4, 'MAYO': 5, 'JUNIO': 6,
+    'JULIO': 7, 'AGOSTO': 8, 'SEPTIEMBRE': 9, 'OCTUBRE': 10, 'NOVIEMBRE': 11, 'DICIEMBRE': 12
+}
+
+# Primeras tres letras de la clave canónica del día (sin tildes y en mayúsculas)
+DIAS_SEMANA = {'LUN': 0, 'MAR': 1, 'MIE': 2, 'JUE': 3, 'VIE': 4, 'SAB': 5, 'DOM': 6}
+
+# Ejes completos de los patrones temporales, aunque al dataset le falten valores
+EJES_TEMPORALES = {'dia_semana': np.arange(7), 'hora': np.arange(24), 'mes': np.arange(1, 13)}
+
+# Dimensiones del arreglo de patrones temporales de cada dataset
+DIMENSIONES_PATRONES = ['dia_semana', 'hora', 'mes', 'año']
+
+# Cubos ya cargados en este proceso; los procesos hijos creados con fork los heredan
+_cubos = {}
+
+def _derivar_temporales(df):
+    """Calcula año, mes (1-12), día de la semana (0=lunes) y hora (0-23) a partir de las columnas disponibles"""
+    temporales = {}
+
+    col_fecha = esquemas.columna(df, 'fecha')
+    fechas = None
+    if col_fecha is not None:
+        fechas = pd.to_datetime(df[col_fecha], errors='coerce', dayfirst=True)
+
+    col_anio = esquemas.columna(df, 'anio')
+    if col_anio is not None:
+        temporales['año'] = pd.to_numeric(df[col_anio], errors='coerce')
+    elif fechas is not None:
+        temporales['año'] = fechas.dt.year
+
+    col_mes = esquemas.columna(df, 'mes')
+    if col_mes is not None:
+        meses = claves(df[col_mes]).map(MESES).astype(float)
+        temporales['mes'] = meses.fillna(pd.to_numeric(df[col_mes], errors='coerce'))
+    elif fechas is not None:
+        temporales['mes'] = fechas.dt.month
+
+    col_dia = esquemas.columna(df, 'dia_semana')
+    if col_dia is not None:
+        dias = claves(df[col_dia])
+        temporales['dia_semana'] = dias.map({d: DIAS_SEMANA.get(d[:3]) for d in dias.cat.categories}).astype(float)
+    elif fechas is not None:
+        temporales['dia_semana'] = fechas.dt.dayofweek
+
+    col_hora = esquemas.columna(df, 'hora')
+    if col_hora is not None:
+        temporales['hora'] = _horas(df[col_hora])
+
+    return temporales
+
+def _horas(serie):
+    """Hora del día (0-23) de una columna numérica o de texto ('14', '14:30', '12:00 - 17:59')"""
+    if pd.api.types.is_numeric_dtype(serie):
+        horas = serie.astype(float)
+    else:
+        # La hora (primer número del texto) se extrae una vez por valor distinto
+        codigos, unicos = pd.factorize(serie)
+        por_valor = pd.Series(unicos.astype(str)).str.extract(r'(\d+)', expand=False).astype(float).to_numpy()
+        horas = pd.Series(np.where(codigos >= 0, por_valor[np.maximum(codigos, 0)] if len(por_valor) else np.nan, np.nan),
+                          index=serie.index)
+    return horas.where(horas.between(0, 23))
+
+def construir_cubo(df, nombre):
+    """Construye el cubo de conteos de un dataset.
+
+    El cubo guarda una tabla de valores por dimensión (codificación por diccionario) y,
+    para cada combinación presente, los códigos de cada dimensión, el número de registros
+    y el número de casos (suma de la columna CANTIDAD/Cantidad si el dataset la tiene).
+    Los cortes densos se obtienen después con np.bincount sin volver a leer los registros.
+    """
+    series = _derivar_temporales(df)
+    columnas = {}
+    col_codigo = esquemas.columna(df, 'cod_municipio')
+    if col_codigo is not None:
+        series['cod_municipio'] = pd.Series(normalizar_codigo(df[col_codigo]), index=df.index).where(lambda c: c >= 0)
+        columnas['cod_municipio'] = col_codigo
+    for dimension in DIMENSIONES_CATEGORICAS:
+        col = esquemas.columna(df, dimension)
+        if col is not None and col not in columnas.values():
+            series[dimension] = df[col]
+            columnas[dimension] = col
+
+    dimensiones = [d for d in DIMENSIONES_NUMERICAS if d in series] + \
+                  [d for d in DIMENSIONES_CATEGORICAS if d in columnas]
+
+    # Codificar cada dimensión: códigos enteros (-1 = sin dato) y valores ordenados
+    codigos = []
+    valores = {}
+    for dimension in dimensiones:
+        codigo, vocabulario = pd.factorize(series[dimension], sort=True)
+        if dimension in DIMENSIONES_NUMERICAS:
+            valores[dimension] = np.asarray(vocabulario, dtype=np.int64)
+        else:
+            valores[dimension] = np.asarray(vocabulario, dtype=str)
+        codigos.append(codigo.astype(np.int32))
+
+    if COLUMNA_REGISTROS in df.columns:
+        filas = df[COLUMNA_REGISTROS].to_numpy(dtype=np.int64)
+    else:
+        filas = np.ones(len(df), dtype=np.int64)
+    casos = pesos(df)
+    casos = filas if casos is None else casos.to_numpy(dtype=np.float64)
+
+    # Agrupar las combinaciones repetidas de códigos y sumar sus registros
+    combinaciones = np.column_stack(codigos) if codigos else np.zeros((len(df), 0), dtype=np.int32)
+    celdas, inversa = np.unique(combinaciones, axis=0, return_inverse=True)
+    inversa = inversa.ravel()
+    registros = np.bincount(inversa, weights=filas, minlength=len(celdas)).astype(np.int64)
+    cantidad = np.bincount(inversa, weights=casos, minlength=len(celdas)).astype(np.int64)
+
+    return {
+        'nombre': nombre,
+        'dimensiones': dimensiones,
+        'columnas': columnas,
+        'valores': valores,
+        'codigos': {d: np.ascontiguousarray(celdas[:, i]) for i, d in enumerate(dimensiones)},
+        'registros': registros,
+        'cantidad': cantidad
+    }
+
+def _ruta_cubo(filename):
+    ruta = os.path.join(DATOS_DIR, filename)
+    info = os.stat(ruta)
+    clave = f"{os.path.abspath(ruta)}|{info.st_mtime_ns}|{info.st_size}|{VERSION_CUBO}"
+    digest = hashlib.sha1(clave.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(CUBOS_DIR, f"{os.path.splitext(filename)[0]}-{digest}.npz")
+
+def guardar_cubo(cubo, ruta):
+    """Guarda el cubo en un .npz comprimido"""
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    arreglos = {'registros': cubo['registros'], 'cantidad': cubo['cantidad']}
+    for dimension in cubo['dimensiones']:
+        arreglos[f'valores__{dimension}'] = cubo['valores'][dimension]
+        arreglos[f'codigos__{dimension}'] = cubo['codigos'][dimension]
+    meta = [cubo['nombre']] + [f"{d}={cubo['columnas'].get(d, '')}" for d in cubo['dimensiones']]
+    arreglos['meta'] = np.asarray(meta, dtype=str)
+
+    with open(ruta + '.tmp', 'wb') as f:
+        np.savez_compressed(f, **arreglos)
+    os.replace(ruta + '.tmp', ruta)
+
+def leer_cubo(ruta):
+    """Lee un cubo guardado con guardar_cubo"""
+    with np.load(ruta) as datos:
+        meta = [str(m) for m in datos['meta']]
+        dimensiones = [m.split('=', 1)[0] for m in meta[1:]]
+        columnas = {d: c for d, c in (m.split('=', 1) for m in meta[1:]) if c}
+        return {
+            'nombre': meta[0],
+            'dimensiones': dimensiones,
+            'columnas': columnas,
+            'valores': {d: datos[f'valores__{d}'] for d in dimensiones},
+            'codigos': {d: datos[f'codigos__{d}'] for d in dimensiones},
+            'registros': datos['registros'],
+            'cantidad': datos['cantidad']
+        }
+
+def cargar_cubo(filename, usar_cache=True):
+    """Devuelve el cubo de un dataset, construyéndolo solo si no está en memoria ni en caché"""
+    if filename in _cubos:
+        return _cubos[filename]
+
+    cubo = None
+    try:
+        ruta = _ruta_cubo(filename) if usar_cache else None
+        if ruta is not None and os.path.exists(ruta):
+            try:
+                cubo = leer_cubo(ruta)
+            except Exception as e:
+                print(f"  No se pudo leer el cubo {ruta}: {e}")
+
+        if cubo is None:
+            df = load_dataset(filename, filtrar=False)
+            if df is not None:
+                print(f"  Construyendo cubo de {filename}...")
+                cubo = construir_cubo(df, os.path.splitext(filename)[0])
+                print(f"  Cubo de {filename}: {len(cubo['registros'])} celdas, dimensiones {', '.join(cubo['dimensiones'])}")
+                if ruta is not None:
+                    # Eliminar cubos obsoletos del mismo archivo antes de guardar el nuevo
+                    for anterior in glob.glob(f"{glob.escape(ruta.rsplit('-', 1)[0])}-*.npz"):
+                        os.remove(anterior)
+                    guardar_cubo(cubo, ruta)
+    except OSError as e:
+        print(f"Error al cargar el cubo de {filename}: {e}")
+
+    _cubos[filename] = cubo
+    return cubo
+
+def precargar_cubos(archivos):
+    """Construye o lee los cubos de los datasets de hechos antes de repartir las tareas"""
+    for archivo in archivos:
+        if archivo not in ARCHIVOS_SIN_AGREGAR:
+            cargar_cubo(archivo)
+
+def _mascara(cubo, filtros):
+    """Celdas que cumplen los filtros; cada filtro es una lista de valores o una función sobre un valor"""
+    mascara = np.ones(len(cubo['registros']), dtype=bool)
+    for dimension, condicion in filtros.items():
+        valores = cubo['valores'][dimension]
+        if callable(condicion):
+            permitidos = np.array([bool(condicion(v)) for v in valores.tolist()], dtype=bool)
+        else:
+            permitidos = np.isin(valores, list(condicion))
+        codigos = cubo['codigos'][dimension]
+        mascara &= (codigos >= 0) & permitidos[np.maximum(codigos, 0)]
+    return mascara
+
+def cortar(cubo, dimensiones, medida='cantidad', **filtros):
+    """Devuelve un arreglo denso con los conteos sobre las dimensiones pedidas.
+
+    medida es 'cantidad' (casos, ponderados por CANTIDAD) o 'registros' (filas).
+    Los ejes siguen el orden de cubo['valores'][dimension]; las celdas sin dato en alguna
+    de las dimensiones pedidas se descartan, como en groupby.
+    """
+    if isinstance(dimensiones, str):
+        dimensiones = [dimensiones]
+    mascara = _mascara(cubo, filtros)
+    for dimension in dimensiones:
+        mascara &= cubo['codigos'][dimension] >= 0
+
+    forma = tuple(len(cubo['valores'][d]) for d in dimensiones)
+    codigos = [cubo['codigos'][d][mascara] for d in dimensiones]
+    lineal = np.ravel_multi_index(codigos, forma) if dimensiones else np.zeros(mascara.sum(), dtype=np.int64)
+    denso = np.bincount(lineal, weights=cubo[medida][mascara], minlength=int(np.prod(forma)))
+    return denso.astype(np.int64).reshape(forma)
+
+def serie(cubo, dimensiones, medida='cantidad', **filtros):
+    """Conteos del cubo como Series de pandas (equivalente a groupby(dimensiones).size())"""
+    if isinstance(dimensiones, str):
+        dimensiones = [dimensiones]
+    denso = cortar(cubo, dimensiones, medida, **filtros)
+    posiciones = np.nonzero(denso)
+    niveles = [cubo['valores'][d][p] for d, p in zip(dimensiones, posiciones)]
+    if len(dimensiones) == 1:
+        indice = pd.Index(niveles[0], name=dimensiones[0])
+    else:
+        indice = pd.MultiIndex.from_arrays(niveles, names=dimensiones)
+    return pd.Series(denso[posiciones], index=indice, name='cantidad')
+
+def serie_valores(cubo, dimension, medida='cantidad', **filtros):
+    """Conteos de una dimensión ordenados de mayor a menor (como value_counts)"""
+    return serie(cubo, dimension, medida, **filtros).sort_values(ascending=False, kind='stable')
+
+def patrones_temporales(cubo, dimensiones=DIMENSIONES_PATRONES, medida='cantidad', **filtros):
+    """Arreglo denso de conteos sobre las dimensiones pedidas (por defecto día de la semana ×
+    hora × mes × año; se puede añadir, por ejemplo, 'departamento').
+
+    Se calcula en una sola pasada sobre las celdas del cubo: los códigos de cada dimensión
+    se traducen a posiciones en su eje, se combinan en un índice lineal y se suman con
+    np.bincount. Los ejes de EJES_TEMPORALES son completos; los demás siguen
+    cubo['valores']. Cada eje tiene además una última posición para las celdas sin dato en
+    esa dimensión (o de un dataset que no la tiene), así que cualquier gráfico temporal es
+    una suma del arreglo sobre los ejes que no usa (ver marginal).
+    Devuelve el arreglo y un diccionario dimensión -> valores del eje (sin la posición de sin dato).
+    """
+    mascara = _mascara(cubo, filtros)
+    ejes = {}
+    posiciones = []
+    for dimension in dimensiones:
+        valores = cubo['valores'].get(dimension)
+        if dimension in EJES_TEMPORALES:
+            eje = EJES_TEMPORALES[dimension]
+        else:
+            eje = valores if valores is not None else np.array([], dtype=np.int64)
+        ejes[dimension] = eje
+
+        if valores is None:
+            posiciones.append(np.full(int(mascara.sum()), len(eje), dtype=np.int64))
+            continue
+        # Posición en el eje de cada valor del vocabulario; el código -1 (tabla[-1]) y los
+        # valores fuera del eje van a la posición de sin dato
+        tabla = np.full(len(valores) + 1, len(eje), dtype=np.int64)
+        indice = pd.Index(eje).get_indexer(valores)
+        tabla[:-1] = np.where(indice >= 0, indice, len(eje))
+        posiciones.append(tabla[cubo['codigos'][dimension][mascara]])
+
+    forma = tuple(len(eje) + 1 for eje in ejes.values())
+    lineal = np.ravel_multi_index(posiciones, forma) if posiciones else np.zeros(mascara.sum(), dtype=np.int64)
+    denso = np.bincount(lineal, weights=cubo[medida][mascara], minlength=int(np.prod(forma)))
+    return denso.astype(np.int64).reshape(forma), ejes
+
+def marginal(conteos, ejes, conservar):
+    """Corte de patrones_temporales sobre las dimensiones de conservar (en ese orden): suma
+    sobre las demás y descarta las posiciones de sin dato de las conservadas"""
+    dimensiones = list(ejes)
+    sumados = tuple(i for i, d in enumerate(dimensiones) if d not in conservar)
+    restantes = [d for d in dimensiones if d in conservar]
+    corte = np.transpose(conteos.sum(axis=sumados), [restantes.index(d) for d in conservar])
+    return corte[tuple(slice(0, -1) for _ in conservar)]
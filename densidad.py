@@ -0,0 +1,97 @@
+import numpy as np
+
+# ==========================================
+# Agregación espacial en rejillas por nivel de zoom
+# ==========================================
+
+# Rectángulo aproximado de Colombia: (lat_min, lat_max, lon_min, lon_max)
+LIMITES_COLOMBIA = (-4.2, 13.0, -82.0, -66.0)
+
+# Niveles de zoom con rejilla incrustada en el mapa (en el peor caso unas 9000 celdas sobre
+# toda Colombia); por encima del último el detalle se pide a la pirámide de teselas
+NIVELES_ZOOM = range(4, 9)
+
+# Niveles de zoom de la pirámide de teselas; por encima del último el navegador amplía
+# las teselas del último nivel
+NIVELES_TESELAS = range(4, 13)
+
+# Celdas por lado de cada tesela (celdas de 16 px en teselas de 256 px)
+CELDAS_POR_TESELA = 16
+
+# Tamaño de la celda en píxeles de pantalla (una tesela de Leaflet mide 256 px)
+PIXELES_CELDA = 32
+
+def tamano_celda(zoom, pixeles=PIXELES_CELDA):
+    """Lado de la celda en grados para que ocupe unos `pixeles` en pantalla con ese zoom"""
+    return 360.0 / 2 ** zoom * pixeles / 256
+
+def agregar_rejilla(lat, lon, tamano, pesos=None, limites=LIMITES_COLOMBIA):
+    """Suma los puntos (o sus pesos) en una rejilla regular de celdas de `tamano` grados.
+
+    Devuelve solo las celdas con casos: fila y columna de cada celda (contadas desde la
+    esquina suroeste de los límites), su número de casos y los datos para reconstruir sus bordes.
+    """
+    lat_min, lat_max, lon_min, lon_max = limites
+    filas_total = int(np.ceil((lat_max - lat_min) / tamano))
+    columnas_total = int(np.ceil((lon_max - lon_min) / tamano))
+
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    dentro = (lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)
+    fila = np.minimum(((lat[dentro] - lat_min) / tamano).astype(np.int64), filas_total - 1)
+    columna = np.minimum(((lon[dentro] - lon_min) / tamano).astype(np.int64), columnas_total - 1)
+    peso = None if pesos is None else np.asarray(pesos, dtype=np.float64)[dentro]
+
+    conteos = np.bincount(fila * columnas_total + columna, weights=peso,
+                          minlength=filas_total * columnas_total)
+    celdas = np.flatnonzero(conteos)
+    return {
+        'tamano': tamano,
+        'limites': limites,
+        'fila': (celdas // columnas_total).astype(np.int32),
+        'columna': (celdas % columnas_total).astype(np.int32),
+        'casos': conteos[celdas]
+    }
+
+def sumar_rejillas(rejillas):
+    """Suma celda a celda varias rejillas del mismo tamaño y límites (por ejemplo, una por bloque)"""
+    rejillas = list(rejillas)
+    _, _, lon_min, lon_max = rejillas[0]['limites']
+    columnas_total = int(np.ceil((lon_max - lon_min) / rejillas[0]['tamano']))
+    claves, inversa = np.unique(np.concatenate([r['fila'].astype(np.int64) * columnas_total + r['columna']
+                                                for r in rejillas]), return_inverse=True)
+    casos = np.bincount(inversa.ravel(), weights=np.concatenate([r['casos'] for r in rejillas]),
+                        minlength=len(claves))
+    return dict(rejillas[0],
+                fila=(claves // columnas_total).astype(np.int32),
+                columna=(claves % columnas_total).astype(np.int32),
+                casos=casos)
+
+def bordes_celdas(rejilla):
+    """Latitud y longitud mínimas y máximas de cada celda de la rejilla"""
+    lat_min, _, lon_min, _ = rejilla['limites']
+    tamano = rejilla['tamano']
+    sur = lat_min + rejilla['fila'] * tamano
+    oeste = lon_min + rejilla['columna'] * tamano
+    return sur, oeste, sur + tamano, oeste + tamano
+
+def piramide_densidad(lat, lon, pesos=None, niveles=NIVELES_ZOOM, limites=LIMITES_COLOMBIA):
+    """Rejilla de densidad para cada nivel de zoom"""
+    return {zoom: agregar_rejilla(lat, lon, tamano_celda(zoom), pesos, limites) for zoom in niveles}
+
+def piramide_densidad_bloques(bloques, niveles=NIVELES_ZOOM, limites=LIMITES_COLOMBIA):
+    """Pirámide de densidad de puntos que llegan por bloques (lat, lon, pesos), sumando bloque a bloque"""
+    piramide = None
+    for lat, lon, pesos in bloques:
+        parcial = piramide_densidad(lat, lon, pesos, niveles, limites)
+        piramide = parcial if piramide is None else {
+            zoom: sumar_rejillas([piramide[zoom], parcial[zoom]]) for zoom in niveles}
+    return piramide
+
+def pixeles_mercator(lat, lon, zoom):
+    """Coordenadas en píxeles globales de Web Mercator (teselas de 256 px) para un nivel de zoom"""
+    escala = 256.0 * 2 ** zoom
+    seno = np.sin(np.radians(np.asarray(lat, dtype=np.float64)))
+    x = (np.asarray(lon, dtype=np.float64) + 180.0) / 360.0 * escala
+    y = (0.5 - np.log((1 + seno) / (1 - seno)) / (4 * np.pi)) * escala
+    return x, y
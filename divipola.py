@@ -0,0 +1,182 @@
+import numpy as np
+import pandas as pd
+from normalizacion import reparar_mojibake
+
+# ==========================================
+# Índice de códigos DANE (DIVIPOLA) de departamentos y municipios
+# ==========================================
+
+# Departamentos: código DANE -> (nombre, latitud, longitud); el punto de referencia es su capital
+DEPARTAMENTOS = {
+    5: ('ANTIOQUIA', 6.2476, -75.5658),
+    8: ('ATLÁNTICO', 10.9685, -74.7813),
+    11: ('BOGOTÁ D.C.', 4.6097, -74.0817),
+    13: ('BOLÍVAR', 10.3997, -75.5144),
+    15: ('BOYACÁ', 5.5544, -73.3575),
+    17: ('CALDAS', 5.0661, -75.5039),
+    18: ('CAQUETÁ', 1.6136, -75.6121),
+    19: ('CAUCA', 2.4448, -76.6142),
+    20: ('CESAR', 10.4631, -73.2532),
+    23: ('CÓRDOBA', 8.7489, -75.8800),
+    25: ('CUNDINAMARCA', 4.6019, -74.0819),
+    27: ('CHOCÓ', 5.6922, -76.6581),
+    41: ('HUILA', 2.5359, -75.5277),
+    44: ('LA GUAJIRA', 11.5444, -72.9072),
+    47: ('MAGDALENA', 11.2404, -74.1996),
+    50: ('META', 4.1429, -73.6259),
+    52: ('NARIÑO', 1.2136, -77.2811),
+    54: ('NORTE DE SANTANDER', 7.8939, -72.5078),
+    63: ('QUINDÍO', 4.5389, -75.6729),
+    66: ('RISARALDA', 4.8133, -75.6961),
+    68: ('SANTANDER', 7.1254, -73.1198),
+    70: ('SUCRE', 9.3048, -75.3975),
+    73: ('TOLIMA', 4.0993, -75.1538),
+    76: ('VALLE DEL CAUCA', 3.4516, -76.5320),
+    81: ('ARAUCA', 7.0907, -70.7616),
+    85: ('CASANARE', 5.3389, -72.3891),
+    86: ('PUTUMAYO', 0.4360, -76.5364),
+    88: ('SAN ANDRÉS', 12.5567, -81.7226),
+    91: ('AMAZONAS', -1.4418, -71.5724),
+    94: ('GUAINÍA', 3.8608, -67.9249),
+    95: ('GUAVIARE', 2.5739, -72.6421),
+    97: ('VAUPÉS', 1.2537, -70.2337),
+    99: ('VICHADA', 4.4234, -69.2872)
+}
+
+# Municipios con coordenadas conocidas (capitales): código DANE -> (nombre, latitud, longitud)
+MUNICIPIOS = {
+    5001: ('MEDELLÍN', 6.2476, -75.5658),
+    8001: ('BARRANQUILLA', 10.9685, -74.7813),
+    11001: ('BOGOTÁ D.C.', 4.6097, -74.0817),
+    13001: ('CARTAGENA', 10.3997, -75.5144),
+    15001: ('TUNJA', 5.5544, -73.3575),
+    17001: ('MANIZALES', 5.0661, -75.5039),
+    18001: ('FLORENCIA', 1.6136, -75.6121),
+    19001: ('POPAYÁN', 2.4448, -76.6142),
+    20001: ('VALLEDUPAR', 10.4631, -73.2532),
+    23001: ('MONTERÍA', 8.7489, -75.8800),
+    27001: ('QUIBDÓ', 5.6922, -76.6581),
+    41001: ('NEIVA', 2.5359, -75.5277),
+    44001: ('RIOHACHA', 11.5444, -72.9072),
+    47001: ('SANTA MARTA', 11.2404, -74.1996),
+    50001: ('VILLAVICENCIO', 4.1429, -73.6259),
+    52001: ('PASTO', 1.2136, -77.2811),
+    54001: ('CÚCUTA', 7.8939, -72.5078),
+    63001: ('ARMENIA', 4.5389, -75.6729),
+    66001: ('PEREIRA', 4.8133, -75.6961),
+    68001: ('BUCARAMANGA', 7.1254, -73.1198),
+    70001: ('SINCELEJO', 9.3048, -75.3975),
+    73001: ('IBAGUÉ', 4.0993, -75.1538),
+    76001: ('CALI', 3.4516, -76.5320),
+    81001: ('ARAUCA', 7.0907, -70.7616),
+    85001: ('YOPAL', 5.3389, -72.3891),
+    86001: ('MOCOA', 1.1477, -76.6481),
+    88001: ('SAN ANDRÉS', 12.5567, -81.7226),
+    88564: ('PROVIDENCIA', 13.3498, -81.3757),
+    91001: ('LETICIA', -4.2158, -69.9400),
+    94001: ('INÍRIDA', 3.8608, -67.9249),
+    95001: ('SAN JOSÉ DEL GUAVIARE', 2.5739, -72.6421),
+    97001: ('MITÚ', 1.2537, -70.2337),
+    99001: ('PUERTO CARREÑO', 6.1852, -67.4931)
+}
+
+# Índices de municipios ya construidos en este proceso, por conjunto de cubos
+_indices = {}
+
+def normalizar_codigo(valores):
+    """Código DANE de municipio (5 dígitos) como enteros; -1 si falta.
+
+    Los códigos de 8 dígitos (municipio + centro poblado, como en Homicidios) se reducen
+    al municipio.
+    """
+    codigos = pd.to_numeric(pd.Series(valores), errors='coerce').fillna(-1).to_numpy(dtype=np.int64)
+    return np.where(codigos >= 1_000_000, codigos // 1000, codigos)
+
+def departamento(codigos):
+    """Código de departamento de cada código de municipio"""
+    codigos = np.asarray(codigos, dtype=np.int64)
+    return np.where(codigos >= 0, codigos // 1000, -1)
+
+def _preferencia(nombre):
+    # Entre variantes del mismo municipio se prefiere la que conserva tildes y eñes
+    return sum(1 for c in nombre if ord(c) > 127)
+
+def construir_indice(pares):
+    """Construye el índice de municipios a partir de pares (código, nombre, registros).
+
+    pares es un DataFrame con columnas codigo, nombre y registros (p. ej. las combinaciones
+    cod_municipio x municipio de los cubos). El índice guarda arreglos alineados y
+    ordenados por código: nombre canónico, latitud y longitud de referencia (NaN si no se
+    conocen), un diccionario código -> variantes del nombre encontradas en los datos y la
+    tabla equivalente de departamentos en 'departamentos'.
+    """
+    pares = pares[pares['codigo'] >= 0].copy()
+    pares['nombre'] = [reparar_mojibake(str(n)) for n in pares['nombre']]
+    pares['preferencia'] = [_preferencia(n) for n in pares['nombre']]
+
+    # Nombre canónico: el de la tabla de capitales o la variante observada más completa y frecuente
+    observados = (pares.groupby(['codigo', 'nombre', 'preferencia'], as_index=False)['registros'].sum()
+                  .sort_values(['codigo', 'preferencia', 'registros'], ascending=[True, False, False])
+                  .drop_duplicates('codigo'))
+    nombres = dict(zip(observados['codigo'].tolist(), observados['nombre'].tolist()))
+    nombres.update({codigo: nombre for codigo, (nombre, _, _) in MUNICIPIOS.items()})
+
+    codigos = np.array(sorted(nombres), dtype=np.int64)
+    latitud = np.full(len(codigos), np.nan)
+    longitud = np.full(len(codigos), np.nan)
+    conocidos = np.isin(codigos, list(MUNICIPIOS))
+    latitud[conocidos] = [MUNICIPIOS[c][1] for c in codigos[conocidos]]
+    longitud[conocidos] = [MUNICIPIOS[c][2] for c in codigos[conocidos]]
+
+    variantes = {}
+    for codigo, nombre in zip(pares['codigo'].tolist(), pares['nombre'].tolist()):
+        if nombre not in variantes.setdefault(codigo, []):
+            variantes[codigo].append(nombre)
+
+    departamentos = np.array(sorted(DEPARTAMENTOS), dtype=np.int64)
+    return {
+        'codigo': codigos,
+        'nombre': np.array([nombres[c] for c in codigos], dtype=object),
+        'latitud': latitud,
+        'longitud': longitud,
+        'variantes': variantes,
+        'departamentos': {
+            'codigo': departamentos,
+            'nombre': np.array([DEPARTAMENTOS[c][0] for c in departamentos], dtype=object),
+            'latitud': np.array([DEPARTAMENTOS[c][1] for c in departamentos]),
+            'longitud': np.array([DEPARTAMENTOS[c][2] for c in departamentos])
+        }
+    }
+
+def indice_cubos(cubos):
+    """Índice de municipios con los códigos y nombres presentes en los cubos de los datasets"""
+    cubos = [c for c in cubos if c is not None and {'cod_municipio', 'municipio'} <= set(c['dimensiones'])]
+    clave = tuple(c['nombre'] for c in cubos)
+    if clave not in _indices:
+        partes = [pd.DataFrame({'codigo': pd.Series(dtype=np.int64), 'nombre': pd.Series(dtype=object),
+                                'registros': pd.Series(dtype=np.int64)})]
+        for cubo in cubos:
+            # Combinaciones de código y nombre presentes en las celdas del cubo
+            codigo = cubo['codigos']['cod_municipio']
+            nombre = cubo['codigos']['municipio']
+            presentes = (codigo >= 0) & (nombre >= 0)
+            partes.append(pd.DataFrame({
+                'codigo': cubo['valores']['cod_municipio'][codigo[presentes]],
+                'nombre': cubo['valores']['municipio'][nombre[presentes]].astype(object),
+                'registros': cubo['registros'][presentes]
+            }))
+        _indices[clave] = construir_indice(pd.concat(partes, ignore_index=True))
+    return _indices[clave]
+
+def posiciones(indice, codigos):
+    """Posición de cada código en el índice (búsqueda binaria vectorizada); -1 si no está"""
+    codigos = np.asarray(codigos, dtype=np.int64)
+    pos = np.searchsorted(indice['codigo'], codigos)
+    pos = np.minimum(pos, len(indice['codigo']) - 1)
+    encontrados = indice['codigo'][pos] == codigos
+    return np.where(encontrados, pos, -1)
+
+def nombres(indice, codigos):
+    """Nombre canónico de cada código de municipio (el propio código si no está en el índice)"""
+    pos = posiciones(indice, codigos)
+    return np.where(pos >= 0, indice['nombre'][np.maximum(pos, 0)], np.asarray(codigos).astype(str))
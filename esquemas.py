@@ -0,0 +1,173 @@
+import os
+import pandas as pd
+from normalizacion import clave
+
+# ==========================================
+# Registro de esquemas de los archivos de datos/
+# ==========================================
+
+# Para cada CSV: separador, separador de miles y columnas a leer con su rol y tipo.
+# Los nombres de columna son los del archivo leído con su codificación real
+# (ver normalizacion.detectar_codificacion).
+# Las columnas que no aparecen aquí no se leen.
+ESQUEMAS = {
+    'Homicidios.csv': {
+        'separador': ';',
+        'columnas': {
+            'Año': ('anio', 'int64'),
+            'Mes': ('mes', 'category'),
+            'Departamento': ('departamento', 'category'),
+            'Código Dane': ('cod_municipio', 'int64'),
+            'Municipio': ('municipio', 'category'),
+            'Armas / Medios': ('armas', 'category'),
+            'Agrupa Edad Persona': ('grupo_edad', 'category'),
+            'Genero': ('genero', 'category'),
+            'Zona': ('zona', 'category'),
+            'Clase de Sitio': ('clase_sitio', 'category'),
+            'Día': ('dia_semana', 'category'),
+            'Cantidad': ('cantidad', 'int64')
+        }
+    },
+    'Delitos_Contra_Medio_Ambiente.csv': {
+        'separador': ',',
+        'columnas': {
+            'FECHA HECHO': ('fecha', 'str'),
+            'COD_DEPTO': ('cod_departamento', 'int64'),
+            'DEPARTAMENTO': ('departamento', 'category'),
+            'COD_MUNI': ('cod_municipio', 'int64'),
+            'MUNICIPIO': ('municipio', 'category'),
+            'DESCRIPCION_CONDUCTA': ('conducta', 'category'),
+            'ZONA': ('zona', 'category'),
+            'CANTIDAD': ('cantidad', 'int64')
+        }
+    },
+    'invasión_Usurpación_Tierras.csv': {
+        'separador': ',',
+        'columnas': {
+            'FECHA HECHO': ('fecha', 'str'),
+            'COD_DEPTO': ('cod_departamento', 'int64'),
+            'DEPARTAMENTO': ('departamento', 'category'),
+            'COD_MUNI': ('cod_municipio', 'int64'),
+            'MUNICIPIO': ('municipio', 'category'),
+            'DESCRIPCION CONDUCTA': ('conducta', 'category'),
+            'CANTIDAD': ('cantidad', 'int64')
+        }
+    },
+    'Frentes_De_Seguridad.csv': {
+        'separador': ',',
+        'columnas': {
+            'REGIÓN': ('region', 'category'),
+            'METROPOLITANA': ('metropolitana', 'category'),
+            'DISTRITO': ('distrito', 'category'),
+            'ESTACIÓN': ('estacion', 'category'),
+            'BARRIO': ('barrio', 'str'),
+            'ZONA': ('zona', 'category'),
+            'NRO INTEGRANTES': ('integrantes', 'int64'),
+            'ESTADO': ('estado', 'category')
+        }
+    },
+    'Presupuesto_de_Gastos.csv': {
+        'separador': ',',
+        'miles': ',',
+        'columnas': {
+            'VIGENCIA': ('anio', 'int64'),
+            'MES': ('mes', 'int64'),
+            'RUBRO': ('rubro', 'category'),
+            'CONCEPTO': ('concepto', 'category'),
+            'PRESUPUESTO VIGENTE (PV)': ('presupuesto', 'float64'),
+            'COMPROMISOS (CP)': ('compromisos', 'float64'),
+            'PAGOS (PG)': ('pagos', 'float64'),
+            'CP/PV': (None, 'float64'),
+            'PG/PV': (None, 'float64')
+        }
+    }
+}
+
+# Detección por nombre de columna para los archivos que no tienen esquema registrado:
+# nombres exactos de cada rol como clave canónica (sin tildes, en mayúsculas) con '_'
+# en lugar de espacios
+DETECCION = {
+    'anio': {'ANO', 'ANIO', 'YEAR', 'VIGENCIA', 'ANO_HECHO'},
+    'mes': {'MES', 'MONTH', 'MES_HECHO'},
+    'dia_semana': {'DIA', 'DAY', 'DIA_SEMANA'},
+    'fecha': {'FECHA', 'FECHA_HECHO', 'FECHA_HECHOS', 'DATE'},
+    'hora': {'HORA', 'HORA_HECHO', 'RANGO_HORARIO'},
+    'departamento': {'DEPARTAMENTO', 'DEPTO', 'DEPARTAMENTO_HECHO', 'DEPTO_HECHO'},
+    'cod_departamento': {'COD_DEPTO', 'COD_DEPARTAMENTO', 'CODIGO_DEPARTAMENTO'},
+    'municipio': {'MUNICIPIO', 'CIUDAD', 'MUNICIPIO_HECHO', 'CIUDAD_HECHO'},
+    'cod_municipio': {'COD_MUNI', 'COD_MUNICIPIO', 'CODIGO_DANE', 'CODIGO_MUNICIPIO'},
+    'latitud': {'LATITUD', 'LAT', 'LATITUDE'},
+    'longitud': {'LONGITUD', 'LON', 'LNG', 'LONGITUDE'},
+    'cantidad': {'CANTIDAD'},
+    'genero': {'GENERO', 'SEXO'},
+    'armas': {'ARMAS_MEDIOS', 'ARMAS_/_MEDIOS', 'ARMA_EMPLEADA'},
+    'zona': {'ZONA'},
+    'conducta': {'DESCRIPCION_CONDUCTA', 'DESCRIPCION_CONDUCTA_CAPTURA', 'MODALIDAD', 'DELITO',
+                 'TIPO_DELITO', 'TIPO_HURTO', 'TIPO_HOMICIDIO'}
+}
+
+# Las columnas numéricas se leen como texto y se convierten después con convertir_tipos:
+# un valor vacío o mal formado queda como dato faltante en lugar de impedir leer el archivo
+TIPOS_NUMERICOS = ['int64', 'float64']
+
+# Roles que no son dimensiones de agregación
+ROLES_MEDIDA = ['cantidad', 'latitud', 'longitud', 'integrantes', 'presupuesto', 'compromisos', 'pagos']
+
+def esquema(filename):
+    """Esquema registrado para un archivo de datos/ o None"""
+    return ESQUEMAS.get(os.path.basename(filename))
+
+def opciones_lectura(filename):
+    """Argumentos de pd.read_csv (separador, columnas y tipos) según el esquema del archivo"""
+    registro = esquema(filename)
+    if registro is None:
+        return None
+    return {
+        'sep': registro['separador'],
+        'usecols': list(registro['columnas']),
+        'dtype': {col: ('str' if tipo in TIPOS_NUMERICOS else tipo)
+                  for col, (_, tipo) in registro['columnas'].items()}
+    }
+
+def convertir_tipos(df, filename):
+    """Convierte a número las columnas numéricas del esquema (leídas como texto).
+
+    Los valores que no son números quedan como faltantes; las columnas enteras con
+    faltantes usan el tipo entero con nulos de pandas ('Int64').
+    """
+    registro = esquema(filename)
+    if registro is None:
+        return df
+    convertidas = {}
+    for col, (_, tipo) in registro['columnas'].items():
+        if tipo not in TIPOS_NUMERICOS or col not in df.columns:
+            continue
+        texto = df[col]
+        if 'miles' in registro:
+            texto = texto.str.replace(registro['miles'], '', regex=False)
+        valores = pd.to_numeric(texto.str.strip(), errors='coerce')
+        if tipo == 'int64':
+            valores = valores.astype('int64' if valores.notna().all() else 'Int64')
+        convertidas[col] = valores
+    return df.assign(**convertidas) if convertidas else df
+
+def columna_archivo(filename, columnas, rol):
+    """Columna con el rol indicado entre las columnas de un archivo"""
+    registro = esquema(filename) if filename else None
+    if registro is not None:
+        return next((col for col, (r, _) in registro['columnas'].items() if r == rol and col in columnas), None)
+
+    nombres = DETECCION.get(rol, ())
+    return next((col for col in columnas if clave(col).replace(' ', '_') in nombres), None)
+
+def columna(df, rol):
+    """Columna del DataFrame con el rol indicado (según el dataset de origen en df.attrs)"""
+    return columna_archivo(df.attrs.get('dataset'), df.columns, rol)
+
+def dimensiones(filename, columnas):
+    """Columnas que sirven como dimensiones de agregación (todas las que tienen un rol no numérico)"""
+    registro = esquema(filename)
+    if registro is None:
+        return None
+    return [col for col, (rol, _) in registro['columnas'].items()
+            if rol and rol not in ROLES_MEDIDA and col in columnas]
@@ -0,0 +1,43 @@
+import os
+import gc
+
+# ==========================================
+# Configuración de producción de server.py
+#   gunicorn server:app
+# ==========================================
+
+def _cpus():
+    # CPUs disponibles para este proceso (respeta los límites del contenedor si los hay)
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+
+# Procesos según las CPUs y unos pocos hilos por proceso: las peticiones de archivos grandes
+# esperan sobre todo E/S, así que cada proceso atiende varias a la vez
+workers = int(os.environ.get('WORKERS', 2 * _cpus() + 1))
+threads = int(os.environ.get('HILOS', 4))
+worker_class = 'gthread'
+
+# Importar server.py (índice de visualizaciones y cubos de datos) una sola vez en el proceso
+# principal antes de crear los procesos hijos: la memoria se comparte por copia en escritura
+preload_app = True
+
+# Conexiones persistentes para las muchas peticiones de un mismo informe (figuras y teselas)
+keepalive = 5
+timeout = 60
+
+accesslog = os.environ.get('ACCESSLOG')
+
+def pre_fork(server, worker):
+    # Sacar del recolector los objetos ya cargados: así las recolecciones de cada proceso
+    # hijo no recorren (ni escriben) sus páginas y estas siguen compartidas
+    gc.freeze()
+
+def post_fork(server, worker):
+    # El proceso principal no arranca el vigilante del índice (los hilos no sobreviven a fork
+    # y su bloqueo podría quedar tomado en el hijo): cada proceso hijo arranca el suyo
+    from server import iniciar_vigilancia
+    iniciar_vigilancia()
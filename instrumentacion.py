@@ -0,0 +1,159 @@
+import os
+import sys
+import json
+import time
+import cProfile
+import pstats
+import datetime
+import functools
+import contextlib
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# ==========================================
+# Medición de tiempos, filas, bytes y memoria por etapa
+# ==========================================
+
+# Eventos medidos en este proceso desde el último reiniciar()
+_eventos = []
+
+# Mediciones abiertas: cada una acumula el tiempo de las que se abren dentro de ella
+_pila = []
+
+def reiniciar():
+    """Descarta los eventos medidos hasta ahora en este proceso"""
+    _eventos.clear()
+
+def eventos():
+    """Devuelve los eventos medidos desde el último reiniciar()"""
+    return list(_eventos)
+
+def rss_pico_mb():
+    """Memoria residente máxima del proceso hasta ahora, en MB (None si no se puede medir)"""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo informa en KB y macOS en bytes
+    return round(pico / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def tamano_archivos(rutas):
+    """Bytes que ocupan los archivos indicados (los que no existen cuentan 0)"""
+    total = 0
+    for ruta in rutas:
+        try:
+            total += os.path.getsize(ruta)
+        except OSError:
+            pass
+    return total
+
+@contextlib.contextmanager
+def medir(categoria, nombre):
+    """Mide tiempo real, tiempo de CPU y memoria pico de un bloque.
+
+    Entrega un diccionario en el que el bloque puede anotar 'filas' procesadas y 'bytes'
+    escritos. 'propio_segundos' y 'propio_cpu_segundos' descuentan el tiempo de las
+    mediciones anidadas, así que sumarlos por categoría reparte el total sin contarlo dos veces.
+    """
+    evento = {'categoria': categoria, 'nombre': nombre, 'filas': None, 'bytes': None}
+    anidadas = {'segundos': 0.0, 'cpu': 0.0}
+    _pila.append(anidadas)
+    inicio = time.perf_counter()
+    inicio_cpu = time.process_time()
+    try:
+        yield evento
+    finally:
+        segundos = time.perf_counter() - inicio
+        cpu = time.process_time() - inicio_cpu
+        _pila.pop()
+        if _pila:
+            _pila[-1]['segundos'] += segundos
+            _pila[-1]['cpu'] += cpu
+        evento.update({
+            'segundos': round(segundos, 4),
+            'propio_segundos': round(segundos - anidadas['segundos'], 4),
+            'cpu_segundos': round(cpu, 4),
+            'propio_cpu_segundos': round(cpu - anidadas['cpu'], 4),
+            'rss_pico_mb': rss_pico_mb(),
+            'nivel': len(_pila),
+            'proceso': os.getpid()
+        })
+        _eventos.append(evento)
+
+def instrumentar(categoria):
+    """Decorador que mide cada llamada con medir().
+
+    El nombre del evento incluye el primer argumento de texto (archivo o dataset) y las
+    filas son las del primer DataFrame recibido o, si no hay, las del devuelto.
+    """
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            texto = next((a for a in args[:2] if isinstance(a, str)), None)
+            nombre = f'{funcion.__name__}({texto})' if texto else funcion.__name__
+            with medir(categoria, nombre) as evento:
+                entrada = next((a for a in args[:2] if hasattr(a, 'shape')), None)
+                resultado = funcion(*args, **kwargs)
+                origen = entrada if entrada is not None else resultado
+                if hasattr(origen, 'shape'):
+                    evento['filas'] = int(origen.shape[0])
+            return resultado
+        return envoltura
+    return decorador
+
+def resumir(lista):
+    """Totales por categoría: llamadas, tiempo y CPU propios, filas, bytes y memoria pico"""
+    categorias = {}
+    for evento in lista:
+        total = categorias.setdefault(evento['categoria'], {
+            'llamadas': 0, 'propio_segundos': 0.0, 'propio_cpu_segundos': 0.0, 'filas': 0, 'bytes': 0, 'rss_pico_mb': None
+        })
+        total['llamadas'] += 1
+        total['propio_segundos'] = round(total['propio_segundos'] + evento['propio_segundos'], 4)
+        total['propio_cpu_segundos'] = round(total['propio_cpu_segundos'] + evento['propio_cpu_segundos'], 4)
+        total['filas'] += evento['filas'] or 0
+        total['bytes'] += evento['bytes'] or 0
+        if evento['rss_pico_mb'] is not None:
+            total['rss_pico_mb'] = max(total['rss_pico_mb'] or 0, evento['rss_pico_mb'])
+    return dict(sorted(categorias.items(), key=lambda c: -c[1]['propio_segundos']))
+
+def guardar_reporte(lista, ruta, datos=None, mas_lentos=25):
+    """Escribe el reporte de la ejecución: resumen por categoría, eventos más lentos y todos los eventos"""
+    resumen = resumir(lista)
+    reporte = dict(datos or {})
+    reporte.update({
+        'fecha': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'categorias': resumen,
+        'mas_lentos': sorted(lista, key=lambda e: -e['propio_segundos'])[:mas_lentos],
+        'eventos': lista
+    })
+    os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+    with open(ruta + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(reporte, f, ensure_ascii=False, indent=2)
+    os.replace(ruta + '.tmp', ruta)
+
+    print("\nTiempo propio por categoría:")
+    for categoria, total in resumen.items():
+        print(f"  {categoria:<16} {total['propio_segundos']:>8.2f} s  (CPU {total['propio_cpu_segundos']:.2f} s, "
+              f"{total['llamadas']} llamadas, {total['bytes'] / 1e6:.1f} MB escritos)")
+    print(f"Reporte de instrumentación guardado en '{ruta}'")
+    return reporte
+
+@contextlib.contextmanager
+def perfilar(ruta=None, lineas=20):
+    """Perfila el bloque con cProfile y guarda el volcado en ruta (no hace nada si ruta es None)"""
+    if ruta is None:
+        yield None
+        return
+    perfil = cProfile.Profile()
+    perfil.enable()
+    try:
+        yield perfil
+    finally:
+        perfil.disable()
+        os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+        perfil.dump_stats(ruta)
+        print(f"\nPerfil de cProfile guardado en '{ruta}' (funciones con más tiempo propio):")
+        pstats.Stats(perfil, stream=sys.stdout).sort_stats('tottime').print_stats(lineas)
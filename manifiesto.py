@@ -0,0 +1,87 @@
+import os
+import json
+import hashlib
+import inspect
+
+# Manifiesto de construcción: qué entradas, parámetros y código produjeron cada visualización
+MANIFIESTO = os.path.join('visualizaciones', '.manifiesto.json')
+
+# Módulos compartidos por todas las etapas; un cambio en ellos invalida todas las salidas
+MODULOS_COMUNES = ['carga_datos.py', 'esquemas.py', 'agregacion.py', 'cubo.py', 'salidas.py', 'capas_mapa.py', 'densidad.py', 'divipola.py', 'normalizacion.py', 'instrumentacion.py', 'memoizacion.py']
+
+def cargar_manifiesto(ruta=MANIFIESTO):
+    """Lee el manifiesto de construcción o devuelve uno vacío"""
+    try:
+        with open(ruta, encoding='utf-8') as f:
+            manifiesto = json.load(f)
+        if isinstance(manifiesto, dict):
+            manifiesto.setdefault('hashes', {})
+            manifiesto.setdefault('tareas', {})
+            return manifiesto
+    except (OSError, ValueError):
+        pass
+    return {'hashes': {}, 'tareas': {}}
+
+def guardar_manifiesto(manifiesto, ruta=MANIFIESTO):
+    """Escribe el manifiesto de forma atómica"""
+    os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+    with open(ruta + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(ruta + '.tmp', ruta)
+
+def _sha256(ruta):
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+def hash_archivo(manifiesto, ruta):
+    """Hash del contenido de un archivo; se reutiliza mientras no cambien su fecha ni tamaño"""
+    try:
+        info = os.stat(ruta)
+    except OSError:
+        return None
+
+    previo = manifiesto['hashes'].get(ruta)
+    if previo and previo['mtime_ns'] == info.st_mtime_ns and previo['tamano'] == info.st_size:
+        return previo['sha256']
+
+    digest = _sha256(ruta)
+    manifiesto['hashes'][ruta] = {'mtime_ns': info.st_mtime_ns, 'tamano': info.st_size, 'sha256': digest}
+    return digest
+
+def version_codigo(manifiesto, funcion):
+    """Versión del código de una tarea: hash del módulo que la define y de los módulos comunes"""
+    # inspect.unwrap: el módulo de la función original y no el del decorador que la mide
+    archivos = [os.path.relpath(inspect.getsourcefile(inspect.unwrap(funcion)))] + MODULOS_COMUNES
+    h = hashlib.sha256()
+    for archivo in archivos:
+        h.update(archivo.encode('utf-8'))
+        h.update((hash_archivo(manifiesto, archivo) or '').encode('utf-8'))
+    return h.hexdigest()
+
+def firma_tarea(manifiesto, funcion, entradas, parametros):
+    """Calcula la firma de una tarea a partir de sus entradas, parámetros y código"""
+    entradas = {ruta: hash_archivo(manifiesto, ruta) for ruta in sorted(entradas)}
+    codigo = version_codigo(manifiesto, funcion)
+    contenido = json.dumps([entradas, parametros, codigo], sort_keys=True, default=str)
+    return {
+        'firma': hashlib.sha256(contenido.encode('utf-8')).hexdigest(),
+        'entradas': entradas,
+        'parametros': parametros,
+        'codigo': codigo
+    }
+
+def tarea_vigente(manifiesto, clave, firma):
+    """Indica si la tarea ya se ejecutó con la misma firma y sus salidas siguen existiendo"""
+    registro = manifiesto['tareas'].get(clave)
+    if not registro or registro.get('firma') != firma['firma']:
+        return False
+    return all(os.path.exists(salida) for salida in registro.get('salidas', []))
+
+def registrar_tarea(manifiesto, clave, firma, salidas):
+    """Registra la firma de la tarea junto con los archivos que generó"""
+    registro = dict(firma)
+    registro['salidas'] = sorted(salidas)
+    manifiesto['tareas'][clave] = registro
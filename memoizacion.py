@@ -0,0 +1,146 @@
+import os
+import json
+import pickle
+import hashlib
+import functools
+import pandas as pd
+import carga_datos
+from manifiesto import hash_archivo, version_codigo
+
+# ==========================================
+# Memoización en disco de resultados intermedios
+# ==========================================
+
+# Directorio de los resultados guardados (uno por clave de contenido)
+MEMO_DIR = os.path.join('.cache', 'memo')
+
+# Tamaño máximo (MB) de MEMO_DIR; al superarlo se borran los resultados usados hace más
+# tiempo. Con 0 no se guarda nada
+MEMO_MAXIMO_MB = float(os.environ.get('MEMO_MAXIMO_MB', 256))
+
+# Hashes de contenido de los archivos de entrada, reutilizados mientras no cambien
+# fecha ni tamaño (mismo formato que los del manifiesto de construcción)
+REGISTRO_HASHES = os.path.join(MEMO_DIR, 'hashes.json')
+
+# Registro de hashes ya leído en este proceso
+_hashes = None
+
+def _registro():
+    global _hashes
+    if _hashes is None:
+        try:
+            with open(REGISTRO_HASHES, encoding='utf-8') as f:
+                _hashes = {'hashes': json.load(f)}
+        except (OSError, ValueError):
+            _hashes = {'hashes': {}}
+    return _hashes
+
+def hash_entradas(archivos):
+    """Hash del contenido de cada archivo de la carpeta de datos (None si no existe)"""
+    registro = _registro()
+    rutas = sorted(os.path.join(carga_datos.DATOS_DIR, archivo) for archivo in archivos)
+    return {ruta: hash_archivo(registro, ruta) for ruta in rutas}
+
+def clave_resultado(funcion, entradas, args, kwargs, version=1):
+    """Clave de un resultado: contenido de sus entradas, parámetros y versión del código.
+
+    La versión del código es la misma que usa el manifiesto para las tareas (el módulo de
+    la función y los módulos comunes), así que cambiar el rango de años, los esquemas o
+    cualquier función auxiliar invalida también los resultados guardados.
+    """
+    registro = _registro()
+    previos = dict(registro['hashes'])
+    contenido = json.dumps([
+        funcion.__module__, funcion.__qualname__, version, version_codigo(registro, funcion),
+        hash_entradas(entradas), args, kwargs
+    ], sort_keys=True, default=str)
+
+    # Guardar el registro solo si se calculó algún hash nuevo; si dos procesos lo escriben
+    # a la vez se pierde como mucho una entrada, que se vuelve a calcular
+    if registro['hashes'] != previos:
+        os.makedirs(MEMO_DIR, exist_ok=True)
+        temporal = f'{REGISTRO_HASHES}.{os.getpid()}.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(registro['hashes'], f, ensure_ascii=False)
+        os.replace(temporal, REGISTRO_HASHES)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+def _leer(clave):
+    for extension, leer in (('.parquet', pd.read_parquet), ('.pkl', pd.read_pickle)):
+        ruta = os.path.join(MEMO_DIR, clave + extension)
+        if os.path.exists(ruta):
+            try:
+                resultado = leer(ruta)
+            except Exception as e:
+                print(f"  No se pudo leer el resultado guardado {ruta}: {e}")
+                return False, None
+            # Marcar como usado recientemente para el recorte por antigüedad
+            os.utime(ruta)
+            return True, resultado
+    return False, None
+
+def _guardar(clave, resultado):
+    os.makedirs(MEMO_DIR, exist_ok=True)
+    base = os.path.join(MEMO_DIR, clave)
+    temporal = f'{base}.{os.getpid()}.tmp'
+    try:
+        # Las tablas se guardan en Parquet (columnar y comprimido); el resto con pickle
+        if isinstance(resultado, pd.DataFrame):
+            try:
+                resultado.to_parquet(temporal)
+                os.replace(temporal, base + '.parquet')
+                return
+            except (ImportError, ValueError, TypeError):
+                pass
+        with open(temporal, 'wb') as f:
+            pickle.dump(resultado, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporal, base + '.pkl')
+    except (OSError, pickle.PicklingError) as e:
+        print(f"  No se pudo guardar el resultado {clave}: {e}")
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+def recortar(maximo_mb=MEMO_MAXIMO_MB):
+    """Borra los resultados usados hace más tiempo hasta que MEMO_DIR quepa en maximo_mb"""
+    try:
+        entradas = [e for e in os.scandir(MEMO_DIR)
+                    if e.is_file() and e.name.endswith(('.parquet', '.pkl'))]
+    except OSError:
+        return
+    archivos = sorted(((e.stat().st_mtime, e.stat().st_size, e.path) for e in entradas), reverse=True)
+    total = 0
+    for _, tamano, ruta in archivos:
+        total += tamano
+        if total > maximo_mb * 1024 * 1024:
+            try:
+                os.remove(ruta)
+            except OSError:
+                pass
+
+def memoizar(entradas, version=1):
+    """Decorador que guarda en disco el resultado de una función determinista.
+
+    entradas recibe los mismos argumentos que la función y devuelve los archivos de la
+    carpeta de datos de los que depende; la clave combina su contenido, los argumentos y
+    la versión del código (manifiesto.version_codigo), así que el resultado se reutiliza
+    entre procesos y ejecuciones mientras nada de eso cambie. version solo hace falta si
+    la función depende de código fuera de su módulo y de manifiesto.MODULOS_COMUNES.
+    """
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if MEMO_MAXIMO_MB <= 0:
+                return funcion(*args, **kwargs)
+
+            clave = clave_resultado(funcion, entradas(*args, **kwargs), args, kwargs, version)
+            encontrado, resultado = _leer(clave)
+            if encontrado:
+                return resultado
+
+            resultado = funcion(*args, **kwargs)
+            _guardar(clave, resultado)
+            recortar()
+            return resultado
+        return envoltura
+    return decorador
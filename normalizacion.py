@@ -0,0 +1,121 @@
+import os
+import codecs
+import unicodedata
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# Codificación de archivos y normalización de nombres
+# ==========================================
+
+# Codificaciones que se prueban, en orden, cuando el archivo no empieza con BOM
+CODIFICACIONES = ['utf-8', 'cp1252']
+
+# Bytes del principio y del final de un archivo que se decodifican para detectar su
+# codificación (los archivos más pequeños que el doble se decodifican completos)
+MUESTRA_DETECCION = 4 << 20
+
+# Nombres equivalentes (ya sin tildes y en mayúsculas) -> nombre canónico
+ALIAS = {
+    'BOGOTA': 'BOGOTA D.C.',
+    'BOGOTA, D.C.': 'BOGOTA D.C.',
+    'BOGOTA D.C. (CT)': 'BOGOTA D.C.',
+    'SANTAFE DE BOGOTA': 'BOGOTA D.C.',
+    'SANTAFE DE BOGOTA D.C.': 'BOGOTA D.C.',
+    'SAN ANDRES ISLAS': 'SAN ANDRES',
+    'ARCHIPIELAGO DE SAN ANDRES, PROVIDENCIA Y SANTA CATALINA': 'SAN ANDRES',
+    'VALLE': 'VALLE DEL CAUCA',
+    'GUAJIRA': 'LA GUAJIRA',
+    'NORTE SANTANDER': 'NORTE DE SANTANDER',
+    'LOS MARTIRES': 'MARTIRES',
+    'LA CANDELARIA': 'CANDELARIA',
+    'RAFAEL URIBE URIBE': 'RAFAEL URIBE'
+}
+
+# Prefijo de los nombres de estación en Frentes_De_Seguridad.csv; el resto es la localidad
+PREFIJO_ESTACION = 'ESTACION DE POLICIA '
+
+# Codificación ya detectada de cada archivo: (ruta, fecha de modificación, tamaño) -> codificación
+_codificaciones = {}
+
+def detectar_codificacion(ruta):
+    """Codificación real de un archivo de texto: utf-8-sig si tiene BOM, si no la primera
+    de CODIFICACIONES que decodifica una muestra del principio y del final del archivo
+    (latin1 como último recurso). Así un archivo de varios GB no se lee entero una vez
+    por codificación antes de cargarlo.
+
+    El resultado se recuerda mientras el archivo no cambie de fecha ni de tamaño.
+    """
+    info = os.stat(ruta)
+    clave_archivo = (os.path.abspath(ruta), info.st_mtime_ns, info.st_size)
+    if clave_archivo in _codificaciones:
+        return _codificaciones[clave_archivo]
+
+    muestras = _muestras(ruta, info.st_size)
+    if muestras[0].startswith(codecs.BOM_UTF8):
+        codificacion = 'utf-8-sig'
+    else:
+        codificacion = next((c for c in CODIFICACIONES if all(_decodifica(m, c) for m in muestras)), 'latin1')
+
+    _codificaciones[clave_archivo] = codificacion
+    return codificacion
+
+def _muestras(ruta, tamano, limite=MUESTRA_DETECCION):
+    # Principio y final del archivo cortados en saltos de línea, para no partir un carácter
+    # de varios bytes; si no hay ningún salto de línea se usa el bloque tal cual
+    with open(ruta, 'rb') as f:
+        if tamano <= 2 * limite:
+            return [f.read()]
+        inicio = f.read(limite)
+        f.seek(tamano - limite)
+        final = f.read()
+    corte = inicio.rfind(b'\n')
+    return [inicio[:corte + 1] if corte >= 0 else inicio, final[final.find(b'\n') + 1:]]
+
+def _decodifica(datos, codificacion):
+    try:
+        datos.decode(codificacion)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+def reparar_mojibake(texto):
+    """Deshace el UTF-8 leído como latin1 ('BOGOTÃ\\x81' -> 'BOGOTÁ') si es posible"""
+    if 'Ã' in texto or 'Â' in texto:
+        try:
+            return texto.encode('latin1').decode('utf-8')
+        except UnicodeError:
+            pass
+    return texto
+
+@lru_cache(maxsize=None)
+def clave(texto):
+    """Forma canónica de un nombre para compararlo: sin mojibake, sin tildes, en mayúsculas,
+    con un solo espacio entre palabras y resuelto con la tabla ALIAS"""
+    texto = unicodedata.normalize('NFKD', reparar_mojibake(str(texto)))
+    texto = ' '.join(''.join(c for c in texto if not unicodedata.combining(c)).upper().split())
+    return ALIAS.get(texto, texto)
+
+def reparar_vocabulario(vocabulario):
+    """Vocabulario de una columna sin mojibake ni espacios sobrantes (un valor por elemento)"""
+    textos = pd.Index([reparar_mojibake(v) for v in pd.Index(vocabulario).astype(str)])
+    return textos.str.strip().str.replace(r'\s+', ' ', regex=True)
+
+def claves(serie):
+    """Clave canónica de cada valor de una columna como categórica.
+
+    La canonicalización se calcula una vez por valor distinto (las categorías) y los
+    registros solo reutilizan sus códigos.
+    """
+    categorias = serie if isinstance(serie.dtype, pd.CategoricalDtype) else serie.astype('category')
+    codigos = categorias.cat.codes.to_numpy()
+    unicos, inversa = np.unique(np.array([clave(v) for v in categorias.cat.categories], dtype=object),
+                                return_inverse=True)
+    codigos = np.where(codigos >= 0, inversa[np.maximum(codigos, 0)] if len(inversa) else -1, -1)
+    return pd.Series(pd.Categorical.from_codes(codigos, unicos), index=serie.index, name=serie.name)
+
+def localidades(estaciones):
+    """Localidad (clave canónica) de cada estación de policía, sin el PREFIJO_ESTACION"""
+    estaciones = claves(estaciones)
+    return claves(estaciones.map({e: e.removeprefix(PREFIJO_ESTACION) for e in estaciones.cat.categories}))
@@ -0,0 +1,336 @@
+import os
+import json
+import gzip
+import errno
+import time
+import pickle
+import base64
+import hashlib
+import numpy as np
+import plotly
+from plotly.utils import PlotlyJSONEncoder
+from plotly.offline import get_plotlyjs, get_plotlyjs_version
+import instrumentacion
+from instrumentacion import medir, tamano_archivos
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Directorio de salida de las visualizaciones
+VISUALIZACIONES_DIR = 'visualizaciones'
+
+# Cómo se incluye plotly.js en cada figura: 'compartido' (un único archivo versionado
+# junto a las figuras, sin red), 'incrustado' (copia completa en cada HTML) o 'cdn'
+MODO_PLOTLYJS = os.environ.get('MODO_PLOTLYJS', 'compartido')
+
+# Decimales de los números con decimales en las especificaciones JSON (variable vacía:
+# precisión completa)
+DECIMALES_JSON = None if os.environ.get('DECIMALES_JSON') == '' else int(os.environ.get('DECIMALES_JSON', 6))
+
+# Listas de enteros de las trazas a partir de las que se escriben como arreglo tipado en base64
+MINIMO_TIPADO = 8
+
+# Atributos de datos de las trazas que se escriben como arreglos tipados (no tickvals,
+# customdata ni otras listas que plotly.js no siempre decodifica)
+CAMPOS_TIPADOS = {'x', 'y', 'z', 'values'}
+
+# plotly.js decodifica los arreglos tipados desde la 2.28, incluida desde plotly 5.19;
+# con una versión anterior las listas de enteros se escriben tal cual
+ARREGLOS_TIPADOS = tuple(int(p) for p in plotly.__version__.split('.')[:2]) >= (5, 19)
+
+# Página HTML de una figura: la misma estructura que pio.write_html, pero con la
+# especificación compacta (y su plantilla) en lugar de la figura completa
+HTML_FIGURA = """<html>
+<head><meta charset="utf-8" /></head>
+<body>
+    <div>
+        <script type="text/javascript">window.PlotlyConfig = {MathJaxConfig: 'local'};</script>
+        %(plotlyjs)s
+        <div id="figura" class="plotly-graph-div" style="height:100%%; width:100%%;"></div>
+        <script type="text/javascript">
+            var especificacion = %(especificacion)s;
+            var plantilla = %(plantilla)s;
+            if (plantilla) especificacion.layout.template = plantilla;
+            Plotly.newPlot("figura", {data: especificacion.data, layout: especificacion.layout,
+                                      frames: especificacion.frames, config: {responsive: true}});
+        </script>
+    </div>
+</body>
+</html>
+"""
+
+# Sufijos de las copias precomprimidas que server.py entrega según Accept-Encoding
+SUFIJOS_COMPRIMIDOS = ['.br', '.gz']
+
+# Archivos escritos por el proceso actual desde el último iniciar_registro()
+_archivos_escritos = []
+
+# Escrituras encoladas desde activar_cola() (None: se escribe directamente)
+_cola = None
+
+# Plantillas de layout ya escritas por este proceso: (directorio, hash) -> (nombre, archivos)
+_plantillas = {}
+
+def iniciar_registro():
+    """Reinicia la lista de archivos escritos por la tarea en curso"""
+    _archivos_escritos.clear()
+
+def archivos_escritos():
+    """Devuelve los archivos escritos desde el último iniciar_registro()"""
+    return list(_archivos_escritos)
+
+def _registrar(ruta):
+    ruta = os.path.normpath(ruta)
+    if ruta not in _archivos_escritos:
+        _archivos_escritos.append(ruta)
+
+def registrar_salida(ruta):
+    """Registra un archivo publicado sin las funciones guardar_* (por ejemplo, dentro de un directorio)"""
+    _registrar(ruta)
+
+def _escribir_binario(datos, ruta):
+    temporal = f'{ruta}.{os.getpid()}.tmp'
+    with open(temporal, 'wb') as f:
+        f.write(datos)
+    os.replace(temporal, ruta)
+
+def comprimir(ruta):
+    """Escribe junto al archivo sus copias .gz y .br (esta solo si está instalado brotli).
+
+    Se comprimen una sola vez al construir, con el máximo nivel, para que el servidor
+    no tenga que hacerlo en cada petición.
+    """
+    with medir('compresion', ruta) as evento:
+        with open(ruta, 'rb') as f:
+            datos = f.read()
+        # mtime=0 para que la misma entrada produzca siempre el mismo .gz
+        _escribir_binario(gzip.compress(datos, compresslevel=9, mtime=0), ruta + '.gz')
+        if brotli is not None:
+            _escribir_binario(brotli.compress(datos, quality=11), ruta + '.br')
+        elif os.path.exists(ruta + '.br'):
+            # Una copia .br anterior ya no corresponde al archivo nuevo
+            os.remove(ruta + '.br')
+        evento['bytes'] = tamano_archivos(ruta + sufijo for sufijo in SUFIJOS_COMPRIMIDOS)
+
+def asegurar_plotlyjs(directorio=VISUALIZACIONES_DIR):
+    """Escribe plotly.js (y sus copias comprimidas) una sola vez en el directorio y devuelve el nombre del archivo"""
+    nombre = f'plotly-{get_plotlyjs_version()}.min.js'
+    ruta = os.path.join(directorio, nombre)
+    if os.path.isdir(directorio) and not os.path.exists(ruta):
+        temporal = f'{ruta}.{os.getpid()}.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            f.write(get_plotlyjs())
+        os.replace(temporal, ruta)
+    if os.path.exists(ruta) and not os.path.exists(ruta + '.gz'):
+        comprimir(ruta)
+    return nombre
+
+def ruta_especificacion(ruta):
+    """Ruta del JSON con la especificación (data, layout, frames) de una figura guardada en ruta"""
+    return os.path.splitext(ruta)[0] + '.json'
+
+def _con_comprimidos(ruta):
+    return [ruta] + [ruta + sufijo for sufijo in SUFIJOS_COMPRIMIDOS if os.path.exists(ruta + sufijo)]
+
+def _incrustable(contenido):
+    # JSON dentro de <script>: '</' cerraría la etiqueta antes de tiempo
+    return contenido.replace(b'</', b'<\\/').decode('utf-8')
+
+def _etiqueta_plotlyjs(directorio):
+    # Etiqueta <script> de plotly.js según MODO_PLOTLYJS y archivos que la acompañan
+    if MODO_PLOTLYJS == 'compartido':
+        # La figura referencia plotly.js con una ruta relativa a su propio directorio
+        nombre = asegurar_plotlyjs(directorio)
+        return f'<script charset="utf-8" src="{nombre}"></script>', _con_comprimidos(os.path.join(directorio, nombre))
+    if MODO_PLOTLYJS == 'cdn':
+        return f'<script charset="utf-8" src="https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"></script>', []
+    return f'<script type="text/javascript">{get_plotlyjs()}</script>', []
+
+def _escribir_figura(fig, ruta):
+    # Escribe la especificación JSON compacta de una figura (o de su diccionario) y el HTML
+    # que la dibuja, con renombrados atómicos para que server.py nunca entregue un archivo
+    # a medio escribir, y devuelve los archivos escritos. El diccionario se compacta una
+    # sola vez para ambos y, como ya es el de una figura válida, no se vuelve a validar
+    if not isinstance(fig, dict):
+        fig = fig.to_dict()
+    directorio = os.path.dirname(ruta) or '.'
+
+    # Los informes montan la figura desde este JSON en lugar de incrustar el HTML en un iframe
+    especificacion = ruta_especificacion(ruta)
+    with medir('plotly_json', especificacion) as evento:
+        contenido, plantilla, escritos = especificacion_compacta(fig, directorio)
+        _escribir_binario(contenido, especificacion)
+        evento['bytes'] = tamano_archivos([especificacion])
+    comprimir(especificacion)
+    escritos += _con_comprimidos(especificacion)
+
+    # El HTML incrusta la misma especificación y la plantilla para verse sin servidor
+    with medir('plotly_html', ruta) as evento:
+        etiqueta, plotlyjs = _etiqueta_plotlyjs(directorio)
+        html = HTML_FIGURA % {
+            'plotlyjs': etiqueta,
+            'especificacion': _incrustable(contenido),
+            'plantilla': _incrustable(plantilla) if plantilla else 'null'
+        }
+        _escribir_binario(html.encode('utf-8'), ruta)
+        evento['bytes'] = tamano_archivos([ruta])
+    comprimir(ruta)
+    return plotlyjs + _con_comprimidos(ruta) + escritos
+
+def _escribir_mapa(mapa, ruta):
+    temporal = f'{ruta}.{os.getpid()}.tmp'
+    with medir('folium_html', ruta) as evento:
+        mapa.save(temporal)
+        os.replace(temporal, ruta)
+        evento['bytes'] = tamano_archivos([ruta])
+    comprimir(ruta)
+    return _con_comprimidos(ruta)
+
+def guardar_figura(fig, ruta):
+    """Guarda una figura de plotly como HTML, junto con su especificación JSON, y registra los archivos"""
+    if _cola is not None and _encolar('figura', fig.to_dict(), ruta):
+        return
+    for escrito in _escribir_figura(fig, ruta):
+        _registrar(escrito)
+
+def guardar_mapa(mapa, ruta):
+    """Guarda un mapa de folium como HTML y registra el archivo generado"""
+    if _encolar('mapa', mapa, ruta):
+        return
+    for escrito in _escribir_mapa(mapa, ruta):
+        _registrar(escrito)
+
+def guardar_json(datos, ruta):
+    """Escribe un JSON de forma atómica y registra el archivo generado"""
+    with open(ruta + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(datos, f, ensure_ascii=False)
+    os.replace(ruta + '.tmp', ruta)
+    _registrar(ruta)
+
+# ==========================================
+# Especificaciones JSON compactas
+# ==========================================
+
+def _serializar(objeto):
+    # orjson si está instalado; los tipos que no conoce (fechas de pandas, arreglos de
+    # objetos) se convierten igual que en plotly
+    if orjson is not None:
+        return orjson.dumps(objeto, default=PlotlyJSONEncoder().default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(objeto, cls=PlotlyJSONEncoder, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+def _arreglo_tipado(valores):
+    # Mismo formato que usa plotly para los arreglos de numpy: el tipo entero más pequeño
+    # en el que caben los valores, en base64
+    arreglo = np.asarray(valores)
+    for tipo, corto in (('int8', 'i1'), ('int16', 'i2'), ('int32', 'i4')):
+        limites = np.iinfo(tipo)
+        if limites.min <= arreglo.min() and arreglo.max() <= limites.max:
+            return {'dtype': corto, 'bdata': base64.b64encode(arreglo.astype(tipo).tobytes()).decode('ascii')}
+    return valores
+
+def _compactar(valor, decimales, tipados, campo=None):
+    # Redondea los números con decimales y, si tipados, convierte las listas de enteros
+    # de los atributos de CAMPOS_TIPADOS
+    if isinstance(valor, float):
+        return valor if decimales is None else round(valor, decimales)
+    if isinstance(valor, dict):
+        return {clave: _compactar(v, decimales, tipados, clave) for clave, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        if (tipados and ARREGLOS_TIPADOS and campo in CAMPOS_TIPADOS and len(valor) >= MINIMO_TIPADO
+                and all(type(v) is int for v in valor)):
+            return _arreglo_tipado(valor)
+        return [_compactar(v, decimales, tipados) for v in valor]
+    return valor
+
+def _asegurar_plantilla(plantilla, directorio):
+    # Escribe la plantilla una sola vez, con el hash de su contenido en el nombre; en el
+    # mismo proceso se reconoce por su serialización sin compactar, que es mucho más rápida
+    clave = (directorio, hashlib.sha256(_serializar(plantilla)).hexdigest())
+    if clave not in _plantillas:
+        contenido = _serializar(_compactar(plantilla, DECIMALES_JSON, False))
+        nombre = f'plantilla-{hashlib.sha256(contenido).hexdigest()[:12]}.json'
+        ruta = os.path.join(directorio, nombre)
+        if not os.path.exists(ruta):
+            _escribir_binario(contenido, ruta)
+        if not os.path.exists(ruta + '.gz'):
+            comprimir(ruta)
+        _plantillas[clave] = (nombre, _con_comprimidos(ruta), contenido)
+    return _plantillas[clave]
+
+def especificacion_compacta(fig, directorio=VISUALIZACIONES_DIR):
+    """Especificación JSON compacta del diccionario de una figura.
+
+    Devuelve los bytes, los de la plantilla (None si no tiene) y los archivos de la
+    plantilla. La plantilla del layout (la misma
+    plotly_white en casi todas las figuras) se escribe una sola vez en el directorio y la
+    especificación solo la nombra en 'plantilla'. Los números se redondean a DECIMALES_JSON
+    y las listas de enteros de x, y, z y values de las trazas pasan a arreglos tipados
+    en base64 (si plotly.js los decodifica, ver ARREGLOS_TIPADOS).
+    """
+    layout = dict(fig.get('layout', {}))
+    plantilla = layout.pop('template', None)
+    especificacion = {}
+    escritos = []
+    contenido = None
+    if plantilla:
+        especificacion['plantilla'], escritos, contenido = _asegurar_plantilla(plantilla, directorio)
+    especificacion['data'] = _compactar(fig.get('data', []), DECIMALES_JSON, True)
+    especificacion['layout'] = _compactar(layout, DECIMALES_JSON, False)
+    if fig.get('frames'):
+        especificacion['frames'] = _compactar(fig['frames'], DECIMALES_JSON, True)
+    return _serializar(especificacion), contenido, list(escritos)
+
+# ==========================================
+# Cola de escritura
+# ==========================================
+
+def activar_cola():
+    """Hace que guardar_figura y guardar_mapa encolen la escritura en lugar de hacerla.
+
+    Serializar el HTML y el JSON de plotly o el HTML de folium (y comprimirlos) es lo que
+    más tarda después de agregar; los trabajos encolados se recogen con extraer_cola() y
+    se reparten con escribir_trabajo() entre los procesos disponibles.
+    """
+    global _cola
+    _cola = []
+
+def extraer_cola():
+    """Devuelve los trabajos encolados y vuelve a escribir directamente"""
+    global _cola
+    trabajos, _cola = _cola or [], None
+    return trabajos
+
+def _encolar(tipo, objeto, ruta):
+    # Se serializa ya para que, si el objeto no se puede enviar a otro proceso, se escriba aquí
+    if _cola is None:
+        return False
+    # Una ruta que no se podría escribir falla aquí, igual que al escribir directamente
+    if not os.path.isdir(os.path.dirname(ruta) or '.'):
+        raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), ruta)
+    try:
+        datos = pickle.dumps(objeto, protocol=pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, TypeError, AttributeError):
+        return False
+    _cola.append({'tipo': tipo, 'ruta': ruta, 'datos': datos})
+    return True
+
+def escribir_trabajo(trabajo):
+    """Escribe un trabajo de extraer_cola() y devuelve sus archivos, eventos medidos y segundos"""
+    inicio = time.perf_counter()
+    instrumentacion.reiniciar()
+    objeto = pickle.loads(trabajo['datos'])
+    escribir = _escribir_figura if trabajo['tipo'] == 'figura' else _escribir_mapa
+    salidas = [os.path.normpath(ruta) for ruta in escribir(objeto, trabajo['ruta'])]
+    return {
+        'salidas': salidas,
+        'eventos': instrumentacion.eventos(),
+        'segundos': round(time.perf_counter() - inicio, 3)
+    }
@@ -1,23 +1,324 @@
-from flask import Flask, render_template, send_from_directory, jsonify
+from flask import Flask, render_template, send_from_directory, send_file, jsonify, abort, request
+from werkzeug.security import safe_join
 import os
+import json
+import hashlib
+import mimetypes
+import threading
+import time
+from functools import lru_cache
+from plotly.offline import get_plotlyjs_version
+from manifiesto import hash_archivo
+from salidas import SUFIJOS_COMPRIMIDOS
+from carga_datos import DATOS_DIR, ARCHIVOS_SIN_AGREGAR
+from cubo import cargar_cubo, serie, cortar
+from normalizacion import clave
 
 app = Flask(__name__)
 
 VISUALIZACIONES_DIR = "visualizaciones"
+TESELAS_DIR = "teselas"
+
+# Las teselas cambian solo al reconstruir la pirámide; el navegador las revalida con su ETag
+MAX_AGE_TESELAS = 3600
+
+# Segundos entre revisiones del directorio de visualizaciones
+INTERVALO_VIGILANCIA = 2
+
+# Las URL con ?v=<hash> no cambian nunca de contenido; sin versión el navegador revalida con el ETag
+MAX_AGE_VERSIONADO = 31536000
+
+# Codificación de cada sufijo precomprimido (en orden de preferencia)
+CODIFICACIONES = {".br": "br", ".gz": "gzip"}
+
+# Categoría de cada visualización según su nombre (la primera regla que coincide)
+CATEGORIAS = [
+    ("Tendencias Temporales", ["tendencia", "patron"]),
+    ("Frentes de Seguridad", ["frente"]),
+    ("Comparativas", ["compar"]),
+    ("Mapas", ["mapa"]),
+    ("Análisis por Delito", ["homicidio", "hurto", "violencia"])
+]
+
+# Nombres de dimensión aceptados en /api/agg además de los del cubo
+DIMENSIONES_API = {
+    "year": "año", "anio": "año", "month": "mes", "weekday": "dia_semana", "hour": "hora",
+    "department": "departamento", "municipality": "municipio", "gender": "genero"
+}
+
+# Consultas de /api/agg cuya respuesta se conserva en memoria
+MAX_CONSULTAS = 512
+
+# Manifiesto en memoria de VISUALIZACIONES_DIR: nombre -> entrada, y su versión (para el ETag
+# de /api/archivos). Se reemplaza completo en cada actualización, así que leerlo no necesita bloqueo
+_indice = {"archivos": {}, "version": ""}
+
+# Hashes de contenido ya calculados (se reutilizan mientras no cambien fecha ni tamaño)
+_hashes = {"hashes": {}}
+
+# Cubos de conteos de los datasets de hechos (ver cubo.py), cargados una vez al arrancar:
+# clave canónica del nombre del dataset -> cubo
+_almacen = {}
+
+_bloqueo = threading.Lock()
+_vigilante = {"pid": None}
+
+def categoria(nombre):
+    """Categoría de una visualización según las palabras de su nombre"""
+    nombre = nombre.lower()
+    return next((cat for cat, claves in CATEGORIAS if any(c in nombre for c in claves)), "Otros")
+
+def _entrada(entrada, firma):
+    # Copias precomprimidas vigentes: existen y no son más antiguas que el original
+    comprimidos = {
+        CODIFICACIONES[sufijo]: entrada.path + sufijo
+        for sufijo, mtime in zip(SUFIJOS_COMPRIMIDOS, firma[2:])
+        if mtime is not None and mtime >= firma[0]
+    }
+    info = entrada.stat()
+    return {
+        "nombre": entrada.name,
+        "tamano": info.st_size,
+        "mtime": info.st_mtime,
+        "categoria": categoria(entrada.name),
+        "hash": hash_archivo(_hashes, entrada.path),
+        "comprimidos": comprimidos,
+        "firma": firma
+    }
+
+def actualizar_indice(directorio=VISUALIZACIONES_DIR):
+    """Revisa el directorio y recalcula solo las entradas nuevas o modificadas"""
+    global _indice
+    with _bloqueo:
+        try:
+            entradas = {e.name: e for e in os.scandir(directorio)}
+        except OSError:
+            entradas = {}
+
+        anteriores = _indice["archivos"]
+        archivos = {}
+        for nombre, entrada in entradas.items():
+            if (nombre.startswith(".") or nombre.endswith(".tmp") or not entrada.is_file()
+                    or any(nombre.endswith(s) for s in SUFIJOS_COMPRIMIDOS)):
+                continue
+            # Firma: fecha y tamaño del archivo y fecha de cada copia comprimida
+            info = entrada.stat()
+            firma = (info.st_mtime_ns, info.st_size) + tuple(
+                entradas[nombre + s].stat().st_mtime_ns if nombre + s in entradas else None
+                for s in SUFIJOS_COMPRIMIDOS
+            )
+            previa = anteriores.get(nombre)
+            archivos[nombre] = previa if previa and previa["firma"] == firma else _entrada(entrada, firma)
+
+        if archivos.keys() != anteriores.keys() or any(archivos[n] is not anteriores[n] for n in archivos):
+            version = hashlib.sha256(json.dumps(
+                sorted((n, e["hash"]) for n, e in archivos.items())).encode("utf-8")).hexdigest()
+            _indice = {"archivos": archivos, "version": version}
+    return _indice
+
+def _vigilar(directorio, intervalo):
+    while True:
+        time.sleep(intervalo)
+        try:
+            actualizar_indice(directorio)
+        except Exception as e:
+            print(f"  Error al actualizar el índice de visualizaciones: {e}")
+
+def iniciar_vigilancia(directorio=VISUALIZACIONES_DIR, intervalo=INTERVALO_VIGILANCIA):
+    """Actualiza el índice y arranca (una vez por proceso) el hilo que lo mantiene al día.
+
+    No se llama al importar el módulo: con gunicorn (preload_app) lo llama cada proceso hijo
+    en post_fork. El bloqueo se crea de nuevo por si el hijo heredó uno tomado al hacer fork.
+    """
+    global _bloqueo
+    if _vigilante["pid"] == os.getpid():
+        return
+    _vigilante["pid"] = os.getpid()
+    _bloqueo = threading.Lock()
+    actualizar_indice(directorio)
+    threading.Thread(target=_vigilar, args=(directorio, intervalo), daemon=True).start()
+
+def cargar_almacen(directorio=DATOS_DIR):
+    """Carga en memoria los cubos de todos los datasets de hechos de la carpeta de datos"""
+    try:
+        archivos = sorted(f for f in os.listdir(directorio) if f.endswith(".csv") and f not in ARCHIVOS_SIN_AGREGAR)
+    except OSError:
+        archivos = []
+    for archivo in archivos:
+        cubo = cargar_cubo(archivo)
+        if cubo is not None:
+            _almacen[clave(cubo["nombre"])] = cubo
+    consultar.cache_clear()
+    return _almacen
+
+def _filtros(cubo, texto):
+    # 'dimension:valor1|valor2,otra:valor'; los valores de texto se comparan por su clave canónica
+    filtros = {}
+    for parte in filter(None, texto.split(",")):
+        dimension, _, valores = parte.partition(":")
+        dimension = DIMENSIONES_API.get(dimension.strip(), dimension.strip())
+        if dimension not in cubo["dimensiones"] or not valores:
+            raise ValueError(f"Filtro no válido: {parte}")
+        valores = valores.split("|")
+        if cubo["valores"][dimension].dtype.kind in "iu":
+            filtros[dimension] = [int(v) for v in valores]
+        else:
+            objetivo = {clave(v) for v in valores}
+            filtros[dimension] = lambda valor, objetivo=objetivo: clave(valor) in objetivo
+    return filtros
+
+@lru_cache(maxsize=MAX_CONSULTAS)
+def consultar(dataset, grupo, filtro, medida):
+    """Conteos de un dataset agrupados y filtrados, como JSON columnar (una lista por dimensión).
+
+    La respuesta se calcula con los cortes densos del cubo y se guarda ya serializada en la
+    caché LRU, así que repetir una consulta no vuelve a tocar los arreglos.
+    """
+    cubo = _almacen[dataset]
+    dimensiones = [DIMENSIONES_API.get(d, d) for d in grupo]
+    desconocidas = [d for d in dimensiones if d not in cubo["dimensiones"]]
+    if desconocidas:
+        raise ValueError(f"Dimensiones no disponibles en {cubo['nombre']}: {', '.join(desconocidas)}")
+    filtros = _filtros(cubo, filtro)
+
+    resultado = {"dataset": cubo["nombre"], "grupo": dimensiones, "filtro": filtro, "medida": medida}
+    if dimensiones:
+        conteos = serie(cubo, dimensiones, medida, **filtros)
+        resultado["columnas"] = {d: conteos.index.get_level_values(d).tolist() for d in dimensiones}
+        resultado["columnas"][medida] = conteos.tolist()
+    else:
+        resultado["total"] = int(cortar(cubo, [], medida, **filtros))
+    contenido = json.dumps(resultado, ensure_ascii=False, separators=(",", ":"))
+    return contenido, hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+def visualizaciones():
+    """Visualizaciones HTML del índice, ordenadas por categoría y nombre"""
+    return sorted(
+        (e for e in _indice["archivos"].values() if e["nombre"].endswith(".html")),
+        key=lambda e: (e["categoria"], e["nombre"])
+    )
+
+def _publica(entrada):
+    return {
+        "nombre": entrada["nombre"],
+        "tamano": entrada["tamano"],
+        "mtime": entrada["mtime"],
+        "categoria": entrada["categoria"],
+        "hash": entrada["hash"],
+        "url": f"/visualizaciones/{entrada['nombre']}?v={entrada['hash'][:12]}"
+    }
 
 @app.route("/")
 def index():
-    archivos = [f for f in os.listdir(VISUALIZACIONES_DIR) if f.endswith(".html")]
-    return render_template("index.html", archivos=archivos)
+    return render_template("index.html", archivos=[e["nombre"] for e in visualizaciones()],
+                           plotlyjs=f"/visualizaciones/plotly-{get_plotlyjs_version()}.min.js")
 
 @app.route("/visualizaciones/<path:filename>")
 def visualizar_archivo(filename):
-    return send_from_directory(VISUALIZACIONES_DIR, filename)
+    entrada = _indice["archivos"].get(filename)
+    if entrada is None:
+        abort(404)
+
+    # Elegir la copia precomprimida que el navegador acepte (br antes que gzip)
+    ruta = os.path.join(VISUALIZACIONES_DIR, filename)
+    codificacion = next((c for c in CODIFICACIONES.values()
+                         if c in entrada["comprimidos"] and request.accept_encodings[c]), None)
+    etag = entrada["hash"] + (f"-{codificacion}" if codificacion else "")
+    versionada = request.args.get("v") == entrada["hash"][:12]
+    respuesta = send_file(
+        entrada["comprimidos"][codificacion] if codificacion else ruta,
+        mimetype=mimetypes.guess_type(filename)[0],
+        # Nombre del archivo original (no el de la copia .gz/.br) al guardarlo desde el navegador
+        download_name=os.path.basename(filename),
+        etag=etag,
+        conditional=True,
+        max_age=MAX_AGE_VERSIONADO if versionada else 0
+    )
+    if codificacion:
+        respuesta.headers["Content-Encoding"] = codificacion
+    respuesta.vary.add("Accept-Encoding")
+
+    respuesta.cache_control.public = True
+    if versionada:
+        respuesta.cache_control.immutable = True
+    else:
+        respuesta.cache_control.no_cache = True
+    return respuesta
+
+@app.route("/healthz")
+def salud():
+    respuesta = jsonify({
+        "estado": "ok",
+        "pid": os.getpid(),
+        "visualizaciones": len(_indice["archivos"]),
+        "datasets": len(_almacen)
+    })
+    respuesta.cache_control.no_store = True
+    return respuesta
+
+@app.route("/api/datasets")
+def obtener_datasets():
+    return jsonify([
+        {"dataset": cubo["nombre"], "dimensiones": cubo["dimensiones"],
+         "valores": {d: cubo["valores"][d].tolist() for d in cubo["dimensiones"] if len(cubo["valores"][d]) <= 200}}
+        for cubo in _almacen.values()
+    ])
+
+@app.route("/api/agg/<dataset>")
+def agregar(dataset):
+    dataset = clave(dataset)
+    if dataset not in _almacen:
+        return jsonify({"error": "Dataset no disponible"}), 404
+    medida = request.args.get("medida", "cantidad")
+    if medida not in ("cantidad", "registros"):
+        return jsonify({"error": "La medida debe ser 'cantidad' o 'registros'"}), 400
+    grupo = tuple(d.strip() for d in request.args.get("group", "").split(",") if d.strip())
+    filtro = ",".join(request.args.getlist("filter"))
+    try:
+        contenido, etag = consultar(dataset, grupo, filtro, medida)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    respuesta = app.response_class(contenido, mimetype="application/json")
+    respuesta.set_etag(etag)
+    respuesta.cache_control.no_cache = True
+    return respuesta.make_conditional(request)
 
 @app.route("/api/archivos")
 def obtener_archivos():
-    archivos = [f for f in os.listdir(VISUALIZACIONES_DIR) if f.endswith(".html")]
-    return jsonify(archivos)
+    respuesta = jsonify([_publica(e) for e in visualizaciones()])
+    respuesta.set_etag(_indice["version"])
+    respuesta.cache_control.no_cache = True
+    return respuesta.make_conditional(request)
+
+@app.route("/tiles/<capa>/meta.json")
+def meta_teselas(capa):
+    return send_from_directory(TESELAS_DIR, os.path.join(capa, "meta.json"), max_age=60)
+
+@app.route("/tiles/<capa>/<int:z>/<int:x>/<int:y>")
+def tesela(capa, z, x, y):
+    ruta = safe_join(capa, str(z), str(x), f"{y}.json")
+    if ruta is None:
+        abort(404)
+    if not os.path.isdir(os.path.join(TESELAS_DIR, capa)):
+        # Capa no publicada (todavía): sin respuesta cacheable para verla cuando se publique
+        abort(404)
+    if not os.path.isfile(os.path.join(TESELAS_DIR, ruta)):
+        # Las teselas sin casos no se escriben: respuesta vacía que el navegador también guarda
+        respuesta = app.response_class(status=204)
+        respuesta.cache_control.public = True
+        respuesta.cache_control.max_age = MAX_AGE_TESELAS
+        return respuesta
+    respuesta = send_from_directory(TESELAS_DIR, ruta, mimetype="application/json", max_age=MAX_AGE_TESELAS)
+    respuesta.cache_control.public = True
+    return respuesta
+
+# Índice y cubos se cargan al importar (con gunicorn, una sola vez en el proceso principal);
+# el hilo de vigilancia solo se arranca en los procesos que atienden peticiones
+actualizar_indice()
+cargar_almacen()
 
+# Servidor de desarrollo; en producción: gunicorn server:app (ver gunicorn.conf.py)
 if __name__ == "__main__":
+    iniciar_vigilancia()
     app.run(debug=True)
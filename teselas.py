@@ -0,0 +1,155 @@
+import os
+import glob
+import json
+import time
+import shutil
+import numpy as np
+import esquemas
+from agregacion import pesos
+from capas_mapa import coordenadas_validas, bloques_coordenadas
+from carga_datos import es_archivo_grande, archivos_con_roles
+from densidad import pixeles_mercator, NIVELES_TESELAS, CELDAS_POR_TESELA
+from salidas import registrar_salida
+
+# ==========================================
+# Pirámide de teselas z/x/y con conteos precalculados
+# ==========================================
+
+# Directorio de salida: teselas/<capa>/<z>/<x>/<y>.json y teselas/<capa>/meta.json
+TESELAS_DIR = 'teselas'
+
+def archivos_teselas():
+    """Datasets con columnas de latitud y longitud, para los que se construye una capa de teselas"""
+    return archivos_con_roles('latitud', 'longitud')
+
+def agregar_teselas(lat, lon, zoom, peso=None):
+    """Suma los casos por celda de tesela en un nivel de zoom.
+
+    Devuelve arreglos alineados por celda con su tesela (x, y), su posición dentro de
+    la tesela (columna, fila) y su número de casos, ordenados por tesela.
+    """
+    x, y = pixeles_mercator(lat, lon, zoom)
+    lado = 256 // CELDAS_POR_TESELA
+    cx = (x // lado).astype(np.int64)
+    cy = (y // lado).astype(np.int64)
+
+    # Ordenar por tesela (x, y) y luego por celda para poder cortar el resultado por tesela
+    tx, ty = cx // CELDAS_POR_TESELA, cy // CELDAS_POR_TESELA
+    clave = (tx * 2 ** zoom + ty) * CELDAS_POR_TESELA ** 2 + (cy % CELDAS_POR_TESELA) * CELDAS_POR_TESELA + cx % CELDAS_POR_TESELA
+    return _sumar_claves(clave, peso, zoom)
+
+def _sumar_claves(clave, casos, zoom):
+    # Suma los casos de cada clave de celda y la descompone en tesela y posición
+    claves, inversa = np.unique(clave, return_inverse=True)
+    casos = np.bincount(inversa.ravel(), weights=casos, minlength=len(claves))
+
+    tesela, celda = np.divmod(claves, CELDAS_POR_TESELA ** 2)
+    return {
+        'x': tesela // 2 ** zoom,
+        'y': tesela % 2 ** zoom,
+        'columna': celda % CELDAS_POR_TESELA,
+        'fila': celda // CELDAS_POR_TESELA,
+        'casos': casos
+    }
+
+def sumar_teselas(partes, zoom):
+    """Suma celda a celda varios resultados de agregar_teselas del mismo nivel (por ejemplo, uno por bloque)"""
+    partes = list(partes)
+    clave = np.concatenate([(p['x'] * 2 ** zoom + p['y']) * CELDAS_POR_TESELA ** 2
+                            + p['fila'] * CELDAS_POR_TESELA + p['columna'] for p in partes])
+    return _sumar_claves(clave, np.concatenate([p['casos'] for p in partes]), zoom)
+
+def agregar_teselas_bloques(bloques, niveles=NIVELES_TESELAS):
+    """Celdas de cada nivel de zoom para puntos que llegan por bloques (lat, lon, peso)"""
+    niveles_celdas = None
+    for lat, lon, peso in bloques:
+        parcial = {zoom: agregar_teselas(lat, lon, zoom, peso) for zoom in niveles}
+        niveles_celdas = parcial if niveles_celdas is None else {
+            zoom: sumar_teselas([niveles_celdas[zoom], parcial[zoom]], zoom) for zoom in niveles}
+    return niveles_celdas
+
+def escribir_nivel(directorio, zoom, celdas):
+    """Escribe una tesela JSON por cada tesela con casos del nivel"""
+    tesela = celdas['x'] * 2 ** zoom + celdas['y']
+    cortes = np.flatnonzero(np.diff(tesela)) + 1
+    for inicio, fin in zip(np.r_[0, cortes], np.r_[cortes, len(tesela)]):
+        x, y = int(celdas['x'][inicio]), int(celdas['y'][inicio])
+        filas = np.column_stack([celdas['columna'][inicio:fin], celdas['fila'][inicio:fin],
+                                 np.rint(celdas['casos'][inicio:fin])]).astype(np.int64)
+        ruta = os.path.join(directorio, str(zoom), str(x))
+        os.makedirs(ruta, exist_ok=True)
+        with open(os.path.join(ruta, f'{y}.json'), 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'celdas': filas.tolist()}, separators=(',', ':')))
+    return len(cortes) + 1 if len(tesela) else 0
+
+def construir_teselas(capa, lat, lon, peso=None, niveles=NIVELES_TESELAS, directorio=TESELAS_DIR):
+    """Construye la pirámide de teselas de una capa a partir de sus puntos"""
+    return publicar_teselas(capa, {zoom: agregar_teselas(lat, lon, zoom, peso) for zoom in niveles}, directorio)
+
+def publicar_teselas(capa, niveles_celdas, directorio=TESELAS_DIR):
+    """Escribe la pirámide de teselas de una capa y la publica reemplazando la anterior.
+
+    Cada versión se escribe completa, con su meta.json (máximos por nivel para la escala
+    de colores), en un directorio oculto; teselas/<capa> es un enlace simbólico que se
+    reemplaza con un único os.replace, así que el servidor ve siempre una pirámide entera.
+    """
+    destino = os.path.join(directorio, capa)
+    version = f'.{capa}.{os.getpid()}.{time.time_ns()}'
+    temporal = os.path.join(directorio, version)
+    os.makedirs(temporal)
+
+    meta = {'capa': capa, 'celdas_por_tesela': CELDAS_POR_TESELA, 'niveles': {}}
+    for zoom, celdas in niveles_celdas.items():
+        teselas = escribir_nivel(temporal, zoom, celdas)
+        meta['niveles'][str(zoom)] = {
+            'teselas': teselas,
+            'maximo': float(celdas['casos'].max()) if len(celdas['casos']) else 0.0
+        }
+    with open(os.path.join(temporal, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    # Las capas publicadas antes como directorio se apartan una sola vez
+    if os.path.isdir(destino) and not os.path.islink(destino):
+        os.replace(destino, os.path.join(directorio, f'.{capa}.anterior'))
+    enlace = f'{destino}.{os.getpid()}.lnk'
+    os.symlink(version, enlace)
+    os.replace(enlace, destino)
+
+    # Descartar las versiones anteriores (incluidas las de ejecuciones interrumpidas)
+    for anterior in glob.glob(os.path.join(directorio, f'.{glob.escape(capa)}.*')):
+        if anterior != temporal:
+            shutil.rmtree(anterior, ignore_errors=True)
+
+    registrar_salida(os.path.join(destino, 'meta.json'))
+    return meta
+
+def construir_teselas_dataset(df, nombre):
+    """Construye la capa de teselas de un dataset con columnas de latitud y longitud.
+
+    Los archivos grandes llegan agregados y sin coordenadas: sus teselas se suman
+    bloque a bloque leyendo el CSV con carga_datos.iterar_dataset.
+    """
+    filename = df.attrs.get('dataset')
+    if es_archivo_grande(filename):
+        print(f"\nConstruyendo teselas de {nombre} por bloques...")
+        niveles_celdas = agregar_teselas_bloques(bloques_coordenadas(filename))
+        if niveles_celdas is None or not len(niveles_celdas[NIVELES_TESELAS[0]]['casos']):
+            return False
+        meta = publicar_teselas(nombre, niveles_celdas)
+    else:
+        col_lat = esquemas.columna(df, 'latitud')
+        col_lon = esquemas.columna(df, 'longitud')
+        if not col_lat or not col_lon:
+            return False
+
+        validas, lat, lon = coordenadas_validas(df, col_lat, col_lon)
+        if not len(lat):
+            return False
+
+        peso = pesos(df)
+        peso = None if peso is None else peso.to_numpy(dtype=np.float64)[validas]
+        print(f"\nConstruyendo teselas de {nombre} con {len(lat)} puntos...")
+        meta = construir_teselas(nombre, lat, lon, peso)
+    total = sum(nivel['teselas'] for nivel in meta['niveles'].values())
+    print(f"  {total} teselas en {len(meta['niveles'])} niveles de zoom")
+    return True
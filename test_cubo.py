@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+from cubo import construir_cubo, cortar, serie
+from densidad import piramide_densidad, piramide_densidad_bloques
+from teselas import agregar_teselas, agregar_teselas_bloques
+
+# ==========================================
+# Los cortes del cubo y las agregaciones por bloques equivalen a agrupar los registros
+# ==========================================
+
+def datos_prueba(filas=500, semilla=0):
+    """DataFrame pequeño con las columnas que reconoce esquemas.DETECCION (sin esquema registrado)"""
+    generador = np.random.default_rng(semilla)
+    df = pd.DataFrame({
+        'AÑO': generador.choice([2019, 2020, 2021], filas),
+        'MES': generador.choice(['ENERO', 'FEBRERO', 'MARZO'], filas),
+        'DEPARTAMENTO': generador.choice(['ANTIOQUIA', 'CAUCA', 'VALLE', None], filas),
+        'GENERO': generador.choice(['FEMENINO', 'MASCULINO'], filas),
+        'CANTIDAD': generador.integers(1, 4, filas)
+    })
+    df.attrs['dataset'] = 'prueba.csv'
+    return df
+
+def test_serie_igual_a_groupby():
+    df = datos_prueba()
+    cubo = construir_cubo(df, 'prueba')
+
+    esperado = df.groupby(['AÑO', 'DEPARTAMENTO'])['CANTIDAD'].sum()
+    obtenido = serie(cubo, ['año', 'departamento'])
+    assert obtenido.to_dict() == esperado.to_dict()
+
+    esperado = df.groupby('GENERO').size()
+    obtenido = serie(cubo, 'genero', medida='registros')
+    assert obtenido.to_dict() == esperado.to_dict()
+
+def test_cortar_con_filtros_igual_a_groupby():
+    df = datos_prueba()
+    cubo = construir_cubo(df, 'prueba')
+
+    filtrado = df[(df['GENERO'] == 'FEMENINO') & (df['AÑO'] >= 2020)]
+    esperado = filtrado.groupby(['DEPARTAMENTO', 'MES'])['CANTIDAD'].sum()
+    denso = cortar(cubo, ['departamento', 'mes'], genero=['FEMENINO'], **{'año': lambda a: a >= 2020})
+    meses = {1: 'ENERO', 2: 'FEBRERO', 3: 'MARZO'}
+    obtenido = {
+        (depto, meses[mes]): denso[i, j]
+        for i, depto in enumerate(cubo['valores']['departamento'])
+        for j, mes in enumerate(cubo['valores']['mes']) if denso[i, j]
+    }
+    assert obtenido == esperado.to_dict()
+
+def coordenadas_prueba(puntos=5000, semilla=1):
+    generador = np.random.default_rng(semilla)
+    lat = generador.uniform(1, 11, puntos)
+    lon = generador.uniform(-77, -70, puntos)
+    peso = generador.integers(1, 4, puntos).astype(np.float64)
+    return lat, lon, peso
+
+def bloques(lat, lon, peso, filas=700):
+    for inicio in range(0, len(lat), filas):
+        yield lat[inicio:inicio + filas], lon[inicio:inicio + filas], peso[inicio:inicio + filas]
+
+def test_teselas_por_bloques_igual_a_todo_junto():
+    lat, lon, peso = coordenadas_prueba()
+    niveles = range(4, 8)
+    por_bloques = agregar_teselas_bloques(bloques(lat, lon, peso), niveles)
+    for zoom in niveles:
+        completo = agregar_teselas(lat, lon, zoom, peso)
+        assert completo['casos'].sum() == peso.sum()
+        for campo in ['x', 'y', 'columna', 'fila', 'casos']:
+            np.testing.assert_array_equal(por_bloques[zoom][campo], completo[campo])
+
+def test_densidad_por_bloques_igual_a_todo_junto():
+    lat, lon, peso = coordenadas_prueba()
+    por_bloques = piramide_densidad_bloques(bloques(lat, lon, peso))
+    for zoom, completo in piramide_densidad(lat, lon, peso).items():
+        for campo in ['fila', 'columna', 'casos']:
+            np.testing.assert_array_equal(por_bloques[zoom][campo], completo[campo])
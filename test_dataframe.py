@@ -1,9 +1,11 @@
 import pandas as pd
+from normalizacion import detectar_codificacion
 
 print("Cargando Hurto_Personas.csv...")
 try:
     # Cargar directamente con coma como delimitador (que es lo que parece tener)
-    df = pd.read_csv("datos/Hurto_Personas.csv", encoding='latin1', low_memory=False)
+    ruta = "datos/Hurto_Personas.csv"
+    df = pd.read_csv(ruta, encoding=detectar_codificacion(ruta), low_memory=False)
     
     print(f"Filas: {df.shape[0]}, Columnas: {df.shape[1]}")
     print("\nNombres de columnas:")
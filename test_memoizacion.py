@@ -0,0 +1,62 @@
+import os
+import pandas as pd
+import carga_datos
+import manifiesto
+import memoizacion
+
+# ==========================================
+# Invalidación de los resultados memoizados
+# ==========================================
+
+def preparar(tmp_path, monkeypatch):
+    """Carpeta de datos, módulo común y caché de memoización aislados en tmp_path"""
+    datos = tmp_path / 'datos'
+    datos.mkdir()
+    (datos / 'prueba.csv').write_text('AÑO;CANTIDAD\n2020;1\n', encoding='utf-8')
+    comun = tmp_path / 'comun.py'
+    comun.write_text('VALOR = 1\n', encoding='utf-8')
+
+    monkeypatch.setattr(carga_datos, 'DATOS_DIR', str(datos))
+    monkeypatch.setattr(manifiesto, 'MODULOS_COMUNES', [str(comun)])
+    monkeypatch.setattr(memoizacion, 'MEMO_DIR', str(tmp_path / 'memo'))
+    monkeypatch.setattr(memoizacion, 'REGISTRO_HASHES', str(tmp_path / 'memo' / 'hashes.json'))
+    monkeypatch.setattr(memoizacion, '_hashes', None)
+    return datos / 'prueba.csv', comun
+
+def contar_filas(archivo):
+    return len(pd.read_csv(os.path.join(carga_datos.DATOS_DIR, archivo), sep=';'))
+
+def test_clave_cambia_con_entradas_y_codigo(tmp_path, monkeypatch):
+    csv, comun = preparar(tmp_path, monkeypatch)
+    def clave():
+        return memoizacion.clave_resultado(contar_filas, ['prueba.csv'], ('prueba.csv',), {})
+
+    inicial = clave()
+    assert clave() == inicial
+
+    with open(csv, 'a', encoding='utf-8') as f:
+        f.write('2021;2\n')
+    tras_datos = clave()
+    assert tras_datos != inicial
+
+    with open(comun, 'a', encoding='utf-8') as f:
+        f.write('VALOR = 2\n')
+    assert clave() != tras_datos
+
+def test_memoizar_reutiliza_hasta_que_cambian_los_datos(tmp_path, monkeypatch):
+    csv, _ = preparar(tmp_path, monkeypatch)
+    llamadas = []
+
+    @memoizacion.memoizar(lambda archivo: [archivo])
+    def filas(archivo):
+        llamadas.append(archivo)
+        return contar_filas(archivo)
+
+    assert filas('prueba.csv') == 1
+    assert filas('prueba.csv') == 1
+    assert len(llamadas) == 1
+
+    with open(csv, 'a', encoding='utf-8') as f:
+        f.write('2021;2\n')
+    assert filas('prueba.csv') == 2
+    assert len(llamadas) == 2